@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de los dashboards: login y simulaciones concurrentes
+
+Arranca la aplicación Dash (SimpleApp o DecisionDashboard) en un servidor local con
+hilos y lanza usuarios virtuales concurrentes que recorren el flujo del navegador:
+cargar el layout (id de sesión), iniciar sesión y pulsar 'run-simulation' varias veces
+con parámetros distintos. Cada paso es una petición HTTP real al endpoint de callbacks
+de Dash. El login de DecisionDashboard usa AuthManager sobre una base SQLite local
+(benchmarks/local_db.py) con latencia de red configurable.
+
+Para cada combinación de tamaño de simulación y concurrencia informa, por operación,
+las latencias p50/p95/p99, el rendimiento y la tasa de errores.
+
+Uso: python benchmarks/load_test.py --apps simple dashboard --sizes 1000 5000 --concurrency 1 4 16
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.serving import make_server
+
+from local_db import LocalDB
+
+LOAD_PASSWORD = 'carga123'
+OPERATIONS = ('layout', 'login', 'simulate')
+
+def callback_payload(outputs, inputs, state=()):
+    """Cuerpo JSON de una petición a /_dash-update-component
+
+    `outputs`, `inputs` y `state` son secuencias de (id, propiedad[, valor]).
+    """
+    output = '..' + '...'.join(f'{i}.{p}' for i, p in outputs) + '..' if len(outputs) > 1 else '.'.join(outputs[0])
+    return {
+        'output': output,
+        'outputs': [{'id': i, 'property': p} for i, p in outputs] if len(outputs) > 1
+                   else {'id': outputs[0][0], 'property': outputs[0][1]},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+        'changedPropIds': [f'{i}.{p}' for i, p, _ in inputs],
+    }
+
+def find_store(component, store_id):
+    """Valor inicial de un dcc.Store en el JSON del layout"""
+    if isinstance(component, dict):
+        props = component.get('props', {})
+        if props.get('id') == store_id:
+            return props.get('data')
+        return find_store(props.get('children'), store_id)
+    if isinstance(component, list):
+        for child in component:
+            value = find_store(child, store_id)
+            if value is not None:
+                return value
+    return None
+
+def random_inputs(rng):
+    """Parámetros de escenario distintos en cada clic (sin aciertos de caché)"""
+    return {
+        'name': f"Carga {rng.randrange(10**6)}",
+        'investment': rng.randrange(50000, 150000, 1000),
+        'revenue_mean': rng.randrange(15000, 35000, 500),
+        'revenue_std': rng.randrange(2000, 8000, 500),
+    }
+
+
+class SimpleAppProfile:
+    """Callbacks de SimpleApp (login fijo admin/admin123)"""
+    name = 'simple'
+
+    @staticmethod
+    def build(db):
+        from src.ui.simple_app import SimpleApp
+        return SimpleApp()
+
+    @staticmethod
+    def login(user_index):
+        return callback_payload([('session', 'data')], [('login-btn', 'n_clicks', 1)],
+                                [('username', 'value', 'admin'), ('password', 'value', 'admin123')])
+
+    @staticmethod
+    def logged_in(response):
+        return bool((response['session']['data'] or {}).get('session_id'))
+
+    @staticmethod
+    def session(response):
+        return response['session']['data']
+
+    @staticmethod
+    def simulate(session_id, session_data, clicks, params):
+        return callback_payload(
+            [('simulation-results', 'children'), ('last-result-key', 'data')],
+            [('run-simulation', 'n_clicks', clicks)],
+            [('scenario-name', 'value', params['name']),
+             ('initial-investment', 'value', params['investment']),
+             ('revenue-mean', 'value', params['revenue_mean']),
+             ('revenue-std', 'value', params['revenue_std']),
+             ('session-id', 'data', session_id),
+             ('session', 'data', session_data)])
+
+
+class DashboardProfile:
+    """Callbacks de DecisionDashboard con AuthManager sobre la base local"""
+    name = 'dashboard'
+
+    @staticmethod
+    def build(db):
+        from src.auth.auth_manager import AuthManager
+        from src.ui.dashboard import DecisionDashboard
+        return DecisionDashboard(auth_manager=AuthManager(db=db))
+
+    @staticmethod
+    def login(user_index):
+        return callback_payload([('session-store', 'data')], [('login-btn', 'n_clicks', 1)],
+                                [('username', 'value', f'carga{user_index}'),
+                                 ('password', 'value', LOAD_PASSWORD)])
+
+    @staticmethod
+    def logged_in(response):
+        return bool((response['session-store']['data'] or {}).get('session_id'))
+
+    @staticmethod
+    def session(response):
+        return response['session-store']['data']
+
+    @staticmethod
+    def simulate(session_id, session_data, clicks, params):
+        return callback_payload(
+            [('results-container', 'children'), ('last-result-key', 'data')],
+            [('run-simulation', 'n_clicks', clicks)],
+            [('session-id', 'data', session_id),
+             ('scenario-name', 'value', params['name']),
+             ('initial-investment', 'value', params['investment']),
+             ('revenue-mean', 'value', params['revenue_mean']),
+             ('revenue-std', 'value', params['revenue_std']),
+             ('cost-mean', 'value', 15000),
+             ('cost-std', 'value', 3000),
+             ('inflation-rate', 'value', 0.03),
+             ('market-volatility', 'value', 0.15),
+             ('session-store', 'data', session_data)])
+
+
+PROFILES = {profile.name: profile for profile in (SimpleAppProfile, DashboardProfile)}
+
+
+class LocalServer:
+    """Servidor WSGI con hilos en un puerto libre de 127.0.0.1"""
+
+    def __init__(self, flask_app):
+        # Sin el registro de acceso por petición de werkzeug
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self._server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._thread.join()
+
+
+class VirtualUser:
+    """Usuario virtual con su propia conexión keep-alive; registra (operación, segundos, ok)"""
+
+    def __init__(self, port, profile, index, clicks, seed, timeout):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        self.profile = profile
+        self.index = index
+        self.clicks = clicks
+        self.rng = random.Random(seed * 100003 + index)
+        self.samples = []
+
+    def request(self, operation, method, path, body=None, check=None):
+        start = time.perf_counter()
+        ok = False
+        try:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            self.connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                                    headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            payload = json.loads(data) if response.status == 200 else None
+            ok = payload is not None and (check is None or check(payload))
+        except Exception:
+            payload = None
+            # Conexión posiblemente rota: la siguiente petición abre otra
+            self.connection.close()
+        self.samples.append((operation, time.perf_counter() - start, ok))
+        return payload if ok else None
+
+    def run(self):
+        layout = self.request('layout', 'GET', '/_dash-layout')
+        session_id = find_store(layout, 'session-id') if layout else None
+        login = self.request('login', 'POST', '/_dash-update-component', self.profile.login(self.index),
+                             check=lambda r: self.profile.logged_in(r['response']))
+        # El planificador reparte los turnos por usuario autenticado: las simulaciones llevan el token
+        session_data = self.profile.session(login['response']) if login else None
+        for click in range(1, self.clicks + 1):
+            payload = self.profile.simulate(session_id, session_data, click, random_inputs(self.rng))
+            self.request('simulate', 'POST', '/_dash-update-component', payload,
+                         check=lambda r: bool(r['response']))
+        self.connection.close()
+
+
+def run_load(app, port, profile, n_simulations, concurrency, clicks, seed=0, timeout=300):
+    """Lanza `concurrency` usuarios virtuales a la vez; retorna una fila de resultados por operación"""
+    app.engine.n_simulations = n_simulations
+    users = [VirtualUser(port, profile, index, clicks, seed, timeout) for index in range(concurrency)]
+    barrier = threading.Barrier(concurrency + 1)
+
+    def start(user):
+        barrier.wait()
+        user.run()
+
+    threads = [threading.Thread(target=start, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    by_operation = defaultdict(list)
+    for user in users:
+        for operation, seconds, ok in user.samples:
+            by_operation[operation].append((seconds, ok))
+
+    rows = []
+    for operation in OPERATIONS:
+        samples = by_operation.get(operation, [])
+        if not samples:
+            continue
+        latencies = np.array([seconds for seconds, _ in samples]) * 1000
+        errors = sum(1 for _, ok in samples if not ok)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        rows.append({
+            'app': profile.name, 'n_simulations': n_simulations, 'concurrency': concurrency,
+            'operation': operation, 'requests': len(samples), 'errors': errors,
+            'error_rate': errors / len(samples), 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+            'throughput_rps': len(samples) / wall,
+            'paths_per_second': (len(samples) - errors) * n_simulations / wall if operation == 'simulate' else None,
+        })
+    return rows
+
+def seed_users(app, count):
+    """Crea los usuarios de carga en la base local (solo perfiles con AuthManager)"""
+    auth = getattr(app, 'auth', None)
+    if auth is None or auth.db is None:
+        return
+    existing = {user['username'] for user in auth.get_all_users()}
+    for index in range(count):
+        if f'carga{index}' not in existing:
+            auth.create_user(f'carga{index}', f'carga{index}@example.com', LOAD_PASSWORD)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de login y simulaciones en los dashboards")
+    parser.add_argument('--apps', nargs='+', choices=sorted(PROFILES), default=['simple', 'dashboard'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help="Trayectorias por simulación")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16], help="Usuarios virtuales simultáneos")
+    parser.add_argument('--clicks', type=int, default=5, help="Simulaciones por usuario virtual")
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help="Latencia simulada por conexión a la base")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla de los parámetros de escenario")
+    parser.add_argument('--json', help="Fichero donde guardar los resultados en JSON")
+    args = parser.parse_args()
+
+    db = LocalDB(latency_ms=args.db_latency_ms)
+    results = []
+    try:
+        for app_name in args.apps:
+            profile = PROFILES[app_name]
+            app = profile.build(db)
+            seed_users(app, max(args.concurrency))
+            with LocalServer(app.app.server) as server:
+                print(f"🚦 {app_name}: http://127.0.0.1:{server.port}")
+                print(f"{'N':>8}{'VUs':>6}  {'Operación':<10}{'Peticiones':>11}{'Errores':>9}"
+                      f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+                for n_simulations in args.sizes:
+                    for concurrency in args.concurrency:
+                        rows = run_load(app, server.port, profile, n_simulations, concurrency, args.clicks, args.seed)
+                        for row in rows:
+                            print(f"{n_simulations:>8}{concurrency:>6}  {row['operation']:<10}{row['requests']:>11}"
+                                  f"{row['error_rate']:>8.1%}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+                                  f"{row['p99_ms']:>10.1f}{row['throughput_rps']:>9.1f}")
+                        results.extend(rows)
+                print()
+    finally:
+        db.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Sustituto local de NeonDB sobre SQLite para las pruebas de carga
+
+Expone la misma interfaz que usa AuthManager (get_connection() con conexión y cursor
+como gestores de contexto y parámetros '%s'), de modo que el flujo de login recorre
+el mismo código que en producción sin una base de datos Postgres. Cada llamada a
+get_connection() abre una conexión nueva, como psycopg2.connect, y `latency_ms`
+simula la ida y vuelta de red a la base de datos remota.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+# Esquema SQLite equivalente a la tabla users de AuthManager.create_auth_tables
+USERS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username VARCHAR(50) UNIQUE NOT NULL,
+        email VARCHAR(100) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(20) DEFAULT 'user',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+class _Cursor:
+    """Cursor con la sintaxis de psycopg2 traducida a SQLite"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, sql, params=()):
+        # El DDL de Postgres (SERIAL, JSONB, ALTER ... IF NOT EXISTS) no aplica: el esquema es el local
+        if sql.lstrip().upper().startswith(('CREATE', 'ALTER')):
+            return
+        self._cursor.execute(sql.replace('%s', '?').replace('ILIKE', 'LIKE'), tuple(params))
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+
+class _Connection:
+    """Conexión: confirma o revierte al salir del bloque `with`, como psycopg2"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self._connection.commit()
+        else:
+            self._connection.rollback()
+        self._connection.close()
+
+    def cursor(self):
+        return _Cursor(self._connection.cursor())
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+class LocalDB:
+    """Base de datos de usuarios en un fichero SQLite temporal"""
+
+    def __init__(self, path: str = None, latency_ms: float = 0.0):
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix='montecarlo_load_', suffix='.db')
+            os.close(handle)
+            self._owned = True
+        else:
+            self._owned = False
+        self.path = path
+        self.latency = latency_ms / 1000
+        with sqlite3.connect(self.path) as conn:
+            conn.execute(USERS_SCHEMA)
+
+    def get_connection(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return _Connection(sqlite3.connect(self.path, timeout=30, check_same_thread=False))
+
+    def close(self):
+        """Borra el fichero temporal si lo creó esta instancia"""
+        if self._owned and os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark de muestreo: error frente a tiempo de 'random', 'stratified' y 'lhs'
+
+Para cada método y tamaño de simulación repite la ejecución con varias semillas y mide
+el error cuadrático medio de mean_npv y success_probability frente a una referencia
+de muestreo simple con muchas trayectorias.
+
+Uso: python benchmarks/sampling_benchmark.py --sizes 1000 5000 20000 --repeats 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+
+def reference_values(scenario, n_simulations):
+    """Valores de referencia con muestreo simple y muchas trayectorias"""
+    engine = MonteCarloEngine(n_simulations=n_simulations, use_database=False, seed=10**6)
+    result = engine.simulate_scenario(scenario)
+    return result.mean_npv, result.success_probability
+
+def run_method(scenario, sampling, n_simulations, repeats):
+    """Ejecuta `repeats` simulaciones; retorna (tiempo medio en ms, estimaciones de NPV y éxito)"""
+    means, successes, elapsed = [], [], 0.0
+    for seed in range(repeats):
+        engine = MonteCarloEngine(n_simulations=n_simulations, use_database=False, seed=seed, sampling=sampling)
+        start = time.perf_counter()
+        result = engine.simulate_scenario(scenario)
+        elapsed += time.perf_counter() - start
+        means.append(result.mean_npv)
+        successes.append(result.success_probability)
+    return elapsed / repeats * 1000, np.array(means), np.array(successes)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de error frente a tiempo por método de muestreo")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000], help="Trayectorias por ejecución")
+    parser.add_argument('--repeats', type=int, default=20, help="Ejecuciones por método y tamaño")
+    parser.add_argument('--reference', type=int, default=2000000, help="Trayectorias de la referencia")
+    args = parser.parse_args()
+
+    # Inversión alta: probabilidad de éxito intermedia, donde su error es relevante
+    scenario = BusinessScenario("Benchmark", 80000, 15000, 3000, 8000, 1500)
+    print(f"📐 Calculando referencia con {args.reference:,} trayectorias...")
+    ref_npv, ref_success = reference_values(scenario, args.reference)
+    print(f"   NPV medio {ref_npv:,.1f} | Prob. éxito {ref_success:.3f}%\n")
+
+    print(f"{'Método':<12}{'N':>8}{'ms/ejec.':>11}{'RMSE NPV':>12}{'RMSE éxito':>12}{'Eficiencia NPV':>16}")
+    for n_simulations in args.sizes:
+        baseline = None
+        for sampling in MonteCarloEngine.SAMPLING_METHODS:
+            ms, means, successes = run_method(scenario, sampling, n_simulations, args.repeats)
+            rmse_npv = np.sqrt(np.mean((means - ref_npv) ** 2))
+            rmse_success = np.sqrt(np.mean((successes - ref_success) ** 2))
+            # Eficiencia relativa: reducción de varianza por unidad de tiempo frente a 'random'
+            cost = rmse_npv ** 2 * ms
+            baseline = baseline or cost
+            print(f"{sampling:<12}{n_simulations:>8}{ms:>11.1f}{rmse_npv:>12.1f}{rmse_success:>12.3f}"
+                  f"{baseline / cost:>15.1f}x")
+        print()
+
+if __name__ == "__main__":
+    main()
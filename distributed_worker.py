@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Worker de simulación distribuida: se conecta a un DistributedCoordinator y ejecuta tramos
+
+Uso: DISTRIBUTED_SECRET=... python distributed_worker.py --host coordinador.local --port 5555
+"""
+
+import argparse
+import socket
+
+from src.simulation.distributed import run_worker
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker Monte Carlo distribuido")
+    parser.add_argument('--host', default='127.0.0.1', help="Host del coordinador")
+    parser.add_argument('--port', type=int, default=5555, help="Puerto del coordinador")
+    parser.add_argument('--name', default=socket.gethostname(), help="Nombre del worker en los logs")
+    parser.add_argument('--secret', help="Secreto compartido con el coordinador (por defecto DISTRIBUTED_SECRET)")
+    args = parser.parse_args()
+
+    print(f"🔧 Worker {args.name} conectando a {args.host}:{args.port}...")
+    run_worker(args.host, args.port, args.name, secret=args.secret)
+    print("✅ Worker finalizado")
+
+if __name__ == "__main__":
+    main()
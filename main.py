@@ -16,6 +16,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from src.ui.simple_app import SimpleApp
 from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.simulation.scheduler import get_default_scheduler
 from src.models.business_scenario import BusinessScenario
 from src.utils.statistics import StatisticsCalculator
 
@@ -58,8 +59,8 @@ def demo_simulation():
         )
     ]
     
-    # Motor de simulación
-    engine = MonteCarloEngine(n_simulations=10000)
+    # Motor de simulación: la comparación es un trabajo 'batch' del planificador compartido
+    engine = get_default_scheduler().bind(MonteCarloEngine(n_simulations=10000), user='cli', priority='batch')
     results = []
     
     print("\nEjecutando simulaciones Monte Carlo...")
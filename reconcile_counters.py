@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Script para recalcular los contadores desnormalizados de proyectos y simulaciones
+"""
+
+from src.auth.auth_manager import AuthManager
+
+def reconcile_counters():
+    """Corrige simulation_count y visualization_count a partir de las tablas hijas"""
+    try:
+        print("🔧 Reconciliando contadores...")
+        auth = AuthManager()
+        if auth.db is None:
+            print("❌ No hay conexión con la base de datos")
+            return
+        fixed = auth.reconcile_counters()
+        print(f"✅ Proyectos corregidos: {fixed['projects']}")
+        print(f"✅ Simulaciones corregidas: {fixed['simulations']}")
+
+    except Exception as e:
+        print(f"❌ Error reconciliando contadores: {e}")
+        print("💡 Verifica tu NEON_DATABASE_URL en el archivo .env")
+
+if __name__ == "__main__":
+    reconcile_counters()
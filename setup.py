@@ -17,6 +17,9 @@ setup(
         "dash>=2.11.1",
         "dash-bootstrap-components>=1.4.1"
     ],
+    extras_require={
+        "export": ["pyarrow>=14.0.0"],
+    },
     python_requires=">=3.8",
     entry_points={
         'console_scripts': [
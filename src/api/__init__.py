@@ -0,0 +1 @@
+# API JSON de simulación
@@ -0,0 +1,36 @@
+import time
+
+from flask import Response, g, request
+
+from ..utils.instrumentation import HTTP_LATENCY, HTTP_REQUESTS, REGISTRY
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def register_metrics_endpoint(server, path: str = '/metrics'):
+    """Expone las métricas en formato Prometheus y mide todas las peticiones del servidor Flask
+
+    Las peticiones se etiquetan por regla de ruta (no por URL) para acotar la
+    cardinalidad; los callbacks de Dash comparten '/_dash-update-component' y su
+    latencia por callback está en montecarlo_stage_duration_seconds.
+    """
+    if 'metrics' in server.view_functions:
+        return
+    REGISTRY.start_flusher()
+
+    @server.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None and request.path != path:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            HTTP_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        return response
+
+    @server.route(path, endpoint='metrics')
+    def metrics():
+        return Response(REGISTRY.exposition(), mimetype=None, content_type=PROMETHEUS_CONTENT_TYPE)
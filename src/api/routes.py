@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import fields
+from typing import Dict, Optional
+
+import numpy as np
+from flask import Blueprint, jsonify, request
+
+from ..models.business_scenario import BusinessScenario, SimulationResult
+from ..simulation.scheduler import AdmissionRejected, JobTooLarge, client_identity
+from ..utils.memory_profile import MemoryBudgetExceeded
+from ..utils.telemetry import get_logger, span
+from .simulation_service import SimulationService
+
+logger = get_logger('api')
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+SCENARIO_FIELDS = {f.name for f in fields(BusinessScenario)}
+MAX_SCENARIOS_PER_REQUEST = 100
+# Segundos sugeridos al cliente cuando su simulación no termina dentro del plazo
+RETRY_AFTER_SECONDS = 5
+
+
+def get_default_service() -> SimulationService:
+    """Servicio compartido por todas las apps Dash del proceso"""
+    global _default_service
+    with _default_service_lock:
+        if _default_service is None:
+            _default_service = SimulationService()
+        return _default_service
+
+
+def scenario_from_json(payload: Dict) -> BusinessScenario:
+    """Construye un BusinessScenario validando campos y tipos"""
+    if not isinstance(payload, dict):
+        raise ValueError("Cada escenario debe ser un objeto JSON")
+    unknown = set(payload) - SCENARIO_FIELDS
+    if unknown:
+        raise ValueError(f"Campos desconocidos: {', '.join(sorted(unknown))}")
+    try:
+        scenario = BusinessScenario(**payload)
+    except TypeError as e:
+        raise ValueError(f"Escenario incompleto: {e}")
+
+    for f in fields(BusinessScenario):
+        value = getattr(scenario, f.name)
+        if f.name == 'name':
+            if not isinstance(value, str) or not value:
+                raise ValueError("name debe ser un texto no vacío")
+        elif isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{f.name} debe ser numérico")
+    if scenario.time_horizon < 1 or int(scenario.time_horizon) != scenario.time_horizon:
+        raise ValueError("time_horizon debe ser un entero positivo")
+    scenario.time_horizon = int(scenario.time_horizon)
+    return scenario
+
+
+def _json_number(value):
+    # JSON no admite inf/NaN: se envían como null
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def result_to_json(result: SimulationResult, include_metrics: bool = True) -> Dict:
+    """Resumen y métricas de un resultado con tipos nativos de Python"""
+    payload = {
+        'scenario_name': result.scenario_name,
+        'n_simulations': int(result.paths.shape[1]),
+        'summary': {name: _json_number(value) for name, value in result.summary.items()},
+    }
+    if include_metrics:
+        payload['metrics'] = {name: _json_number(value) if isinstance(value, (np.number, int, float)) else value
+                              for name, value in result.metrics.items()}
+    return payload
+
+
+def create_simulation_blueprint(service: Optional[SimulationService] = None,
+                                timeout: float = 60) -> Blueprint:
+    """Blueprint con POST /simulate (uno o varios escenarios)"""
+    blueprint = Blueprint('simulation_api', __name__)
+
+    @blueprint.route('/simulate', methods=['POST'])
+    def simulate():
+        # Ruta de alto volumen: solo se traza una fracción de las peticiones
+        with span('api.simulate', high_volume=True) as request_span:
+            response = _simulate()
+            request_span.set_attribute('status', response[1] if isinstance(response, tuple) else 200)
+            return response
+
+    def _simulate():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'error': 'Se esperaba un cuerpo JSON'}), 400
+
+        if 'scenarios' in body:
+            raw_scenarios = body['scenarios']
+            if not isinstance(raw_scenarios, list) or not raw_scenarios:
+                return jsonify({'error': 'scenarios debe ser una lista no vacía'}), 400
+            if len(raw_scenarios) > MAX_SCENARIOS_PER_REQUEST:
+                return jsonify({'error': f'Máximo {MAX_SCENARIOS_PER_REQUEST} escenarios por petición'}), 400
+        elif 'scenario' in body:
+            raw_scenarios = [body['scenario']]
+        else:
+            return jsonify({'error': "Falta 'scenario' o 'scenarios'"}), 400
+
+        try:
+            scenarios = [scenario_from_json(payload) for payload in raw_scenarios]
+            simulation_service = service or get_default_service()
+            # Turno justo por cliente; una comparación de varios escenarios cede el turno
+            # a los clics interactivos
+            user = client_identity()
+            priority = 'batch' if len(scenarios) > 1 else 'interactive'
+            futures = [simulation_service.submit(scenario, body.get('n_simulations'), user, priority)
+                       for scenario in scenarios]
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        include_metrics = bool(body.get('include_metrics', True))
+        try:
+            results = [result_to_json(future.result(timeout), include_metrics) for future in futures]
+        except (MemoryBudgetExceeded, JobTooLarge) as e:
+            return jsonify({'error': str(e)}), 413
+        except AdmissionRejected as e:
+            return jsonify({'error': str(e)}), 429
+        except FutureTimeoutError:
+            # El cálculo sigue en curso: un reintento idéntico se une a él
+            return (jsonify({'error': 'La simulación no terminó a tiempo; reintente más tarde'}), 503,
+                    {'Retry-After': str(RETRY_AFTER_SECONDS)})
+        except Exception as e:
+            logger.exception("Error en simulación vía API: %s", e)
+            return jsonify({'error': 'Error ejecutando la simulación'}), 500
+        return jsonify({'results': results})
+
+    return blueprint
+
+
+def register_simulation_api(server, service: Optional[SimulationService] = None,
+                            url_prefix: str = '/api'):
+    """Registra la API JSON de simulación en el servidor Flask de una app Dash"""
+    server.register_blueprint(create_simulation_blueprint(service), url_prefix=url_prefix)
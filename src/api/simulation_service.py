@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ..models.business_scenario import BusinessScenario, SimulationResult
+from ..simulation.monte_carlo_engine import MonteCarloEngine
+from ..simulation.scheduler import JobTooLarge, SimulationScheduler, get_default_scheduler
+from ..database.result_store import LocalResultStore
+from ..utils.telemetry import current_span, span
+from ..utils.instrumentation import QUEUE_DEPTH, record_cache
+from ..utils.memory_profile import MemoryBudgetExceeded
+
+
+class SimulationService:
+    """Servicio de simulación con agrupación de peticiones idénticas y micro-lotes
+
+    Las peticiones en curso se indexan por (hash del escenario, n_simulaciones): un
+    duplicado concurrente recibe el mismo Future en lugar de lanzar otro cálculo. Un
+    hilo despachador acumula las peticiones durante `max_wait_ms` (hasta
+    `max_batch_size` peticiones o `max_batch_paths` trayectorias) y las entrega a un pool
+    de hilos del tamaño de `scheduler.max_concurrent`, que las ejecuta juntas con
+    MonteCarloEngine.simulate_scenarios; así los lotes de clientes distintos corren en
+    paralelo y la espera de turno de uno no bloquea a los demás. Cada lote espera turno
+    en el planificador compartido con el usuario y la prioridad de sus peticiones; si el lote no es
+    admisible por tamaño, sus peticiones se reintentan por separado y solo falla la que
+    no cabe por sí misma.
+    """
+
+    def __init__(self, engine: Optional[MonteCarloEngine] = None, max_batch_size: int = 32,
+                 max_wait_ms: float = 5, max_simulations: int = 50_000,
+                 scheduler: Optional[SimulationScheduler] = None, max_batch_paths: int = 1_000_000):
+        self.engine = engine or MonteCarloEngine(use_database=False)
+        self.scheduler = scheduler or get_default_scheduler()
+        self.max_batch_size = max_batch_size
+        self.max_batch_paths = max_batch_paths
+        self.max_wait_ms = max_wait_ms
+        self.max_simulations = max_simulations
+        self._in_flight: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        QUEUE_DEPTH.track(self._queue.qsize, queue='api_simulation')
+        self._dispatcher = None
+        self._executor = None
+        self.stats = {'requests': 0, 'coalesced': 0, 'batches': 0, 'computed': 0}
+
+    def submit(self, scenario: BusinessScenario, n_simulations: Optional[int] = None,
+               user: str = 'api', priority: str = 'interactive') -> Future:
+        """Encola un escenario y retorna un Future con su SimulationResult"""
+        n = int(n_simulations or self.engine.n_simulations)
+        if not 0 < n <= self.max_simulations:
+            raise ValueError(f"n_simulations debe estar entre 1 y {self.max_simulations}")
+
+        key = (LocalResultStore.scenario_hash(scenario), n)
+        with self._lock:
+            self.stats['requests'] += 1
+            future = self._in_flight.get(key)
+            record_cache('api_in_flight', future is not None)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future
+            future = Future()
+            self._in_flight[key] = future
+            self._ensure_dispatcher()
+
+        future.add_done_callback(lambda _: self._release(key, future))
+        # El lote se ejecuta en el hilo despachador: se lleva el span de la petición
+        self._queue.put((scenario, n, user, priority, future, current_span()))
+        return future
+
+    def simulate(self, scenarios: List[BusinessScenario], n_simulations: Optional[int] = None,
+                 timeout: Optional[float] = None, user: str = 'api',
+                 priority: str = 'batch') -> List[SimulationResult]:
+        """Simula varios escenarios (por defecto como trabajo 'batch') y espera sus resultados"""
+        futures = [self.submit(scenario, n_simulations, user, priority) for scenario in scenarios]
+        return [future.result(timeout) for future in futures]
+
+    def close(self):
+        """Detiene el hilo despachador tras vaciar la cola y espera a los lotes en curso"""
+        dispatcher = self._dispatcher
+        if dispatcher is not None:
+            self._queue.put(None)
+            dispatcher.join()
+            self._dispatcher = None
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _release(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def _ensure_dispatcher(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.scheduler.max_concurrent,
+                                                thread_name_prefix='simulation-batch')
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='simulation-dispatcher',
+                                                daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        held = None  # petición que no cupo en el lote anterior: abre el siguiente
+        while True:
+            item = held if held is not None else self._queue.get()
+            held = None
+            if item is None:
+                return
+            batch, paths = [item], item[1]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if paths + item[1] > self.max_batch_paths:
+                    held = item
+                    break
+                batch.append(item)
+                paths += item[1]
+
+            self._submit_batch(batch)
+            if stop:
+                return
+
+    def _submit_batch(self, batch):
+        # Un lote vectorizado por número de simulaciones, usuario y prioridad (el motor
+        # agrupa además por horizonte); el despachador solo forma los lotes
+        by_size: Dict[Tuple[int, str, str], list] = {}
+        for scenario, n, user, priority, future, request_span in batch:
+            by_size.setdefault((n, user, priority), []).append((scenario, future, request_span))
+
+        for (n, user, priority), items in by_size.items():
+            self._executor.submit(self._run_group, n, user, priority, items)
+
+    def _run_group(self, n: int, user: str, priority: str, items: list):
+        # El span del lote continúa la traza de la primera petición muestreada y
+        # registra las de todas para correlacionarlas
+        request_spans = [request_span for _, _, request_span in items if request_span is not None]
+        parent = next((s for s in request_spans if s.sampled), None)
+        try:
+            with span('api.batch', high_volume=True, parent=parent, size=len(items), n_simulations=n,
+                      trace_ids=sorted({s.trace_id for s in request_spans})):
+                engine = self.scheduler.bind(self.engine, user=user, priority=priority)
+                results = engine.simulate_scenarios([scenario for scenario, _, _ in items], n)
+        except (JobTooLarge, MemoryBudgetExceeded) as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return
+            # El lote entero es demasiado grande: cada petición se intenta por separado
+            for item in items:
+                self._run_group(n, user, priority, [item])
+            return
+        except Exception as e:
+            for _, future, _ in items:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['computed'] += len(items)
+        for (_, future, _), result in zip(items, results):
+            future.set_result(result)
@@ -2,17 +2,33 @@ import hashlib
 import secrets
 from typing import Optional, Dict
 from ..database.neon_db import NeonDB
+from .session_store import SessionStore, MemorySessionStore, create_session_store
+from .listing_cache import ListingCache, cached_listing
+from ..utils.telemetry import get_logger
+from ..utils.instrumentation import DB_LATENCY, timed_methods
 
+logger = get_logger('auth')
+
+@timed_methods(DB_LATENCY, 'auth_manager', exclude=('hash_password',))
 class AuthManager:
-    def __init__(self):
+    def __init__(self, session_store: Optional[SessionStore] = None, db=None):
+        # Listados de proyectos/simulaciones por usuario, invalidados en cada escritura
+        self.listing_cache = ListingCache()
         try:
-            self.db = NeonDB()
+            # `db` permite otra base compatible con NeonDB (p. ej. la de las pruebas de carga)
+            self.db = db or NeonDB()
             self.create_auth_tables()
-            self.sessions = {}
         except Exception as e:
-            print(f"Error inicializando AuthManager: {e}")
+            logger.error("Error inicializando AuthManager: %s", e)
             self.db = None
-            self.sessions = {}
+        # Un fallo del almacén de sesiones no debe deshabilitar la autenticación
+        try:
+            # Un almacén vacío es falso (define __len__): se compara con None
+            self.sessions = session_store if session_store is not None else create_session_store(db=self.db)
+        except Exception as e:
+            logger.warning("Almacén de sesiones no disponible (%s); se usan sesiones en memoria", e)
+            self.sessions = MemorySessionStore()
+        self.sessions.start_reaper()
     
     def create_auth_tables(self):
         """Crea tablas de usuarios y sesiones"""
@@ -42,6 +58,53 @@ class AuthManager:
                         )
                     """)
                     
+                    # Crear tablas de simulaciones y visualizaciones
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS simulations (
+                            id SERIAL PRIMARY KEY,
+                            project_id INTEGER REFERENCES projects(id),
+                            name VARCHAR(255) NOT NULL,
+                            params JSONB,
+                            results JSONB,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                    """)
+                    
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS visualizations (
+                            id SERIAL PRIMARY KEY,
+                            simulation_id INTEGER REFERENCES simulations(id),
+                            name VARCHAR(255),
+                            type VARCHAR(50),
+                            figure JSONB,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        )
+                    """)
+                    
+                    # Contadores desnormalizados (evitan COUNT + GROUP BY en los listados)
+                    cur.execute("""
+                        ALTER TABLE projects
+                        ADD COLUMN IF NOT EXISTS simulation_count INTEGER NOT NULL DEFAULT 0
+                    """)
+                    cur.execute("""
+                        ALTER TABLE simulations
+                        ADD COLUMN IF NOT EXISTS visualization_count INTEGER NOT NULL DEFAULT 0
+                    """)
+                    
+                    # Índices para paginación por cursor (created_at, id)
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_projects_user_keyset
+                        ON projects (user_id, created_at DESC, id DESC)
+                    """)
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_simulations_project_keyset
+                        ON simulations (project_id, created_at DESC, id DESC)
+                    """)
+                    cur.execute("""
+                        CREATE INDEX IF NOT EXISTS idx_visualizations_simulation
+                        ON visualizations (simulation_id)
+                    """)
+                    
                     conn.commit()
                     
                     # Insertar usuario admin
@@ -53,10 +116,10 @@ class AuthManager:
                         """, (self.hash_password('admin123'),))
                         conn.commit()
                     except Exception as e:
-                        print(f"Usuario admin ya existe o error: {e}")
+                        logger.info("Usuario admin ya existe o error: %s", e)
                         
         except Exception as e:
-            print(f"Error creando tablas de autenticación: {e}")
+            logger.error("Error creando tablas de autenticación: %s", e)
     
     def hash_password(self, password: str) -> str:
         """Hash de contraseña"""
@@ -84,30 +147,42 @@ class AuthManager:
                             'email': user[2],
                             'role': user[3]
                         }
-                        self.sessions[session_id] = user_data
+                        self.sessions.set(session_id, user_data)
                         return {'session_id': session_id, 'user': user_data}
                     return None
         except Exception as e:
-            print(f"Error en login: {e}")
+            logger.error("Error en login: %s", e)
             return None
     
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        """Usuario de una sesión activa (renueva su expiración)"""
+        if not session_id:
+            return None
+        return self.sessions.get(session_id)
+    
+    def logout(self, session_id: str) -> bool:
+        """Cerrar sesión"""
+        return self.sessions.delete(session_id)
+    
+    @cached_listing('projects')
     def get_user_projects(self, user_id: int):
         """Obtener proyectos del usuario"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT p.id, p.name, p.description, p.created_at,
-                           COUNT(sim.id) as simulation_count
+                    SELECT p.id, p.name, p.description, p.created_at, p.simulation_count
                     FROM projects p
-                    LEFT JOIN simulations sim ON p.id = sim.project_id
                     WHERE p.user_id = %s
-                    GROUP BY p.id, p.name, p.description, p.created_at
                     ORDER BY p.created_at DESC
                 """, (user_id,))
 
                 columns = [desc[0] for desc in cur.description]
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
 
+    def get_user_projects_page(self, user_id: int, limit: int = 50, cursor=None):
+        """Obtener una página de proyectos del usuario con cursor (created_at, id)"""
+        return self.search_projects_page(user_id, '', limit, cursor)
+
     def create_project(self, user_id: int, name: str, description: str = ""):
         """Crear nuevo proyecto"""
         with self.db.get_connection() as conn:
@@ -118,7 +193,8 @@ class AuthManager:
                 """, (user_id, name, description))
                 project_id = cur.fetchone()[0]
                 conn.commit()
-                return project_id
+        self.listing_cache.invalidate(user_id, 'projects')
+        return project_id
 
     def delete_project(self, project_id: int, user_id: int):
         """Eliminar proyecto (solo del propietario)"""
@@ -128,73 +204,178 @@ class AuthManager:
                     DELETE FROM projects WHERE id = %s AND user_id = %s
                 """, (project_id, user_id))
                 conn.commit()
-                return cur.rowcount > 0
+                deleted = cur.rowcount > 0
+        if deleted:
+            self.listing_cache.invalidate(user_id, 'projects', 'simulations')
+        return deleted
 
+    @cached_listing('projects')
     def search_projects(self, user_id: int, query: str):
         """Buscar proyectos por nombre o descripción"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT p.id, p.name, p.description, p.created_at,
-                           COUNT(sim.id) as simulation_count
+                    SELECT p.id, p.name, p.description, p.created_at, p.simulation_count
                     FROM projects p
-                    LEFT JOIN simulations sim ON p.id = sim.project_id
                     WHERE p.user_id = %s AND (p.name ILIKE %s OR p.description ILIKE %s)
-                    GROUP BY p.id, p.name, p.description, p.created_at
                     ORDER BY p.created_at DESC
                 """, (user_id, f'%{query}%', f'%{query}%'))
 
                 columns = [desc[0] for desc in cur.description]
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
 
+    @cached_listing('projects')
+    def search_projects_page(self, user_id: int, query: str, limit: int = 50, cursor=None):
+        """Buscar proyectos paginados por cursor (created_at, id)"""
+        keyset_sql, keyset_params = NeonDB.keyset_clause(cursor, 'p.created_at', 'p.id')
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT p.id, p.name, p.description, p.created_at, p.simulation_count
+                    FROM projects p
+                    WHERE p.user_id = %s AND (p.name ILIKE %s OR p.description ILIKE %s) {keyset_sql}
+                    ORDER BY p.created_at DESC, p.id DESC
+                    LIMIT %s
+                """, (user_id, f'%{query}%', f'%{query}%', *keyset_params, limit + 1))
+
+                columns = [desc[0] for desc in cur.description]
+                rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        return NeonDB.paginate(rows, limit)
+
+    @cached_listing('simulations')
     def get_project_simulations(self, project_id: int, user_id: int):
         """Obtener simulaciones de un proyecto"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT s.id, s.name, s.params, s.results, s.created_at,
-                           COUNT(v.id) as visualization_count
+                    SELECT s.id, s.name, s.params, s.results, s.created_at, s.visualization_count
                     FROM simulations s
-                    LEFT JOIN visualizations v ON s.id = v.simulation_id
                     JOIN projects p ON s.project_id = p.id
                     WHERE s.project_id = %s AND p.user_id = %s
-                    GROUP BY s.id, s.name, s.params, s.results, s.created_at
                     ORDER BY s.created_at DESC
                 """, (project_id, user_id))
 
                 columns = [desc[0] for desc in cur.description]
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
 
+    @cached_listing('simulations')
+    def get_project_simulations_page(self, project_id: int, user_id: int, limit: int = 50, cursor=None):
+        """Obtener una página de simulaciones de un proyecto sin los JSON de params/results"""
+        keyset_sql, keyset_params = NeonDB.keyset_clause(cursor, 's.created_at', 's.id')
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT s.id, s.name, s.created_at, s.visualization_count
+                    FROM simulations s
+                    JOIN projects p ON s.project_id = p.id
+                    WHERE s.project_id = %s AND p.user_id = %s {keyset_sql}
+                    ORDER BY s.created_at DESC, s.id DESC
+                    LIMIT %s
+                """, (project_id, user_id, *keyset_params, limit + 1))
+
+                columns = [desc[0] for desc in cur.description]
+                rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        return NeonDB.paginate(rows, limit)
+
+    def get_simulation_detail(self, simulation_id: int, user_id: int):
+        """Obtener params y results completos de una simulación al abrirla"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT s.id, s.name, s.params, s.results, s.created_at,
+                           p.id as project_id, p.name as project_name
+                    FROM simulations s
+                    JOIN projects p ON s.project_id = p.id
+                    WHERE s.id = %s AND p.user_id = %s
+                """, (simulation_id, user_id))
+
+                row = cur.fetchone()
+                if row:
+                    columns = [desc[0] for desc in cur.description]
+                    return dict(zip(columns, row))
+                return None
+
     def create_simulation(self, project_id: int, name: str, params: dict, results: dict = None):
         """Crear nueva simulación"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
+                # Inserción e incremento del contador del proyecto en la misma sentencia;
+                # se obtiene también el propietario para invalidar solo sus listados
                 cur.execute("""
-                    INSERT INTO simulations (project_id, name, params, results)
-                    VALUES (%s, %s, %s, %s) RETURNING id
+                    WITH new_simulation AS (
+                        INSERT INTO simulations (project_id, name, params, results)
+                        VALUES (%s, %s, %s, %s) RETURNING id, project_id
+                    ), counter AS (
+                        UPDATE projects p SET simulation_count = p.simulation_count + 1
+                        FROM new_simulation ns WHERE p.id = ns.project_id
+                        RETURNING p.user_id
+                    )
+                    SELECT ns.id, counter.user_id FROM new_simulation ns, counter
                 """, (project_id, name, params, results))
-                simulation_id = cur.fetchone()[0]
+                simulation_id, owner_id = cur.fetchone()
+                conn.commit()
+        self.listing_cache.invalidate(owner_id, 'projects', 'simulations')
+        return simulation_id
+
+    def delete_simulation(self, simulation_id: int, user_id: int):
+        """Eliminar simulación (solo del propietario) y descontarla del proyecto"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    WITH deleted AS (
+                        DELETE FROM simulations s
+                        USING projects p
+                        WHERE s.id = %s AND s.project_id = p.id AND p.user_id = %s
+                        RETURNING s.id, s.project_id
+                    ), deleted_visualizations AS (
+                        DELETE FROM visualizations v USING deleted d WHERE v.simulation_id = d.id
+                    )
+                    UPDATE projects p SET simulation_count = GREATEST(p.simulation_count - 1, 0)
+                    FROM deleted d WHERE p.id = d.project_id
+                """, (simulation_id, user_id))
                 conn.commit()
-                return simulation_id
+                deleted = cur.rowcount > 0
+        if deleted:
+            self.listing_cache.invalidate(user_id, 'projects', 'simulations')
+        return deleted
 
+    @cached_listing('simulations')
     def search_simulations(self, user_id: int, query: str):
         """Buscar simulaciones por nombre"""
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT s.id, s.name, s.params, s.results, s.created_at,
-                           p.name as project_name, COUNT(v.id) as visualization_count
+                           p.name as project_name, s.visualization_count
                     FROM simulations s
                     JOIN projects p ON s.project_id = p.id
-                    LEFT JOIN visualizations v ON s.id = v.simulation_id
                     WHERE p.user_id = %s AND s.name ILIKE %s
-                    GROUP BY s.id, s.name, s.params, s.results, s.created_at, p.name
                     ORDER BY s.created_at DESC
                 """, (user_id, f'%{query}%'))
 
                 columns = [desc[0] for desc in cur.description]
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
 
+    @cached_listing('simulations')
+    def search_simulations_page(self, user_id: int, query: str, limit: int = 50, cursor=None):
+        """Buscar simulaciones paginadas por cursor (created_at, id) con columnas ligeras"""
+        keyset_sql, keyset_params = NeonDB.keyset_clause(cursor, 's.created_at', 's.id')
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT s.id, s.name, s.created_at,
+                           p.name as project_name, s.visualization_count
+                    FROM simulations s
+                    JOIN projects p ON s.project_id = p.id
+                    WHERE p.user_id = %s AND s.name ILIKE %s {keyset_sql}
+                    ORDER BY s.created_at DESC, s.id DESC
+                    LIMIT %s
+                """, (user_id, f'%{query}%', *keyset_params, limit + 1))
+
+                columns = [desc[0] for desc in cur.description]
+                rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        return NeonDB.paginate(rows, limit)
+
     def get_simulation_visualizations(self, simulation_id: int, user_id: int):
         """Obtener visualizaciones de una simulación"""
         with self.db.get_connection() as conn:
@@ -216,12 +397,79 @@ class AuthManager:
         with self.db.get_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    INSERT INTO visualizations (simulation_id, name, type, figure)
-                    VALUES (%s, %s, %s, %s) RETURNING id
+                    WITH new_visualization AS (
+                        INSERT INTO visualizations (simulation_id, name, type, figure)
+                        VALUES (%s, %s, %s, %s) RETURNING id, simulation_id
+                    ), counter AS (
+                        UPDATE simulations s SET visualization_count = s.visualization_count + 1
+                        FROM new_visualization nv WHERE s.id = nv.simulation_id
+                        RETURNING s.project_id
+                    )
+                    SELECT nv.id, p.user_id
+                    FROM new_visualization nv, counter
+                    JOIN projects p ON p.id = counter.project_id
                 """, (simulation_id, name, viz_type, figure))
-                viz_id = cur.fetchone()[0]
+                viz_id, owner_id = cur.fetchone()
+                conn.commit()
+        self.listing_cache.invalidate(owner_id, 'simulations')
+        return viz_id
+
+    def delete_visualization(self, visualization_id: int, user_id: int):
+        """Eliminar visualización (solo del propietario) y descontarla de la simulación"""
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    WITH deleted AS (
+                        DELETE FROM visualizations v
+                        USING simulations s, projects p
+                        WHERE v.id = %s AND v.simulation_id = s.id
+                          AND s.project_id = p.id AND p.user_id = %s
+                        RETURNING v.simulation_id
+                    )
+                    UPDATE simulations s SET visualization_count = GREATEST(s.visualization_count - 1, 0)
+                    FROM deleted d WHERE s.id = d.simulation_id
+                """, (visualization_id, user_id))
+                conn.commit()
+                deleted = cur.rowcount > 0
+        if deleted:
+            self.listing_cache.invalidate(user_id, 'simulations')
+        return deleted
+
+    def reconcile_counters(self):
+        """Recalcular simulation_count y visualization_count desde las tablas hijas
+
+        Corrige la deriva de los contadores (escrituras hechas fuera de AuthManager,
+        borrados en cascada, cargas masivas). Solo actualiza las filas que difieren y
+        retorna cuántas se corrigieron por tabla.
+        """
+        with self.db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE projects p SET simulation_count = c.total
+                    FROM (
+                        SELECT p2.id, COUNT(s.id) AS total
+                        FROM projects p2
+                        LEFT JOIN simulations s ON s.project_id = p2.id
+                        GROUP BY p2.id
+                    ) c
+                    WHERE p.id = c.id AND p.simulation_count <> c.total
+                """)
+                projects_fixed = cur.rowcount
+                cur.execute("""
+                    UPDATE simulations s SET visualization_count = c.total
+                    FROM (
+                        SELECT s2.id, COUNT(v.id) AS total
+                        FROM simulations s2
+                        LEFT JOIN visualizations v ON v.simulation_id = s2.id
+                        GROUP BY s2.id
+                    ) c
+                    WHERE s.id = c.id AND s.visualization_count <> c.total
+                """)
+                simulations_fixed = cur.rowcount
                 conn.commit()
-                return viz_id
+        if projects_fixed or simulations_fixed:
+            self.listing_cache.clear()
+        return {'projects': projects_fixed, 'simulations': simulations_fixed}
 
     def get_all_users(self):
         """Obtener todos los usuarios (solo admin)"""
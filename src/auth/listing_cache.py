@@ -0,0 +1,135 @@
+import copy
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set
+
+from ..utils.instrumentation import record_cache
+
+
+class ListingCache:
+    """Caché de lectura por usuario para listados de proyectos y simulaciones
+
+    Las entradas se agrupan por usuario y tipo de listado ('projects', 'simulations') para
+    que cada escritura invalide exactamente los listados que afecta. El TTL corto acota
+    lo desactualizado que puede estar un listado en otro proceso que no vio la escritura.
+
+    Cada invalidación incrementa la generación de lo invalidado: una carga que empezó
+    antes no se guarda, porque pudo leer datos anteriores a la escritura. Los valores se
+    copian al guardarlos y al retornarlos, así que modificar un listado no altera la caché.
+
+    Las entradas viven en un OrderedDict ordenado por último acceso y limitado a
+    `max_entries` (se descartan las menos usadas); al guardar se eliminan además las
+    caducadas, como mucho una vez por TTL.
+    """
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: Optional[int] = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (user_id, kind, key) -> (expires_at, value)
+        self._user_keys: Dict[Any, Set[tuple]] = {}  # user_id -> claves de _entries, para invalidar
+        self._next_purge = time.monotonic() + ttl_seconds
+        # Generaciones: global (clear), por usuario (invalidate sin tipos) y por (usuario, tipo)
+        self._epoch = 0
+        self._user_generations: Dict[Any, int] = {}
+        self._kind_generations: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_loads = 0
+
+    def get_or_load(self, user_id, kind: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Retorna una copia del listado en caché o lo carga con `loader` y lo guarda"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((user_id, kind, key))
+            hit = entry is not None and entry[0] > now
+            if hit:
+                self.hits += 1
+                self._entries.move_to_end((user_id, kind, key))
+            else:
+                self.misses += 1
+                generation = self._generation(user_id, kind)
+        record_cache('listings', hit)
+        if hit:
+            return copy.deepcopy(entry[1])
+
+        value = loader()
+        stored = copy.deepcopy(value)
+        with self._lock:
+            if self._generation(user_id, kind) != generation:
+                # Invalidado durante la carga: el valor puede ser anterior a la escritura
+                self.stale_loads += 1
+            else:
+                self._store((user_id, kind, key), (now + self.ttl_seconds, stored))
+        return value
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _store(self, entry_key: tuple, entry: tuple):
+        # Con el lock tomado
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._next_purge = now + self.ttl_seconds
+            for expired in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                self._discard(expired)
+        self._entries[entry_key] = entry
+        self._entries.move_to_end(entry_key)
+        self._user_keys.setdefault(entry_key[0], set()).add(entry_key)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, entry_key: tuple):
+        # Con el lock tomado
+        del self._entries[entry_key]
+        user_keys = self._user_keys[entry_key[0]]
+        user_keys.discard(entry_key)
+        if not user_keys:
+            del self._user_keys[entry_key[0]]
+
+    def invalidate(self, user_id, *kinds: str):
+        """Descarta los listados del usuario de los tipos indicados (todos si no se indica)"""
+        with self._lock:
+            if kinds:
+                for kind in kinds:
+                    self._kind_generations[(user_id, kind)] = self._kind_generations.get((user_id, kind), 0) + 1
+            else:
+                self._user_generations[user_id] = self._user_generations.get(user_id, 0) + 1
+            for entry_key in list(self._user_keys.get(user_id, ())):
+                if not kinds or entry_key[1] in kinds:
+                    self._discard(entry_key)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _generation(self, user_id, kind: str) -> tuple:
+        return self._epoch, self._user_generations.get(user_id, 0), self._kind_generations.get((user_id, kind), 0)
+
+
+def cached_listing(kind: str):
+    """Decora un método de AuthManager con argumento `user_id` para leer de self.listing_cache"""
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'listing_cache', None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {k: v for k, v in bound.arguments.items() if k != 'self'}
+            key = method.__name__ + json.dumps(arguments, sort_keys=True, default=str)
+            return cache.get_or_load(arguments['user_id'], kind, key,
+                                     lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,264 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from ..utils.telemetry import get_logger
+
+logger = get_logger('sessions')
+
+
+class SessionStore:
+    """Almacén de sesiones con expiración deslizante y limpieza en segundo plano
+
+    Cada acceso válido con get() renueva la expiración de la sesión (TTL deslizante).
+    Las subclases implementan el backend: memoria del proceso, SQLite/archivo local
+    compartido entre procesos de la misma máquina o una tabla de Postgres.
+    """
+
+    def __init__(self, ttl_seconds: float = 8 * 3600, reap_interval: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self.reap_interval = reap_interval
+        self._reaper = None
+        self._stop_reaper = threading.Event()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Retorna los datos del usuario de la sesión y renueva su expiración"""
+        raise NotImplementedError
+
+    def set(self, session_id: str, user_data: Dict):
+        """Crea o reemplaza una sesión"""
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> bool:
+        """Elimina una sesión (logout)"""
+        raise NotImplementedError
+
+    def reap(self) -> int:
+        """Elimina las sesiones caducadas y retorna cuántas se borraron"""
+        raise NotImplementedError
+
+    def start_reaper(self):
+        """Inicia el hilo de limpieza periódica de sesiones caducadas"""
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._stop_reaper.clear()
+        self._reaper = threading.Thread(target=self._reap_loop, name='session-reaper', daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self):
+        """Detiene el hilo de limpieza"""
+        self._stop_reaper.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=self.reap_interval)
+            self._reaper = None
+
+    def _reap_loop(self):
+        while not self._stop_reaper.wait(self.reap_interval):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error("Error limpiando sesiones: %s", e)
+
+
+class MemorySessionStore(SessionStore):
+    """Sesiones en memoria del proceso con TTL deslizante y límite LRU
+
+    El OrderedDict se mantiene ordenado por último acceso; como el TTL es el mismo para
+    todas, ese orden coincide con el de expiración y la limpieza solo mira el principio.
+    """
+
+    def __init__(self, ttl_seconds: float = 8 * 3600, reap_interval: float = 60,
+                 max_sessions: Optional[int] = 100_000):
+        super().__init__(ttl_seconds, reap_interval)
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (expires_at, user_data)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, user_data = entry
+            if expires_at < now:
+                del self._sessions[session_id]
+                return None
+            self._sessions[session_id] = (now + self.ttl_seconds, user_data)
+            self._sessions.move_to_end(session_id)
+            return user_data
+
+    def set(self, session_id: str, user_data: Dict):
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl_seconds, user_data)
+            self._sessions.move_to_end(session_id)
+            if self.max_sessions is not None:
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def reap(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            while self._sessions:
+                session_id, (expires_at, _) = next(iter(self._sessions.items()))
+                if expires_at >= now:
+                    break
+                del self._sessions[session_id]
+                removed += 1
+        return removed
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sesiones en un archivo SQLite local, compartido por los workers de la misma máquina"""
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = 8 * 3600, reap_interval: float = 60):
+        super().__init__(ttl_seconds, reap_interval)
+        self.path = path or os.getenv('SESSION_DB_PATH', 'sessions.sqlite3')
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    user_data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo; WAL permite lectores concurrentes de varios procesos
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        now = time.time()
+        with self._connection() as conn:
+            row = conn.execute("SELECT user_data FROM sessions WHERE session_id = ? AND expires_at >= ?",
+                               (session_id, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE session_id = ?",
+                         (now + self.ttl_seconds, session_id))
+        return json.loads(row[0])
+
+    def set(self, session_id: str, user_data: Dict):
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, user_data, expires_at) VALUES (?, ?, ?)",
+                         (session_id, json.dumps(user_data, default=str), time.time() + self.ttl_seconds))
+
+    def delete(self, session_id: str) -> bool:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def reap(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class PostgresSessionStore(SessionStore):
+    """Sesiones en una tabla de Postgres compartida por todos los nodos web"""
+
+    def __init__(self, db, ttl_seconds: float = 8 * 3600, reap_interval: float = 60):
+        super().__init__(ttl_seconds, reap_interval)
+        self.db = db
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS auth_sessions (
+                        session_id VARCHAR(64) PRIMARY KEY,
+                        user_data JSONB NOT NULL,
+                        expires_at TIMESTAMP NOT NULL
+                    )
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_auth_sessions_expires
+                    ON auth_sessions (expires_at)
+                """)
+                conn.commit()
+
+    @contextmanager
+    def _connection(self):
+        # `with conn` de psycopg2 confirma o revierte la transacción pero no cierra la
+        # conexión: se cierra aquí para no dejar una abierta por petición
+        conn = self.db.get_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        # Lectura y renovación de la expiración en una sola ida y vuelta
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE auth_sessions
+                    SET expires_at = NOW() + %s * INTERVAL '1 second'
+                    WHERE session_id = %s AND expires_at >= NOW()
+                    RETURNING user_data
+                """, (self.ttl_seconds, session_id))
+                row = cur.fetchone()
+                conn.commit()
+                return row[0] if row else None
+
+    def set(self, session_id: str, user_data: Dict):
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO auth_sessions (session_id, user_data, expires_at)
+                    VALUES (%s, %s, NOW() + %s * INTERVAL '1 second')
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET user_data = EXCLUDED.user_data, expires_at = EXCLUDED.expires_at
+                """, (session_id, json.dumps(user_data, default=str), self.ttl_seconds))
+                conn.commit()
+
+    def delete(self, session_id: str) -> bool:
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM auth_sessions WHERE session_id = %s", (session_id,))
+                conn.commit()
+                return cur.rowcount > 0
+
+    def reap(self) -> int:
+        with self._connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM auth_sessions WHERE expires_at < NOW()")
+                conn.commit()
+                return cur.rowcount
+
+
+def create_session_store(backend: Optional[str] = None, db=None, **kwargs) -> SessionStore:
+    """Crea el almacén de sesiones configurado (SESSION_BACKEND: memory, sqlite o postgres)"""
+    backend = (backend or os.getenv('SESSION_BACKEND', 'memory')).lower()
+    if 'ttl_seconds' not in kwargs and os.getenv('SESSION_TTL_SECONDS'):
+        kwargs['ttl_seconds'] = float(os.getenv('SESSION_TTL_SECONDS'))
+
+    if backend == 'sqlite':
+        return SQLiteSessionStore(**kwargs)
+    if backend == 'postgres':
+        if db is None:
+            raise ValueError("El backend de sesiones 'postgres' necesita una conexión NeonDB")
+        return PostgresSessionStore(db, **kwargs)
+    if backend == 'memory':
+        return MemorySessionStore(**kwargs)
+    raise ValueError(f"Backend de sesiones desconocido: {backend}")
@@ -1,12 +1,25 @@
 import psycopg2
 import json
 import os
+import secrets
+from decimal import Decimal
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple
+import numpy as np
 import pandas as pd
 
+from ..utils.instrumentation import DB_LATENCY, timed_methods
+
 load_dotenv()
 
+# Columnas ligeras para listados; los parámetros completos se cargan al abrir un escenario
+SCENARIO_LIST_COLUMNS = ('id', 'name', 'initial_investment', 'time_horizon', 'project_id', 'created_at')
+
+# Arrays por trayectoria guardados dentro de results_data
+RESULT_ARRAY_KEYS = ('npv_values', 'roi_values', 'break_even_months', 'irr_values', 'discounted_payback_months')
+
+# Latencia de cada método público (get_connection incluida: tiempo de conexión)
+@timed_methods(DB_LATENCY, 'neon_db')
 class NeonDB:
     def __init__(self):
         self.connection_string = os.getenv('NEON_DATABASE_URL')
@@ -51,6 +64,21 @@ class NeonDB:
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
+                
+                # Índices para paginación por cursor (created_at, id)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_scenarios_keyset
+                    ON scenarios (created_at DESC, id DESC)
+                """)
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_simulation_results_scenario
+                    ON simulation_results (scenario_id, created_at DESC)
+                """)
+                # Orden de recorrido de iter_simulation_results: sin él cada recorrido ordena la tabla entera
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_simulation_results_created
+                    ON simulation_results (created_at, id)
+                """)
                 conn.commit()
     
     def save_scenario(self, scenario) -> int:
@@ -72,7 +100,10 @@ class NeonDB:
             'npv_values': result.net_present_values.tolist(),
             'roi_values': result.roi_values.tolist(),
             'break_even_months': result.break_even_months.tolist(),
-            'metrics': metrics
+            # JSONB no admite NaN/inf: las trayectorias sin TIR/payback se guardan como null
+            'irr_values': self._nan_to_none(result.irr_values),
+            'discounted_payback_months': self._nan_to_none(result.discounted_payback_months),
+            'metrics': {k: None if isinstance(v, float) and not np.isfinite(v) else v for k, v in metrics.items()}
         }
         
         with self.get_connection() as conn:
@@ -94,6 +125,44 @@ class NeonDB:
                 columns = [desc[0] for desc in cur.description]
                 return [dict(zip(columns, row)) for row in cur.fetchall()]
     
+    def get_scenarios_page(self, limit: int = 50, cursor: Optional[Sequence] = None,
+                           columns: Sequence[str] = SCENARIO_LIST_COLUMNS) -> Tuple[List[Dict], Optional[List]]:
+        """Obtiene una página de escenarios con cursor (created_at, id) y columnas explícitas"""
+        column_sql = ', '.join(columns)
+        keyset_sql, keyset_params = self.keyset_clause(cursor, 'created_at', 'id')
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT {column_sql} FROM scenarios
+                    WHERE TRUE {keyset_sql}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                """, (*keyset_params, limit + 1))
+                columns = [desc[0] for desc in cur.description]
+                rows = [dict(zip(columns, row)) for row in cur.fetchall()]
+        return self.paginate(rows, limit)
+    
+    @staticmethod
+    def keyset_clause(cursor: Optional[Sequence], created_col: str, id_col: str) -> Tuple[str, tuple]:
+        """Construye la condición de paginación por cursor (created_at, id) descendente"""
+        if not cursor:
+            return '', ()
+        created_at, row_id = cursor
+        return f"AND ({created_col}, {id_col}) < (%s::timestamp, %s)", (created_at, row_id)
+    
+    @staticmethod
+    def paginate(rows: List[Dict], limit: int) -> Tuple[List[Dict], Optional[List]]:
+        """Recorta una consulta de limit + 1 filas y calcula el cursor de la siguiente página"""
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        created_at = last['created_at']
+        # Cursor serializable a JSON para poder guardarlo en dcc.Store
+        if hasattr(created_at, 'isoformat'):
+            created_at = created_at.isoformat()
+        return rows, [created_at, last['id']]
+    
     def get_simulation_results(self, scenario_id: int) -> Optional[Dict]:
         """Obtiene resultados de simulación por escenario"""
         with self.get_connection() as conn:
@@ -107,4 +176,65 @@ class NeonDB:
                 if row:
                     columns = [desc[0] for desc in cur.description]
                     return dict(zip(columns, row))
-                return None
\ No newline at end of file
+                return None
+    
+    def iter_simulation_results(self, itersize: int = 1000, scenario_id: Optional[int] = None,
+                                since=None, include_data: bool = True) -> Iterator[List[Dict]]:
+        """Recorre simulation_results con un cursor de servidor y produce lotes decodificados
+        
+        Solo se mantiene en memoria un lote de `itersize` filas a la vez, por lo que
+        recorrer todo el histórico usa memoria constante y el primer lote llega de inmediato.
+        """
+        columns = ['id', 'scenario_id', 'mean_npv', 'std_npv', 'success_probability',
+                   'var_95', 'roi_mean', 'break_even_mean', 'created_at']
+        if include_data:
+            columns.append('results_data')
+        
+        conditions, params = [], []
+        if scenario_id is not None:
+            conditions.append("scenario_id = %s")
+            params.append(scenario_id)
+        if since is not None:
+            conditions.append("created_at >= %s")
+            params.append(since)
+        where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        conn = self.get_connection()
+        try:
+            # Un cursor con nombre vive en el servidor y envía las filas por bloques
+            with conn.cursor(name=f"iter_results_{secrets.token_hex(4)}") as cur:
+                cur.itersize = itersize
+                cur.execute(f"""
+                    SELECT {', '.join(columns)} FROM simulation_results
+                    {where_sql}
+                    ORDER BY created_at, id
+                """, params)
+                while True:
+                    rows = cur.fetchmany(itersize)
+                    if not rows:
+                        break
+                    yield [self._decode_result_row(dict(zip(columns, row))) for row in rows]
+        finally:
+            conn.rollback()
+            conn.close()
+    
+    @staticmethod
+    def _nan_to_none(values: np.ndarray) -> List:
+        return [None if np.isnan(v) else v for v in values.tolist()]
+    
+    @staticmethod
+    def _decode_result_row(row: Dict) -> Dict:
+        """Convierte DECIMAL a float y las listas de results_data a arrays de NumPy"""
+        for key, value in row.items():
+            if isinstance(value, Decimal):
+                row[key] = float(value)
+        
+        data = row.get('results_data')
+        if isinstance(data, str):
+            data = json.loads(data)
+        if data:
+            for key in RESULT_ARRAY_KEYS:
+                if key in data:
+                    data[key] = np.array([np.nan if v is None else v for v in data[key]], dtype=np.float64)
+            row['results_data'] = data
+        return row
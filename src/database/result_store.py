@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from ..models.business_scenario import SimulationResult
+
+
+class LocalResultStore:
+    """Almacén local de resultados de simulación en archivos .npy mapeables en memoria
+
+    Cada ejecución se guarda como un único archivo .npy de forma (5, n_simulaciones)
+    en orden C, de modo que cada array por trayectoria (NPV, ROI, break-even) ocupa un
+    bloque contiguo. Un índice JSON relaciona (hash de escenario, run id) con el archivo,
+    los offsets en bytes de cada array y las estadísticas resumen.
+
+    Varios procesos pueden compartir el directorio: cada modificación del índice se hace
+    bajo un bloqueo de archivo, releyendo el índice del disco y combinando el cambio, y
+    las lecturas recargan el índice si otro proceso lo ha reescrito.
+    """
+
+    ARRAY_FIELDS = SimulationResult.ARRAY_FIELDS
+    SUMMARY_FIELDS = SimulationResult.SUMMARY_FIELDS
+    INDEX_FILE = 'index.json'
+    LOCK_FILE = 'index.lock'
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = 2 * 1024 ** 3,
+                 max_age_days: Optional[float] = 30):
+        self.root = root or os.getenv('RESULT_STORE_DIR', '.result_store')
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._index_stamp = None
+        self._index = {}
+        self._refresh_index()
+
+    @staticmethod
+    def scenario_hash(scenario) -> str:
+        """Hash estable de los parámetros de un BusinessScenario"""
+        payload = json.dumps(asdict(scenario), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def save(self, scenario_hash: str, result: SimulationResult, run_id: Optional[str] = None) -> str:
+        """Guarda los arrays de un resultado y retorna el run id
+
+        Lanza ValueError si la ejecución por sí sola no cabe en max_bytes: se guardaría
+        para ser eliminada de inmediato por la retención.
+        """
+        run_id = run_id or uuid.uuid4().hex[:12]
+        n = len(result.net_present_values)
+        data_bytes = len(self.ARRAY_FIELDS) * n * np.dtype(np.float64).itemsize
+        if self.max_bytes is not None and data_bytes > self.max_bytes:
+            raise ValueError(f"La ejecución ocupa {data_bytes} bytes y el almacén admite {self.max_bytes}")
+        filename = f"{scenario_hash}_{run_id}.npy"
+        path = os.path.join(self.root, filename)
+
+        data = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(len(self.ARRAY_FIELDS), n))
+        data[:] = result.paths
+        data.flush()
+        header_offset = data.offset
+        del data
+
+        row_bytes = n * np.dtype(np.float64).itemsize
+        entry = {
+            'scenario_hash': scenario_hash,
+            'run_id': run_id,
+            'scenario_name': result.scenario_name,
+            'file': filename,
+            'dtype': '<f8',
+            'n_simulations': n,
+            'offsets': {field: header_offset + row * row_bytes for row, field in enumerate(self.ARRAY_FIELDS)},
+            'nbytes': os.path.getsize(path),
+            'summary': {field: float(getattr(result, field)) for field in self.SUMMARY_FIELDS},
+            'created_at': time.time(),
+        }
+
+        key = self._key(scenario_hash, run_id)
+        with self._locked_index():
+            self._index[key] = entry
+            self._enforce_retention(keep=key)
+        return run_id
+
+    def load(self, scenario_hash: str, run_id: Optional[str] = None) -> Optional[SimulationResult]:
+        """Abre un resultado como vistas np.memmap de solo lectura (sin copiar los datos)"""
+        entry = self._entry(scenario_hash, run_id)
+        if entry is None:
+            return None
+
+        # El archivo tiene la misma disposición (5, n) que SimulationResult.paths; los
+        # guardados antes de añadir TIR/payback tienen 3 filas y from_paths los completa
+        paths = np.load(os.path.join(self.root, entry['file']), mmap_mode='r')
+        return SimulationResult.from_paths(entry['scenario_name'], paths, entry['summary'], readonly=True)
+
+    def open_array(self, scenario_hash: str, field: str, run_id: Optional[str] = None) -> Optional[np.memmap]:
+        """Mapea un único array por trayectoria usando el offset registrado en el índice"""
+        entry = self._entry(scenario_hash, run_id)
+        if entry is None or field not in entry['offsets']:
+            return None
+        return np.memmap(os.path.join(self.root, entry['file']), dtype=entry['dtype'], mode='r',
+                         offset=entry['offsets'][field], shape=(entry['n_simulations'],))
+
+    def list_runs(self, scenario_hash: Optional[str] = None) -> List[Dict]:
+        """Lista las ejecuciones guardadas, de la más reciente a la más antigua"""
+        with self._lock:
+            self._refresh_index()
+            entries = [dict(e) for e in self._index.values()
+                       if scenario_hash is None or e['scenario_hash'] == scenario_hash]
+        return sorted(entries, key=lambda e: e['created_at'], reverse=True)
+
+    def delete(self, scenario_hash: str, run_id: str) -> bool:
+        """Elimina una ejecución del índice y del disco"""
+        with self._locked_index():
+            return self._remove(self._key(scenario_hash, run_id))
+
+    def total_bytes(self) -> int:
+        """Tamaño total ocupado por los archivos del almacén"""
+        with self._lock:
+            self._refresh_index()
+            return sum(e['nbytes'] for e in self._index.values())
+
+    def enforce_retention(self):
+        """Aplica la política de retención (antigüedad máxima y tamaño máximo)"""
+        with self._locked_index():
+            self._enforce_retention()
+
+    def _enforce_retention(self, keep: Optional[str] = None):
+        # Primero se descartan las ejecuciones caducadas, luego las más antiguas hasta caber en
+        # max_bytes; `keep` (la ejecución recién guardada) nunca se descarta
+        if self.max_age_days is not None:
+            cutoff = time.time() - self.max_age_days * 86400
+            for key in [k for k, e in self._index.items() if e['created_at'] < cutoff and k != keep]:
+                self._remove(key)
+
+        if self.max_bytes is not None:
+            total = sum(e['nbytes'] for e in self._index.values())
+            for key in sorted(self._index, key=lambda k: self._index[k]['created_at']):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                total -= self._index[key]['nbytes']
+                self._remove(key)
+
+    def _entry(self, scenario_hash: str, run_id: Optional[str]) -> Optional[Dict]:
+        with self._lock:
+            self._refresh_index()
+            if run_id is not None:
+                return self._index.get(self._key(scenario_hash, run_id))
+            runs = [e for e in self._index.values() if e['scenario_hash'] == scenario_hash]
+            return max(runs, key=lambda e: e['created_at']) if runs else None
+
+    def _remove(self, key: str) -> bool:
+        entry = self._index.pop(key, None)
+        if entry is None:
+            return False
+        try:
+            os.remove(os.path.join(self.root, entry['file']))
+        except FileNotFoundError:
+            pass
+        return True
+
+    @staticmethod
+    def _key(scenario_hash: str, run_id: str) -> str:
+        return f"{scenario_hash}/{run_id}"
+
+    @contextmanager
+    def _locked_index(self):
+        # Lectura-modificación-escritura del índice en exclusiva entre hilos y procesos:
+        # se parte del índice actual en disco, no de la copia en memoria de este proceso
+        with self._lock, open(os.path.join(self.root, self.LOCK_FILE), 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                self._refresh_index()
+                yield
+                self._write_index()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _refresh_index(self):
+        # Con self._lock tomado: recarga el índice si otro proceso lo ha reescrito
+        path = os.path.join(self.root, self.INDEX_FILE)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._index, self._index_stamp = {}, None
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp != self._index_stamp:
+            with open(path) as f:
+                self._index = json.load(f)
+            self._index_stamp = stamp
+
+    def _write_index(self):
+        # Escritura atómica: otro proceso nunca ve un índice a medio escribir
+        path = os.path.join(self.root, self.INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, path)
+        stat = os.stat(path)
+        self._index_stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
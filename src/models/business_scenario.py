@@ -1,6 +1,6 @@
 import numpy as np
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 @dataclass
 class BusinessScenario:
@@ -15,16 +15,246 @@ class BusinessScenario:
     market_volatility: float = 0.15
     time_horizon: int = 12  # meses
 
-@dataclass
+# Percentiles de NPV de las métricas de riesgo (además de P5/P95 del resumen)
+NPV_PERCENTILES = (10, 25, 50, 75, 90)
+# Niveles de cola extrema: sufijo de la métrica -> nivel de confianza
+TAIL_LEVELS = {'995': 0.995, '999': 0.999}
+# Percentil de NPV de cada cola (redondeado: 1 - 0.995 no es exacto en coma flotante)
+TAIL_PERCENTS = tuple(round((1 - level) * 100, 10) for level in TAIL_LEVELS.values())
+
+def _rebuild_result(scenario_name, paths, summary, metrics, strata=None):
+    """Reconstruye un SimulationResult serializado (ver SimulationResult.__reduce__)"""
+    result = SimulationResult.from_paths(scenario_name, paths, summary)
+    result._metrics = metrics
+    result.strata = strata
+    return result
+
 class SimulationResult:
-    """Resultado de simulación Monte Carlo"""
-    scenario_name: str
-    net_present_values: np.ndarray
-    roi_values: np.ndarray
-    break_even_months: np.ndarray
-    success_probability: float
-    mean_npv: float
-    std_npv: float
-    percentile_5: float
-    percentile_95: float
-    var_95: float  # Value at Risk al 95%
\ No newline at end of file
+    """Resultado de simulación Monte Carlo
+    
+    Los arrays por trayectoria viven en un único bloque contiguo `paths` de forma
+    (5, n_simulaciones); net_present_values, roi_values, break_even_months,
+    irr_values (TIR anual en %) y discounted_payback_months son vistas de sus filas.
+    TIR y payback descontado son NaN en las trayectorias donde no existen. Con
+    __slots__ no hay __dict__ por instancia. Los percentiles de NPV del resumen y de
+    las métricas salen de una sola llamada a np.percentile y se memorizan.
+    """
+    
+    __slots__ = ('scenario_name', 'paths', 'success_probability', 'mean_npv', 'std_npv',
+                 'percentile_5', 'percentile_95', 'var_95', 'strata', '_metrics', '_npv_quantiles', '_release',
+                 '__weakref__')
+    
+    # Filas de `paths`, en orden
+    ARRAY_FIELDS = ('net_present_values', 'roi_values', 'break_even_months',
+                    'irr_values', 'discounted_payback_months')
+    # Bloques guardados antes de añadir TIR y payback descontado (solo las 3 primeras filas)
+    LEGACY_ROWS = 3
+    SUMMARY_FIELDS = ('success_probability', 'mean_npv', 'std_npv', 'percentile_5', 'percentile_95', 'var_95')
+    # Percentiles de NPV calculados junto al resumen: P5/P95, los de las métricas y los de las colas
+    NPV_QUANTILES = (5, 95) + NPV_PERCENTILES + TAIL_PERCENTS
+    
+    def __init__(self, scenario_name: str, net_present_values: np.ndarray, roi_values: np.ndarray,
+                 break_even_months: np.ndarray, success_probability: float, mean_npv: float,
+                 std_npv: float, percentile_5: float, percentile_95: float,
+                 var_95: float,  # var_95: Value at Risk al 95%
+                 irr_values: Optional[np.ndarray] = None,
+                 discounted_payback_months: Optional[np.ndarray] = None):
+        self.scenario_name = scenario_name
+        self.paths = self._stack_rows(net_present_values, roi_values, break_even_months,
+                                      irr_values, discounted_payback_months)
+        self._release = None
+        self.success_probability = success_probability
+        self.mean_npv = mean_npv
+        self.std_npv = std_npv
+        self.percentile_5 = percentile_5
+        self.percentile_95 = percentile_95
+        self.var_95 = var_95
+        # Estrato de cada trayectoria si mean_npv y success_probability son postestratificados
+        self.strata = None
+        self._metrics = None
+        self._npv_quantiles = {}
+    
+    @classmethod
+    def from_paths(cls, scenario_name: str, paths: np.ndarray, summary: Optional[Dict] = None,
+                   readonly: bool = False, release: Optional[Callable[[], None]] = None) -> 'SimulationResult':
+        """Envuelve un bloque (5, n) existente sin copiarlo; calcula el resumen si no se pasa
+        
+        Un bloque antiguo de 3 filas se copia añadiendo TIR y payback descontado como NaN.
+        `release` libera el buffer de `paths` (p. ej. memoria compartida) al llamar a release().
+        """
+        if paths.ndim == 2 and paths.shape[0] == cls.LEGACY_ROWS:
+            paths = np.concatenate([paths, np.full((len(cls.ARRAY_FIELDS) - cls.LEGACY_ROWS, paths.shape[1]),
+                                                   np.nan)])
+        if paths.ndim != 2 or paths.shape[0] != len(cls.ARRAY_FIELDS):
+            raise ValueError(f"paths debe tener forma ({len(cls.ARRAY_FIELDS)}, n), no {paths.shape}")
+        
+        result = cls.__new__(cls)
+        result.scenario_name = scenario_name
+        result.paths = paths
+        result.strata = None
+        result._metrics = None
+        result._npv_quantiles = {}
+        result._release = release
+        if summary is None:
+            result._refresh_summary()
+        else:
+            for name in cls.SUMMARY_FIELDS:
+                setattr(result, name, summary[name])
+        if readonly:
+            result.paths = paths.view()
+            result.paths.flags.writeable = False
+        return result
+    
+    @classmethod
+    def from_arrays(cls, scenario_name: str, npv_values: np.ndarray,
+                    roi_values: np.ndarray, break_even_months: np.ndarray,
+                    irr_values: Optional[np.ndarray] = None,
+                    discounted_payback_months: Optional[np.ndarray] = None) -> 'SimulationResult':
+        """Construye un resultado calculando las estadísticas resumen de los arrays"""
+        return cls.from_paths(scenario_name, cls._stack_rows(npv_values, roi_values, break_even_months,
+                                                             irr_values, discounted_payback_months))
+    
+    @staticmethod
+    def _stack_rows(npv_values, roi_values, break_even_months, irr_values=None,
+                    discounted_payback_months=None) -> np.ndarray:
+        missing = np.full(len(npv_values), np.nan)
+        rows = [npv_values, roi_values, break_even_months,
+                missing if irr_values is None else irr_values,
+                missing if discounted_payback_months is None else discounted_payback_months]
+        return np.stack(rows).astype(np.float64, copy=False)
+    
+    @property
+    def net_present_values(self) -> np.ndarray:
+        return self.paths[0]
+    
+    @net_present_values.setter
+    def net_present_values(self, values: np.ndarray):
+        self._replace_row(0, values)
+    
+    @property
+    def roi_values(self) -> np.ndarray:
+        return self.paths[1]
+    
+    @roi_values.setter
+    def roi_values(self, values: np.ndarray):
+        self._replace_row(1, values)
+    
+    @property
+    def break_even_months(self) -> np.ndarray:
+        return self.paths[2]
+    
+    @break_even_months.setter
+    def break_even_months(self, values: np.ndarray):
+        self._replace_row(2, values)
+    
+    @property
+    def irr_values(self) -> np.ndarray:
+        return self.paths[3]
+    
+    @irr_values.setter
+    def irr_values(self, values: np.ndarray):
+        self._replace_row(3, values)
+    
+    @property
+    def discounted_payback_months(self) -> np.ndarray:
+        return self.paths[4]
+    
+    @discounted_payback_months.setter
+    def discounted_payback_months(self, values: np.ndarray):
+        self._replace_row(4, values)
+    
+    @property
+    def summary(self) -> Dict:
+        """Estadísticas resumen como dict"""
+        return {name: getattr(self, name) for name in self.SUMMARY_FIELDS}
+    
+    @property
+    def metrics(self) -> Dict:
+        """Métricas de riesgo calculadas en el primer acceso y memorizadas"""
+        if self._metrics is None:
+            from ..utils.statistics import StatisticsCalculator
+            self._metrics = StatisticsCalculator.compute_risk_metrics(self)
+        return self._metrics
+    
+    def invalidate_metrics(self):
+        """Descarta las métricas memorizadas (p. ej. tras modificar los arrays in situ)"""
+        self._metrics = None
+        self._npv_quantiles = {}
+    
+    def npv_percentiles(self, percents) -> np.ndarray:
+        """Percentiles de NPV pedidos; los que faltan se calculan juntos en una llamada"""
+        missing = [q for q in percents if q not in self._npv_quantiles]
+        if missing:
+            self._npv_quantiles.update(zip(missing, np.percentile(self.net_present_values, missing)))
+        return np.array([self._npv_quantiles[q] for q in percents])
+    
+    def readonly_view(self) -> 'SimulationResult':
+        """Resultado que comparte el bloque de datos pero no permite modificarlo"""
+        view = SimulationResult.from_paths(self.scenario_name, self.paths, self.summary, readonly=True)
+        view._metrics = self._metrics
+        view._npv_quantiles = dict(self._npv_quantiles)
+        view.strata = self.strata
+        return view
+    
+    def extend(self, npv_values: np.ndarray, roi_values: np.ndarray, break_even_months: np.ndarray,
+               irr_values: Optional[np.ndarray] = None, discounted_payback_months: Optional[np.ndarray] = None):
+        """Añade trayectorias nuevas (simulación incremental) y recalcula el resumen"""
+        new_paths = self._stack_rows(npv_values, roi_values, break_even_months, irr_values, discounted_payback_months)
+        self._own_paths(np.concatenate([self.paths, new_paths], axis=1))
+        self.strata = None
+        self._metrics = None
+        self._refresh_summary()
+    
+    def release(self):
+        """Libera el buffer externo de las trayectorias (idempotente)
+        
+        Tras liberar, `paths` queda vacío; el resumen y las métricas ya calculadas se
+        conservan. Sin buffer externo no hace nada.
+        """
+        release, self._release = self._release, None
+        if release is not None:
+            self.paths = np.empty((len(self.ARRAY_FIELDS), 0))
+            release()
+    
+    def _own_paths(self, paths: np.ndarray):
+        # `paths` es un bloque propio: el buffer externo anterior ya no hace falta y un
+        # release() posterior no debe vaciar las trayectorias nuevas
+        self.paths = paths
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+    
+    def __reduce__(self):
+        # Un único buffer para las trayectorias; con pickle protocolo 5 puede viajar fuera de banda
+        return (_rebuild_result, (self.scenario_name, self.paths, self.summary, self._metrics, self.strata))
+    
+    def __repr__(self):
+        return (f"SimulationResult(scenario_name={self.scenario_name!r}, "
+                f"n_simulations={self.paths.shape[1]}, mean_npv={self.mean_npv!r}, "
+                f"success_probability={self.success_probability!r})")
+    
+    def _replace_row(self, row: int, values: np.ndarray):
+        # Se crea un bloque nuevo: el actual puede estar compartido o ser de solo lectura
+        if len(values) != self.paths.shape[1]:
+            raise ValueError(f"Se esperaban {self.paths.shape[1]} trayectorias, no {len(values)}")
+        paths = self.paths.copy()
+        paths[row] = values
+        self._own_paths(paths)
+        self._metrics = None
+        self._npv_quantiles = {}
+    
+    def _refresh_summary(self):
+        npv_values = self.net_present_values
+        self.success_probability = np.mean(npv_values > 0) * 100
+        self.mean_npv = np.mean(npv_values)
+        self.std_npv = np.std(npv_values)
+        self._npv_quantiles = {}
+        self.npv_percentiles(self.NPV_QUANTILES)
+        self.percentile_5, self.percentile_95 = self.npv_percentiles((5, 95))
+        self.var_95 = self.percentile_5  # Value at Risk
@@ -0,0 +1,540 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import queue
+import secrets
+import socket
+import struct
+import threading
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models.business_scenario import BusinessScenario, SimulationResult
+from .monte_carlo_engine import MonteCarloEngine
+from ..utils.telemetry import get_logger
+from ..utils.instrumentation import QUEUE_DEPTH, record_simulation
+
+logger = get_logger('distributed')
+
+# Protocolo: cada mensaje es un JSON UTF-8 precedido de su longitud (4 bytes, big-endian).
+# Los arrays de NumPy viajan como {"__ndarray__": base64, "dtype", "shape"}; no se usa
+# pickle porque los workers pueden estar en otras máquinas.
+#
+# Autenticación: coordinador y workers comparten un secreto (DISTRIBUTED_SECRET). Al
+# conectar, el coordinador envía un reto y el worker responde con HMAC-SHA256(secreto,
+# reto + su nonce); a partir de ahí cada mensaje lleva tras la cabecera el HMAC de su
+# contenido con una clave de sesión derivada de ambos nonces, y se descarta sin
+# decodificar si no coincide.
+HEADER = struct.Struct('>I')
+MAC_SIZE = hashlib.sha256().digest_size
+MAX_MESSAGE_BYTES = 512 * 1024 ** 2
+# Tope de los mensajes previos a la autenticación (reto y saludo)
+MAX_HANDSHAKE_BYTES = 4096
+
+
+def _encode(obj):
+    if isinstance(obj, np.ndarray):
+        data = np.ascontiguousarray(obj)
+        return {'__ndarray__': base64.b64encode(data.tobytes()).decode('ascii'),
+                'dtype': data.dtype.str, 'shape': list(data.shape)}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def _decode(obj):
+    if '__ndarray__' in obj:
+        data = base64.b64decode(obj['__ndarray__'])
+        return np.frombuffer(data, dtype=np.dtype(obj['dtype'])).reshape(obj['shape']).copy()
+    return obj
+
+
+def resolve_secret(secret=None) -> bytes:
+    """Secreto compartido en bytes: el recibido o DISTRIBUTED_SECRET (obligatorio)"""
+    secret = secret or os.environ.get('DISTRIBUTED_SECRET')
+    if not secret:
+        raise ValueError("Se requiere un secreto compartido: pase secret o defina DISTRIBUTED_SECRET")
+    return secret.encode('utf-8') if isinstance(secret, str) else bytes(secret)
+
+
+def handshake_proof(secret: bytes, challenge: str, nonce: str) -> str:
+    """Respuesta del worker al reto del coordinador"""
+    return hmac.new(secret, f'hello:{challenge}:{nonce}'.encode('ascii'), hashlib.sha256).hexdigest()
+
+
+def session_key(secret: bytes, challenge: str, nonce: str) -> bytes:
+    """Clave con la que se firman los mensajes de una conexión autenticada"""
+    return hmac.new(secret, f'session:{challenge}:{nonce}'.encode('ascii'), hashlib.sha256).digest()
+
+
+def send_message(sock: socket.socket, message: Dict, key: Optional[bytes] = None):
+    """Envía un mensaje; con `key`, firmado con HMAC-SHA256"""
+    payload = json.dumps(message, default=_encode).encode('utf-8')
+    mac = hmac.new(key, payload, hashlib.sha256).digest() if key is not None else b''
+    sock.sendall(HEADER.pack(len(payload)) + mac + payload)
+
+
+def recv_message(sock: socket.socket, key: Optional[bytes] = None,
+                 max_bytes: int = MAX_MESSAGE_BYTES) -> Dict:
+    """Recibe un mensaje; con `key`, lanza ValueError si la firma no es válida"""
+    (length,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if length > max_bytes:
+        raise ValueError(f"Mensaje demasiado grande: {length} bytes")
+    mac = _recv_exact(sock, MAC_SIZE) if key is not None else b''
+    payload = _recv_exact(sock, length)
+    if key is not None and not hmac.compare_digest(mac, hmac.new(key, payload, hashlib.sha256).digest()):
+        raise ValueError("Firma del mensaje no válida")
+    return json.loads(payload.decode('utf-8'), object_hook=_decode)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 ** 2))
+        if not chunk:
+            raise ConnectionError("Conexión cerrada por el otro extremo")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class PathAccumulator:
+    """Estadísticos combinables de un tramo de trayectorias
+
+    Por cada fila de SimulationResult.paths guarda conteo, media y suma de cuadrados de
+    desviaciones (combinables con la fórmula de Chan, ignorando NaN), el número de
+    trayectorias con NPV > 0 y una muestra de NPV para estimar percentiles. Como las
+    trayectorias son i.i.d., las primeras `sample_size` de cada tramo son una muestra
+    uniforme; al combinar se ponderan por el tamaño del tramo. Con keep_paths se
+    conservan además las trayectorias completas para reconstruir el resultado exacto.
+
+    Con muestreo 'stratified' o 'lhs' el tramo recibe el estrato de postestratificación
+    de cada trayectoria y guarda por estrato el conteo, la suma de NPV y los éxitos;
+    sumados entre tramos dan el mismo estimador postestratificado de media y
+    probabilidad de éxito que una ejecución en un único proceso.
+    """
+
+    def __init__(self, sample_size: int = 10000):
+        rows = len(SimulationResult.ARRAY_FIELDS)
+        self.sample_size = sample_size
+        self.n = 0
+        self.count = np.zeros(rows)
+        self.mean = np.zeros(rows)
+        self.m2 = np.zeros(rows)
+        self.successes = 0
+        self.samples: List[Tuple[float, np.ndarray]] = []  # (peso por valor, muestra de NPV)
+        self.paths: Optional[Dict[int, np.ndarray]] = None  # inicio del tramo -> bloque (5, m)
+        # Por estrato: [conteo, suma de NPV, éxitos × 100] (None sin postestratificación)
+        self.strata_totals: Optional[np.ndarray] = None
+        self.strata: Optional[Dict[int, np.ndarray]] = None  # inicio del tramo -> estratos (con keep_paths)
+
+    @classmethod
+    def from_paths(cls, paths: np.ndarray, start: int = 0, sample_size: int = 10000,
+                   keep_paths: bool = False, strata: Optional[np.ndarray] = None,
+                   n_strata: int = 0) -> 'PathAccumulator':
+        """Acumulador de un bloque (5, m) de trayectorias, con su estrato si se postestratifica"""
+        acc = cls(sample_size)
+        acc.n = paths.shape[1]
+        valid = ~np.isnan(paths)
+        acc.count = valid.sum(axis=1).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            acc.mean = np.where(acc.count > 0, np.nansum(paths, axis=1) / np.maximum(acc.count, 1), 0.0)
+            deviations = np.where(valid, paths - acc.mean[:, None], 0.0)
+        acc.m2 = np.einsum('ij,ij->i', deviations, deviations)
+        npv = paths[0]
+        acc.successes = int(np.count_nonzero(npv > 0))
+        if acc.n:
+            sample = npv[:sample_size].copy()
+            acc.samples = [(acc.n / len(sample), sample)]
+        if keep_paths:
+            acc.paths = {start: paths.copy()}
+        if strata is not None:
+            acc.strata_totals = np.stack([
+                np.bincount(strata, minlength=n_strata).astype(np.float64),
+                np.bincount(strata, weights=npv, minlength=n_strata),
+                np.bincount(strata, weights=(npv > 0) * 100.0, minlength=n_strata),
+            ])
+            if keep_paths:
+                acc.strata = {start: strata.copy()}
+        return acc
+
+    def merge(self, other: 'PathAccumulator') -> 'PathAccumulator':
+        """Combina `other` en este acumulador (in situ) y lo retorna"""
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, other.count / np.maximum(total, 1), 0.0)
+            self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+        self.mean = self.mean + delta * weight
+        self.count = total
+        self.n += other.n
+        self.successes += other.successes
+        self.samples.extend(other.samples)
+        if other.paths is not None:
+            self.paths = {**(self.paths or {}), **other.paths}
+        if other.strata_totals is not None:
+            self.strata_totals = (other.strata_totals.copy() if self.strata_totals is None
+                                  else self.strata_totals + other.strata_totals)
+        if other.strata is not None:
+            self.strata = {**(self.strata or {}), **other.strata}
+        return self
+
+    @property
+    def summary(self) -> Dict:
+        """Resumen con los campos de SimulationResult.SUMMARY_FIELDS
+
+        Media, desviación y probabilidad de éxito son exactas (postestratificadas si hay
+        estratos); los percentiles se estiman con la muestra ponderada (exactos si se
+        conservaron las trayectorias).
+        """
+        if self.paths is not None:
+            summary = SimulationResult.from_paths('', self._concatenated_paths()).summary
+        else:
+            p5, p95 = self.npv_percentiles([5, 95])
+            summary = {
+                'success_probability': self.successes / self.n * 100 if self.n else float('nan'),
+                'mean_npv': self.mean[0],
+                'std_npv': np.sqrt(self.m2[0] / self.count[0]) if self.count[0] else float('nan'),
+                'percentile_5': p5,
+                'percentile_95': p95,
+                'var_95': p5,
+            }
+        if self.strata_totals is not None:
+            counts, npv_totals, success_totals = self.strata_totals
+            summary['mean_npv'] = MonteCarloEngine.post_stratified_estimate(counts, npv_totals)
+            summary['success_probability'] = MonteCarloEngine.post_stratified_estimate(counts, success_totals)
+        return summary
+
+    def means(self) -> Dict[str, float]:
+        """Media por array (ignorando NaN) con los nombres de SimulationResult.ARRAY_FIELDS"""
+        return {name: (self.mean[i] if self.count[i] else float('nan'))
+                for i, name in enumerate(SimulationResult.ARRAY_FIELDS)}
+
+    def npv_percentiles(self, q) -> np.ndarray:
+        """Percentiles de NPV a partir de la muestra ponderada"""
+        if not self.samples:
+            return np.full(len(q), np.nan)
+        values = np.concatenate([sample for _, sample in self.samples])
+        weights = np.concatenate([np.full(len(sample), w) for w, sample in self.samples])
+        order = np.argsort(values)
+        values, weights = values[order], weights[order]
+        # Percentil ponderado en los puntos medios de la masa acumulada
+        positions = (np.cumsum(weights) - weights / 2) / weights.sum() * 100
+        return np.interp(q, positions, values)
+
+    def to_result(self, scenario_name: str) -> SimulationResult:
+        """SimulationResult exacto (requiere haber ejecutado con keep_paths)"""
+        if self.paths is None:
+            raise ValueError("Las trayectorias no se conservaron; ejecute con keep_paths=True")
+        result = SimulationResult.from_paths(scenario_name, self._concatenated_paths(), self.summary)
+        if self.strata is not None:
+            result.strata = np.concatenate([self.strata[start] for start in sorted(self.strata)])
+        return result
+
+    def to_message(self) -> Dict:
+        return {
+            'sample_size': self.sample_size, 'n': self.n, 'count': self.count, 'mean': self.mean,
+            'm2': self.m2, 'successes': self.successes,
+            'samples': [[w, sample] for w, sample in self.samples],
+            'paths': None if self.paths is None else [[start, block] for start, block in self.paths.items()],
+            'strata_totals': self.strata_totals,
+            'strata': None if self.strata is None else [[start, block] for start, block in self.strata.items()],
+        }
+
+    @classmethod
+    def from_message(cls, message: Dict) -> 'PathAccumulator':
+        acc = cls(message['sample_size'])
+        acc.n = message['n']
+        acc.count, acc.mean, acc.m2 = message['count'], message['mean'], message['m2']
+        acc.successes = message['successes']
+        acc.samples = [(w, sample) for w, sample in message['samples']]
+        if message['paths'] is not None:
+            acc.paths = {start: block for start, block in message['paths']}
+        acc.strata_totals = message.get('strata_totals')
+        if message.get('strata') is not None:
+            acc.strata = {start: block for start, block in message['strata']}
+        return acc
+
+    def _concatenated_paths(self) -> np.ndarray:
+        return np.concatenate([self.paths[start] for start in sorted(self.paths)], axis=1)
+
+
+def simulate_shard(shard: Dict) -> PathAccumulator:
+    """Ejecuta un tramo: trayectorias [start, stop) de un escenario con la semilla del trabajo
+    (con sus estratos de postestratificación para las `n_total` trayectorias del trabajo)"""
+    scenario = BusinessScenario(**shard['scenario'])
+    engine = MonteCarloEngine(n_simulations=shard['stop'] - shard['start'], use_database=False,
+                              discount_rate=shard['discount_rate'], seed=shard['seed'],
+                              sampling=shard.get('sampling', 'random'))
+    n_total = shard.get('n_total', shard['stop'])
+    paths, strata = engine.simulate_stratified_range(scenario, shard['start'], shard['stop'], n_total)
+    return PathAccumulator.from_paths(paths, shard['start'], shard['sample_size'], shard['keep_paths'],
+                                      strata, engine.n_post_strata(n_total))
+
+
+def run_worker(host: str, port: int, name: Optional[str] = None, reconnect_attempts: int = 5,
+               reconnect_delay: float = 1.0, secret=None):
+    """Bucle de un worker: se conecta al coordinador, ejecuta tramos y devuelve acumuladores
+
+    `secret` (o DISTRIBUTED_SECRET) debe ser el del coordinador. Termina al recibir
+    'shutdown' o tras agotar los reintentos de conexión.
+    """
+    secret = resolve_secret(secret)
+    name = name or socket.gethostname()
+    attempts = 0
+    while attempts <= reconnect_attempts:
+        try:
+            with socket.create_connection((host, port)) as sock:
+                challenge = recv_message(sock, max_bytes=MAX_HANDSHAKE_BYTES)
+                if challenge.get('type') != 'challenge':
+                    raise ValueError("Saludo inesperado del coordinador")
+                nonce = secrets.token_hex(16)
+                send_message(sock, {'type': 'hello', 'worker': name, 'nonce': nonce,
+                                    'proof': handshake_proof(secret, challenge['nonce'], nonce)})
+                key = session_key(secret, challenge['nonce'], nonce)
+                attempts = 0
+                while True:
+                    message = recv_message(sock, key)
+                    if message['type'] == 'shutdown':
+                        return
+                    try:
+                        accumulator = simulate_shard(message['shard'])
+                        send_message(sock, {'type': 'result', 'shard_id': message['shard']['shard_id'],
+                                            'accumulator': accumulator.to_message()}, key)
+                    except Exception as e:
+                        send_message(sock, {'type': 'error', 'shard_id': message['shard']['shard_id'],
+                                            'error': str(e)}, key)
+        except (OSError, ValueError) as e:
+            attempts += 1
+            logger.warning("Worker %s: conexión con el coordinador perdida (%s); reintento %d", name, e, attempts)
+            time.sleep(reconnect_delay)
+
+
+class DistributedCoordinator:
+    """Coordinador TCP que reparte tramos sembrados entre workers y combina sus acumuladores
+
+    Los workers se conectan al coordinador (pueden estar en otras máquinas). Cada tramo
+    es un rango de trayectorias [start, stop) de la ejecución con la semilla del trabajo,
+    que el worker regenera sin recorrer las anteriores (MonteCarloEngine.simulate_path_range);
+    el resultado no depende de qué worker lo ejecute y coincide con el de un único proceso.
+    Si un worker se desconecta o supera `shard_timeout`, su tramo vuelve a la cola; si
+    no queda ningún worker conectado durante `worker_wait` segundos, el trabajo falla.
+
+    Solo escucha en 127.0.0.1 salvo que se indique otro `host`, y solo acepta workers
+    que demuestren conocer `secret` (o DISTRIBUTED_SECRET); ver el protocolo arriba.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, shard_size: int = 50_000,
+                 shard_timeout: float = 300, discount_rate: float = 0.10, secret=None,
+                 sampling: str = 'random', worker_wait: float = 60):
+        if sampling not in MonteCarloEngine.SAMPLING_METHODS:
+            raise ValueError(f"Muestreo desconocido '{sampling}'; opciones: "
+                             f"{', '.join(MonteCarloEngine.SAMPLING_METHODS)}")
+        self.host = host
+        self.port = port
+        self.shard_size = shard_size
+        self.shard_timeout = shard_timeout
+        self.discount_rate = discount_rate
+        self.sampling = sampling
+        self.worker_wait = worker_wait
+        self._secret = resolve_secret(secret)
+        self.stats = {'workers': 0, 'shards_sent': 0, 'shards_reissued': 0, 'rejected_workers': 0}
+        self._connected = 0
+        self._idle_since = time.monotonic()
+        self._server = None
+        self._closed = threading.Event()
+        self._job_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._pending = queue.Queue()
+        QUEUE_DEPTH.track(self._pending.qsize, queue='distributed_shards')
+        self._results: Dict[int, PathAccumulator] = {}
+        self._job_error = None
+        self._job_done = threading.Event()
+        self._n_shards = 0
+        self._job_id = 0
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.getsockname()[:2]
+
+    def start(self) -> 'DistributedCoordinator':
+        """Abre el puerto y acepta workers en segundo plano"""
+        self._server = socket.create_server((self.host, self.port))
+        self._server.settimeout(0.5)
+        threading.Thread(target=self._accept_loop, name='coordinator-accept', daemon=True).start()
+        return self
+
+    def close(self):
+        """Deja de aceptar workers y les pide que terminen"""
+        self._closed.set()
+        if self._server is not None:
+            self._server.close()
+
+    def run(self, scenarios: List[BusinessScenario], n_simulations: int, seed: int = 0,
+            keep_paths: bool = False, sample_size: int = 10000,
+            timeout: Optional[float] = None, sampling: Optional[str] = None) -> List[PathAccumulator]:
+        """Ejecuta `n_simulations` trayectorias de cada escenario repartidas en tramos
+
+        `sampling` (por defecto el del coordinador) es el muestreo de los tramos; como
+        cada bloque de la secuencia se estratifica por separado, los tramos coinciden con
+        las trayectorias de un único proceso con ese muestreo, y con 'stratified' o 'lhs'
+        el resumen combinado es el mismo estimador postestratificado. Retorna un
+        PathAccumulator combinado por escenario, en el orden de entrada.
+        """
+        sampling = sampling or self.sampling
+        if sampling not in MonteCarloEngine.SAMPLING_METHODS:
+            raise ValueError(f"Muestreo desconocido '{sampling}'; opciones: "
+                             f"{', '.join(MonteCarloEngine.SAMPLING_METHODS)}")
+        with self._job_lock:
+            with self._state_lock:
+                self._job_id += 1
+                job_id = self._job_id
+            shards = []
+            for scenario_index, scenario in enumerate(scenarios):
+                for start in range(0, n_simulations, self.shard_size):
+                    shards.append({
+                        'job_id': job_id,
+                        'shard_id': len(shards),
+                        'scenario_index': scenario_index,
+                        'scenario': asdict(scenario),
+                        'start': start,
+                        'stop': min(start + self.shard_size, n_simulations),
+                        'n_total': n_simulations,
+                        'seed': seed,
+                        'discount_rate': self.discount_rate,
+                        'sampling': sampling,
+                        'sample_size': sample_size,
+                        'keep_paths': keep_paths,
+                    })
+
+            with self._state_lock:
+                self._results = {}
+                self._job_error = None
+                self._n_shards = len(shards)
+                self._job_done.clear()
+                # El plazo sin workers cuenta desde el inicio del trabajo
+                self._idle_since = time.monotonic()
+            started = time.perf_counter()
+            for shard in shards:
+                self._pending.put(shard)
+
+            self._wait_job(timeout)
+            if self._job_error is not None:
+                self._drain_pending()
+                raise RuntimeError(f"Error en un worker: {self._job_error}")
+
+            record_simulation(len(scenarios) * n_simulations, time.perf_counter() - started)
+            # Combinación en orden de tramo: el resultado es determinista
+            merged = [PathAccumulator(sample_size) for _ in scenarios]
+            for shard in shards:
+                merged[shard['scenario_index']].merge(self._results[shard['shard_id']])
+            return merged
+
+    def _wait_job(self, timeout: Optional[float]):
+        # Espera el fin del trabajo; falla por `timeout` o si no queda ningún worker conectado
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._job_done.wait(0.5 if deadline is None else max(0, min(0.5, deadline - time.monotonic()))):
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                self._drain_pending()
+                raise TimeoutError("El trabajo distribuido no terminó a tiempo")
+            with self._state_lock:
+                orphaned = self._connected == 0 and now - self._idle_since >= self.worker_wait
+            if orphaned:
+                self._drain_pending()
+                raise RuntimeError(f"Sin workers conectados durante {self.worker_wait:g} s")
+
+    def _drain_pending(self):
+        while True:
+            try:
+                self._pending.get_nowait()
+            except queue.Empty:
+                return
+
+    def _accept_loop(self):
+        while not self._closed.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._serve_worker, args=(conn,), daemon=True).start()
+
+    def _serve_worker(self, conn: socket.socket):
+        with conn:
+            key = self._authenticate(conn)
+            if key is None:
+                with self._state_lock:
+                    self.stats['rejected_workers'] += 1
+                return
+            with self._state_lock:
+                self.stats['workers'] += 1
+                self._connected += 1
+            try:
+                self._serve_shards(conn, key)
+            finally:
+                with self._state_lock:
+                    self._connected -= 1
+                    if self._connected == 0:
+                        self._idle_since = time.monotonic()
+
+    def _authenticate(self, conn: socket.socket) -> Optional[bytes]:
+        # Reto-respuesta con el secreto compartido; retorna la clave de sesión o None
+        try:
+            conn.settimeout(self.shard_timeout)
+            challenge = secrets.token_hex(16)
+            send_message(conn, {'type': 'challenge', 'nonce': challenge})
+            hello = recv_message(conn, max_bytes=MAX_HANDSHAKE_BYTES)
+            if not isinstance(hello, dict) or hello.get('type') != 'hello':
+                return None
+            nonce, proof = str(hello.get('nonce', '')), str(hello.get('proof', ''))
+            if not nonce or not hmac.compare_digest(proof, handshake_proof(self._secret, challenge, nonce)):
+                logger.warning("Worker rechazado: autenticación no válida")
+                return None
+        except (OSError, ValueError, UnicodeError):
+            return None
+        return session_key(self._secret, challenge, nonce)
+
+    def _serve_shards(self, conn: socket.socket, key: bytes):
+        while not self._closed.is_set():
+            try:
+                shard = self._pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if shard['job_id'] != self._job_id or shard['shard_id'] in self._results:
+                continue
+            try:
+                send_message(conn, {'type': 'shard', 'shard': shard}, key)
+                with self._state_lock:
+                    self.stats['shards_sent'] += 1
+                reply = recv_message(conn, key)
+            except (OSError, ValueError):
+                # Worker perdido o demasiado lento: el tramo vuelve a la cola
+                with self._state_lock:
+                    self.stats['shards_reissued'] += 1
+                self._pending.put(shard)
+                return
+            self._record(shard, reply)
+
+        try:
+            send_message(conn, {'type': 'shutdown'}, key)
+        except OSError:
+            pass
+
+    def _record(self, shard: Dict, reply: Dict):
+        with self._state_lock:
+            if shard['job_id'] != self._job_id or reply.get('shard_id') != shard['shard_id']:
+                return  # respuesta de un trabajo anterior (p. ej. tras un timeout)
+            if reply.get('type') == 'error':
+                self._job_error = reply.get('error')
+                self._job_done.set()
+                return
+            self._results.setdefault(shard['shard_id'], PathAccumulator.from_message(reply['accumulator']))
+            if len(self._results) == self._n_shards:
+                self._job_done.set()
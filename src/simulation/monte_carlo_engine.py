@@ -1,110 +1,498 @@
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
 import numpy as np
-from typing import Tuple
+from scipy.special import ndtr, ndtri
+from typing import Dict, List, Optional, Tuple
 from ..models.business_scenario import BusinessScenario, SimulationResult
 from ..database.neon_db import NeonDB
+from ..utils.financial import FinancialCalculator
 from ..utils.statistics import StatisticsCalculator
+from ..utils.memory_profile import MemoryBudgetExceeded, MemoryReport, track_peak
+from ..utils.telemetry import get_logger, span
+from ..utils.instrumentation import record_simulation
+
+logger = get_logger('engine')
 
 class MonteCarloEngine:
     """Motor de simulación Monte Carlo para decisiones empresariales"""
     
-    def __init__(self, n_simulations: int = 10000, use_database: bool = True):
+    # Trayectorias por bloque de la secuencia aleatoria (unidad de regeneración y de cálculo)
+    PATH_BLOCK_SIZE = 4096
+    # Normales por trayectoria y mes: ingresos, shocks de mercado, costos, inflación
+    RANDOM_FACTORS = ('revenue', 'market', 'cost', 'inflation')
+    # Factores cuya media se desplaza en el muestreo por importancia (estimate_tail_risk)
+    TILTED_FACTORS = ('revenue', 'market')
+    # Muestreo de las normales: simple, estratificado por la suma mensual de cada factor,
+    # o hipercubo latino por (factor, mes); ambos por bloque de la secuencia
+    SAMPLING_METHODS = ('random', 'stratified', 'lhs')
+    # Estratos equiprobables del muestreo estratificado y de la postestratificación
+    STRATA = 16
+    # Arrays (B, horizonte) de float64 vivos a la vez al generar las normales de un bloque
+    # (medido con tracemalloc) y por escenario al simularlo
+    GENERATION_ARRAYS = {'random': 4, 'stratified': 5, 'lhs': 16}
+    SIMULATION_ARRAYS_PER_SCENARIO = 5
+    # Trayectorias completas que conserva un resultado en modo de memoria acotada
+    BOUNDED_SAMPLE_PATHS = 10000
+    # Holgura sobre la memoria prevista al compararla con el presupuesto
+    MEMORY_HEADROOM = 1.1
+    
+    def __init__(self, n_simulations: int = 10000, use_database: bool = True, discount_rate: float = 0.10,
+                 seed: int = 42, sampling: str = 'random', memory_budget: Optional[int] = None,
+                 on_budget: str = 'bounded', profile_memory: bool = False):
         self.n_simulations = n_simulations
         self.use_database = use_database
+        self.discount_rate = discount_rate  # tasa anual de descuento para NPV y payback descontado
+        # Las trayectorias son función de (semilla, índice de trayectoria): cualquier rango
+        # puede regenerarse sin reproducir los anteriores (ver simulate_path_range)
+        self.seed = seed
+        self._philox_key = np.random.SeedSequence(seed).generate_state(2, np.uint64)
+        self.sampling = self._check_sampling(sampling)
+        # Presupuesto de memoria en bytes (por defecto SIMULATION_MEMORY_BUDGET_MB): las
+        # llamadas que lo superarían se rechazan ('refuse') o pasan a modo acotado ('bounded')
+        if memory_budget is None and os.getenv('SIMULATION_MEMORY_BUDGET_MB'):
+            memory_budget = int(float(os.getenv('SIMULATION_MEMORY_BUDGET_MB')) * 1024 ** 2)
+        if on_budget not in ('bounded', 'refuse'):
+            raise ValueError(f"on_budget debe ser 'bounded' o 'refuse', no '{on_budget}'")
+        self.memory_budget = memory_budget
+        self.on_budget = on_budget
+        self.profile_memory = profile_memory
+        self.memory_reports = deque(maxlen=100)  # últimos MemoryReport si profile_memory
         if use_database:
             try:
                 self.db = NeonDB()
                 self.db.create_tables()
             except Exception as e:
-                print(f"⚠️ No se pudo conectar a la base de datos: {e}")
+                logger.warning("No se pudo conectar a la base de datos: %s", e)
                 self.use_database = False
-        np.random.seed(42)
     
-    def simulate_scenario(self, scenario: BusinessScenario) -> SimulationResult:
+    def simulate_scenario(self, scenario: BusinessScenario, sampling: Optional[str] = None) -> SimulationResult:
         """Ejecuta simulación Monte Carlo para un escenario de negocio"""
-        
-        # Arrays para almacenar resultados
-        npv_values = np.zeros(self.n_simulations)
-        roi_values = np.zeros(self.n_simulations)
-        break_even_months = np.zeros(self.n_simulations)
-        
-        for i in range(self.n_simulations):
-            # Generar variables aleatorias
-            monthly_revenues = self._generate_revenue_series(scenario)
-            monthly_costs = self._generate_cost_series(scenario)
-            inflation_factors = self._generate_inflation_factors(scenario)
-            
-            # Calcular flujos de caja descontados
-            cash_flows = (monthly_revenues - monthly_costs) * inflation_factors
-            
-            # NPV usando integración Monte Carlo: ∫ CF(t) * e^(-r*t) dt
-            discount_rates = np.array([1/(1+0.1)**(t/12) for t in range(scenario.time_horizon)])
-            npv = np.sum(cash_flows * discount_rates) - scenario.initial_investment
-            
-            # ROI
-            total_profit = np.sum(cash_flows)
-            roi = (total_profit / scenario.initial_investment) * 100 if scenario.initial_investment > 0 else 0
-            
-            # Break-even
-            cumulative_cash = np.cumsum(cash_flows) - scenario.initial_investment
-            break_even = np.argmax(cumulative_cash > 0) + 1 if np.any(cumulative_cash > 0) else scenario.time_horizon
-            
-            npv_values[i] = npv
-            roi_values[i] = roi
-            break_even_months[i] = break_even
-        
-        result = self._calculate_statistics(scenario.name, npv_values, roi_values, break_even_months)
+        result = self._simulate_tracked('simulate_scenario', [scenario], None, sampling)[0]
         
         # Guardar en base de datos si está habilitada
         if self.use_database:
-            try:
-                scenario_id = self.db.save_scenario(scenario)
-                metrics = StatisticsCalculator.calculate_risk_metrics(result)
-                self.db.save_simulation_result(scenario_id, result, metrics)
-                print(f"✅ Escenario '{scenario.name}' guardado en base de datos")
-            except Exception as e:
-                print(f"⚠️ Error guardando en base de datos: {e}")
+            with span('metrics'):
+                metrics = result.metrics
+            with span('persist', scenario=scenario.name):
+                try:
+                    scenario_id = self.db.save_scenario(scenario)
+                    self.db.save_simulation_result(scenario_id, result, metrics)
+                    logger.info("Escenario '%s' guardado en base de datos", scenario.name)
+                except Exception as e:
+                    logger.warning("Error guardando en base de datos: %s", e)
         
         return result
     
-    def _generate_revenue_series(self, scenario: BusinessScenario) -> np.ndarray:
-        """Genera serie temporal de ingresos con tendencia y volatilidad"""
-        base_revenues = np.random.normal(scenario.revenue_mean, scenario.revenue_std, scenario.time_horizon)
-        # Añadir tendencia de crecimiento
-        growth_trend = np.array([1 + 0.02 * t for t in range(scenario.time_horizon)])
-        # Añadir volatilidad del mercado
-        market_shocks = np.random.normal(1, scenario.market_volatility, scenario.time_horizon)
-        return np.maximum(base_revenues * growth_trend * market_shocks, 0)
-    
-    def _generate_cost_series(self, scenario: BusinessScenario) -> np.ndarray:
-        """Genera serie temporal de costos con inflación"""
-        base_costs = np.random.normal(scenario.cost_mean, scenario.cost_std, scenario.time_horizon)
-        return np.maximum(base_costs, 0)
-    
-    def _generate_inflation_factors(self, scenario: BusinessScenario) -> np.ndarray:
-        """Genera factores de inflación estocásticos"""
-        inflation_shocks = np.random.normal(scenario.inflation_rate, 0.01, scenario.time_horizon)
-        return np.array([1 - sum(inflation_shocks[:t+1])/12 for t in range(scenario.time_horizon)])
-    
-    def _calculate_statistics(self, name: str, npv_values: np.ndarray, 
-                            roi_values: np.ndarray, break_even_months: np.ndarray) -> SimulationResult:
-        """Calcula estadísticas del resultado de simulación"""
+    def simulate_scenarios(self, scenarios: List[BusinessScenario],
+                           n_simulations: Optional[int] = None,
+                           sampling: Optional[str] = None) -> List[SimulationResult]:
+        """Simula varios escenarios a la vez con operaciones vectorizadas sobre (escenario, trayectoria, mes)
+        
+        Los escenarios con el mismo horizonte se simulan juntos en un único bloque; las
+        trayectorias se procesan por bloques de la secuencia aleatoria para acotar la
+        memoria intermedia. No guarda en base de datos.
+        
+        `sampling` (por defecto el del motor) elige el muestreo de SAMPLING_METHODS; con
+        'stratified' o 'lhs' mean_npv y success_probability son estimadores postestratificados.
+        
+        Si la memoria prevista supera memory_budget, la llamada se rechaza con
+        MemoryBudgetExceeded o se ejecuta en modo acotado (ver _simulate_bounded).
+        """
+        return self._simulate_tracked('simulate_scenarios', scenarios, n_simulations, sampling)
+    
+    def predict_memory(self, n_simulations: Optional[int] = None, time_horizon: int = 12, n_scenarios: int = 1,
+                       sampling: Optional[str] = None) -> int:
+        """Bytes previstos para simular `n_scenarios` escenarios de igual horizonte sin ejecutar nada
+        
+        Suma los arrays retenidos (5 filas por escenario y las sumas de factores por
+        trayectoria) y el pico de los intermedios de un bloque de la secuencia.
+        """
+        n = n_simulations or self.n_simulations
+        sampling = self._check_sampling(sampling or self.sampling)
+        item = np.dtype(np.float64).itemsize
+        retained = self._retained_bytes(n, n_scenarios)
+        block = self.PATH_BLOCK_SIZE * time_horizon * item
+        in_block = min(n, self.PATH_BLOCK_SIZE) * time_horizon * item
+        transient = max(self.GENERATION_ARRAYS[sampling] * block,
+                        len(self.RANDOM_FACTORS) * block + self.SIMULATION_ARRAYS_PER_SCENARIO * n_scenarios * in_block)
+        return int(retained + transient)
+    
+    def _predict_scenarios_memory(self, scenarios: List[BusinessScenario], n: int, sampling: str) -> int:
+        # Los grupos por horizonte se simulan uno tras otro: se acumula lo retenido y solo
+        # cuenta el mayor pico transitorio
+        groups = self._group_by_horizon(scenarios)
+        retained = sum(self._retained_bytes(n, len(indices)) for indices in groups.values())
+        transient = max((self.predict_memory(n, horizon, len(indices), sampling) - self._retained_bytes(n, len(indices))
+                         for horizon, indices in groups.items()), default=0)
+        return retained + transient
+    
+    def _retained_bytes(self, n: int, n_scenarios: int) -> int:
+        # Bloque (escenarios, 5, n) de resultados y sumas de factores (4, n) del grupo
+        return (n_scenarios * len(SimulationResult.ARRAY_FIELDS) + len(self.RANDOM_FACTORS)) * n * 8
+    
+    def _predict_bounded_memory(self, scenarios: List[BusinessScenario], n: int, sampling: str) -> int:
+        # Un bloque de la secuencia a la vez más, por escenario, la muestra de trayectorias
+        # completas y la muestra de NPV del acumulador
+        kept = min(n, self.BOUNDED_SAMPLE_PATHS)
+        longest = max(int(scenario.time_horizon) for scenario in scenarios)
+        return (self.predict_memory(min(n, self.PATH_BLOCK_SIZE), longest, 1, sampling)
+                + len(scenarios) * (len(SimulationResult.ARRAY_FIELDS) + 1) * kept * 8)
+    
+    @contextmanager
+    def track_memory(self, label: str, n_paths: int, predicted_bytes: int):
+        """Mide el pico de memoria del bloque si profile_memory está activo; produce el MemoryReport o None
+        
+        Las llamadas anidadas (p. ej. cada simulación de un barrido) quedan incluidas en
+        la medición exterior.
+        """
+        if not self.profile_memory:
+            yield None
+            return
+        report = MemoryReport(label, n_paths, predicted_bytes)
+        with track_peak(report):
+            yield report
+        if report.peak_bytes is not None:
+            self.memory_reports.append(report)
+            logger.info("Memoria %s", report)
+    
+    def _simulate_tracked(self, label: str, scenarios: List[BusinessScenario], n_simulations: Optional[int],
+                          sampling: Optional[str]) -> List[SimulationResult]:
+        n = n_simulations or self.n_simulations
+        sampling = self._check_sampling(sampling or self.sampling)
+        predicted = self._predict_scenarios_memory(scenarios, n, sampling)
+        bounded = not self._fits_budget(predicted)
+        if bounded:
+            if self.on_budget == 'refuse':
+                raise MemoryBudgetExceeded(label, predicted, self.memory_budget)
+            predicted = self._predict_bounded_memory(scenarios, n, sampling)
+            if not self._fits_budget(predicted):
+                raise MemoryBudgetExceeded(f"{label} (modo acotado)", predicted, self.memory_budget)
+            logger.warning("%s: %d × %d trayectorias superan el presupuesto de memoria; modo acotado",
+                           label, len(scenarios), n)
+        
+        with span('simulate', scenarios=len(scenarios), n_simulations=n, sampling=sampling, bounded=bounded), \
+                self.track_memory(label, len(scenarios) * n, predicted) as report:
+            started = time.perf_counter()
+            if bounded:
+                results = [self._simulate_bounded(scenario, n, sampling) for scenario in scenarios]
+            else:
+                results = self._simulate_groups(scenarios, n, sampling)
+            record_simulation(len(scenarios) * n, time.perf_counter() - started)
+            if report is not None:
+                report.bounded = bounded
+                report.result_bytes = sum(result.paths.nbytes for result in results)
+        return results
+    
+    def _fits_budget(self, predicted_bytes: int) -> bool:
+        return self.memory_budget is None or predicted_bytes * self.MEMORY_HEADROOM <= self.memory_budget
+    
+    def _group_by_horizon(self, scenarios: List[BusinessScenario]) -> Dict[int, List[int]]:
+        by_horizon: Dict[int, List[int]] = {}
+        for index, scenario in enumerate(scenarios):
+            by_horizon.setdefault(int(scenario.time_horizon), []).append(index)
+        return by_horizon
+    
+    def _simulate_groups(self, scenarios: List[BusinessScenario], n: int, sampling: str) -> List[SimulationResult]:
+        results: List[Optional[SimulationResult]] = [None] * len(scenarios)
+        for horizon, indices in self._group_by_horizon(scenarios).items():
+            group = [scenarios[i] for i in indices]
+            paths = np.empty((len(group), len(SimulationResult.ARRAY_FIELDS), n))
+            factor_sums = self._fill_paths(group, horizon, paths, sampling=sampling)
+            for position, index in enumerate(indices):
+                results[index] = self._calculate_statistics(group[position].name, paths[position])
+                if sampling != 'random':
+                    self._post_stratify(results[index], group[position], factor_sums)
+        
+        return results
+    
+    def _simulate_bounded(self, scenario: BusinessScenario, n: int, sampling: str) -> SimulationResult:
+        """Simula por bloques de la secuencia sin retener las n trayectorias
+        
+        El resumen (media, desviación, probabilidad de éxito) es exacto sobre las n
+        trayectorias y los percentiles se estiman con una muestra ponderada; el resultado
+        conserva las primeras BOUNDED_SAMPLE_PATHS trayectorias (una muestra uniforme,
+        porque son i.i.d.), de las que salen el resto de métricas. Sin postestratificación.
+        """
+        from .distributed import PathAccumulator
+        
+        horizon = int(scenario.time_horizon)
+        chunk_size = min(n, self.PATH_BLOCK_SIZE)
+        kept = min(n, self.BOUNDED_SAMPLE_PATHS)
+        # Muestra de NPV por bloque proporcional a su tamaño: en total unas `kept` trayectorias
+        sample_per_path = kept / n
+        chunk = np.empty((1, len(SimulationResult.ARRAY_FIELDS), chunk_size))
+        sample_paths = np.empty((len(SimulationResult.ARRAY_FIELDS), kept))
+        accumulator = PathAccumulator()
+        for start in range(0, n, chunk_size):
+            stop = min(n, start + chunk_size)
+            paths = chunk[:, :, :stop - start]
+            self._fill_paths([scenario], horizon, paths, start, sampling)
+            sample_size = max(1, int(np.ceil((stop - start) * sample_per_path)))
+            accumulator.merge(PathAccumulator.from_paths(paths[0], start, sample_size))
+            if start < kept:
+                sample_paths[:, start:min(stop, kept)] = paths[0, :, :min(stop, kept) - start]
+        return SimulationResult.from_paths(scenario.name, sample_paths, accumulator.summary)
+    
+    def simulate_into(self, scenario: BusinessScenario, out: np.ndarray, start: int = 0) -> np.ndarray:
+        """Simula las trayectorias [start, start + n) de un escenario en un bloque (5, n) ya reservado
+        
+        Permite que el bloque sea memoria compartida u otro buffer externo: no se crea
+        ninguna copia de los arrays por trayectoria.
+        """
+        if out.ndim != 2 or out.shape[0] != len(SimulationResult.ARRAY_FIELDS):
+            raise ValueError(f"out debe tener forma ({len(SimulationResult.ARRAY_FIELDS)}, n), no {out.shape}")
+        self._fill_paths([scenario], int(scenario.time_horizon), out[None], start, self.sampling)
+        return out
+    
+    def simulate_result_into(self, scenario: BusinessScenario, out: np.ndarray,
+                             sampling: Optional[str] = None) -> SimulationResult:
+        """Como simulate_into para las trayectorias [0, n), pero retorna el SimulationResult que
+        envuelve `out` con el resumen de simulate_scenario (postestratificado si `sampling`,
+        por defecto el del motor, no es 'random')
+        """
+        if out.ndim != 2 or out.shape[0] != len(SimulationResult.ARRAY_FIELDS):
+            raise ValueError(f"out debe tener forma ({len(SimulationResult.ARRAY_FIELDS)}, n), no {out.shape}")
+        sampling = self._check_sampling(sampling or self.sampling)
+        factor_sums = self._fill_paths([scenario], int(scenario.time_horizon), out[None], 0, sampling)
+        result = self._calculate_statistics(scenario.name, out)
+        if sampling != 'random':
+            self._post_stratify(result, scenario, factor_sums)
+        return result
+    
+    def simulate_path_range(self, scenario: BusinessScenario, start: int, stop: int) -> np.ndarray:
+        """Regenera exactamente las trayectorias [start, stop) de la ejecución con esta semilla
+        
+        No recorre las trayectorias anteriores: solo se generan los bloques de la
+        secuencia aleatoria que contienen el rango. Retorna un bloque (5, stop - start).
+        """
+        out = np.empty((len(SimulationResult.ARRAY_FIELDS), stop - start))
+        return self.simulate_into(scenario, out, start)
+    
+    def simulate_stratified_range(self, scenario: BusinessScenario, start: int, stop: int,
+                                  n_total: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Como simulate_path_range, pero retorna además el estrato de postestratificación de
+        cada trayectoria en una ejecución de `n_total` trayectorias (None con muestreo
+        'random' o si el escenario no tiene estratos)
+        """
+        out = np.empty((len(SimulationResult.ARRAY_FIELDS), stop - start))
+        factor_sums = self._fill_paths([scenario], int(scenario.time_horizon), out[None], start, self.sampling)
+        if self.sampling == 'random':
+            return out, None
+        return out, self.post_strata(scenario, factor_sums, n_total)
+    
+    def path_cash_flows(self, scenario: BusinessScenario, start: int, stop: int) -> np.ndarray:
+        """Flujos de caja mensuales (stop - start, horizonte) de las trayectorias [start, stop)
+        
+        Útil para analizar en detalle trayectorias concretas (p. ej. valores extremos).
+        """
+        horizon = int(scenario.time_horizon)
+        blocks = []
+        for block_start, lo, hi, normals in self._iter_blocks(horizon, start, stop):
+            blocks.append(self._cash_flows([scenario], horizon, normals[:, lo:hi])[0])
+        return np.concatenate(blocks) if blocks else np.empty((0, horizon))
+    
+    def estimate_tail_risk(self, scenario: BusinessScenario, n_simulations: Optional[int] = None,
+                           levels: Optional[Dict[str, float]] = None, pilot_simulations: int = 5000,
+                           ce_iterations: int = 6, elite_fraction: float = 0.1) -> Dict:
+        """VaR/CVaR extremos (99.5%, 99.9%) del NPV por muestreo por importancia
+        
+        Desplaza la media de las normales de ingresos y de shocks de mercado hacia las
+        pérdidas y repondera cada trayectoria con su razón de verosimilitud. El
+        desplazamiento se elige por entropía cruzada con muestras piloto (trayectorias
+        fuera del rango [0, n) de la misma secuencia). Retorna las métricas ponderadas,
+        el tamaño muestral efectivo y el desplazamiento aplicado a cada factor.
+        """
+        n = n_simulations or self.n_simulations
+        levels = levels or StatisticsCalculator.TAIL_LEVELS
+        target = max(levels.values())
+        tilt = np.zeros(len(self.TILTED_FACTORS))
+        
+        for iteration in range(ce_iterations):
+            start = n + iteration * pilot_simulations
+            npv, log_weights, shifted_means = self._tilted_npv(scenario, tilt, start, start + pilot_simulations)
+            weights = np.exp(log_weights)
+            # Umbral de élite: el cuantil `elite_fraction` de la muestra, sin pasar del objetivo
+            target_var = StatisticsCalculator.weighted_tail_risk(npv, weights, {'objetivo': target})['var_objetivo']
+            threshold = max(np.quantile(npv, elite_fraction), target_var)
+            elite = npv <= threshold
+            tilt = shifted_means[:, elite] @ weights[elite] / weights[elite].sum()
+            if threshold == target_var:
+                break
+        
+        npv, log_weights, _ = self._tilted_npv(scenario, tilt, 0, n)
+        metrics = StatisticsCalculator.weighted_tail_risk(npv, np.exp(log_weights), levels)
+        metrics['tilt'] = dict(zip(self.TILTED_FACTORS, tilt.tolist()))
+        metrics['n_simulations'] = n
+        return metrics
+    
+    def _tilted_npv(self, scenario: BusinessScenario, tilt: np.ndarray, start: int, stop: int):
+        """NPV de las trayectorias [start, stop) con las normales de TILTED_FACTORS desplazadas en `tilt`
+        
+        Retorna (npv, log razón de verosimilitud nominal/desplazada, media mensual de las
+        normales desplazadas por factor) para la actualización de entropía cruzada.
+        """
+        horizon = int(scenario.time_horizon)
+        factors = [self.RANDOM_FACTORS.index(name) for name in self.TILTED_FACTORS]
+        discount_rates = FinancialCalculator.discount_factors(self.discount_rate, horizon)
+        npv, log_weights, shifted_means = [], [], []
+        for block_start, lo, hi, normals in self._iter_blocks(horizon, start, stop):
+            normals = normals[:, lo:hi]
+            base_sums = normals[factors].sum(axis=-1)
+            normals[factors] += tilt[:, None, None]
+            cash_flows = self._cash_flows([scenario], horizon, normals)[0]
+            npv.append((cash_flows * discount_rates).sum(axis=-1) - scenario.initial_investment)
+            # log(φ(z) / φ(z - μ)) con z = z0 + μ, sumado sobre los meses
+            log_weights.append(-tilt @ base_sums - horizon * np.dot(tilt, tilt) / 2)
+            shifted_means.append(normals[factors].mean(axis=-1))
+        return np.concatenate(npv), np.concatenate(log_weights), np.concatenate(shifted_means, axis=1)
+    
+    def _check_sampling(self, sampling: str) -> str:
+        if sampling not in self.SAMPLING_METHODS:
+            raise ValueError(f"Muestreo desconocido '{sampling}'; opciones: {', '.join(self.SAMPLING_METHODS)}")
+        return sampling
+    
+    def _iter_blocks(self, horizon: int, start: int, stop: int, sampling: str = 'random'):
+        # Bloques de la secuencia que cubren [start, stop): (inicio del bloque, desde, hasta, normales)
+        size = self.PATH_BLOCK_SIZE
+        for block in range(start // size, -(-stop // size)):
+            block_start = block * size
+            lo, hi = max(start, block_start) - block_start, min(stop, block_start + size) - block_start
+            yield block_start, lo, hi, self._block_normals(block, horizon, sampling)
+    
+    def _block_normals(self, block: int, horizon: int, sampling: str = 'random') -> np.ndarray:
+        """Normales estándar (4, PATH_BLOCK_SIZE, horizonte) del bloque de trayectorias `block`
+        
+        Cada bloque tiene su propia secuencia Philox con la clave de la semilla y el índice
+        de bloque en el contador, así que puede generarse sin generar los anteriores. La
+        estratificación se hace dentro del bloque, de modo que sigue siendo regenerable.
+        """
+        counter = [0, 0, block, 0]
+        generator = np.random.Generator(np.random.Philox(key=self._philox_key, counter=counter))
+        shape = (len(self.RANDOM_FACTORS), self.PATH_BLOCK_SIZE, horizon)
+        if sampling == 'lhs':
+            # Cada coordenada (factor, mes) toma exactamente un valor de cada estrato 1/B
+            strata = generator.permuted(np.broadcast_to(np.arange(shape[1])[:, None], shape), axis=1)
+            return ndtri((strata + generator.random(shape)) / self.PATH_BLOCK_SIZE)
+        normals = generator.standard_normal(shape)
+        if sampling == 'stratified':
+            # La suma mensual estandarizada de cada factor recorre los STRATA estratos: en
+            # ingresos de forma intercalada (los rangos parciales quedan equilibrados) y en
+            # el resto con permutaciones independientes
+            strata = np.tile(np.arange(self.PATH_BLOCK_SIZE) % self.STRATA, (shape[0], 1))
+            strata[1:] = generator.permuted(strata[1:], axis=1)
+            sums = ndtri((strata + generator.random(shape[:2])) / self.STRATA) * np.sqrt(horizon)
+            # Conserva las desviaciones mensuales (independientes de la suma) e impone la suma
+            normals += ((sums - normals.sum(axis=-1)) / horizon)[..., None]
+        return normals
+    
+    def _fill_paths(self, scenarios: List[BusinessScenario], horizon: int, paths: np.ndarray, start: int = 0,
+                    sampling: str = 'random') -> np.ndarray:
+        """Rellena `paths` y retorna las sumas mensuales estandarizadas de cada factor (4, n)"""
+        stop = start + paths.shape[-1]
+        factor_sums = np.empty((len(self.RANDOM_FACTORS), paths.shape[-1]))
+        for block_start, lo, hi, normals in self._iter_blocks(horizon, start, stop, sampling):
+            offset = block_start + lo - start
+            normals = normals[:, lo:hi]
+            paths[:, :, offset:offset + hi - lo] = self._simulate_block(scenarios, horizon, normals)
+            factor_sums[:, offset:offset + hi - lo] = normals.sum(axis=-1) / np.sqrt(horizon)
+        return factor_sums
+    
+    def post_strata(self, scenario: BusinessScenario, factor_sums: np.ndarray,
+                    n_total: Optional[int] = None) -> Optional[np.ndarray]:
+        """Estrato de cada trayectoria para la postestratificación (None si no hay estratos)
+        
+        Los estratos son cuantiles equiprobables de la combinación lineal de las sumas de
+        factores que aproxima la sensibilidad del flujo mensual (normal estándar exacta),
+        así que la corrección no introduce sesgo aunque el bloque quede incompleto. Su
+        número depende del total de trayectorias de la ejecución (`n_total`, por defecto
+        las de `factor_sums`), de modo que un tramo recibe los mismos estratos que en la
+        ejecución completa.
+        """
+        loadings = np.array([scenario.revenue_std, scenario.revenue_mean * scenario.market_volatility,
+                             -scenario.cost_std, 0.0])
+        norm = np.linalg.norm(loadings)
+        if norm == 0:
+            return None
+        n_strata = self.n_post_strata(n_total or factor_sums.shape[1])
+        strata = np.minimum((ndtr(loadings @ factor_sums / norm) * n_strata).astype(int), n_strata - 1)
+        return strata.astype(np.int16)
+    
+    def n_post_strata(self, n: int) -> int:
+        """Número de estratos de la postestratificación para `n` trayectorias"""
+        return max(1, min(self.STRATA, n // 20))
+    
+    @staticmethod
+    def post_stratified_estimate(counts: np.ndarray, totals: np.ndarray) -> float:
+        """Media de las medias por estrato (estratos equiprobables), ignorando los vacíos"""
+        filled = counts > 0
+        return float(np.mean(totals[filled] / counts[filled]))
+    
+    def _post_stratify(self, result: SimulationResult, scenario: BusinessScenario, factor_sums: np.ndarray):
+        """Reemplaza mean_npv y success_probability por estimadores postestratificados"""
+        strata = self.post_strata(scenario, factor_sums)
+        if strata is None:
+            return
+        n_strata = self.n_post_strata(factor_sums.shape[1])
+        counts = np.bincount(strata, minlength=n_strata)
+        npv_values = result.net_present_values
+        result.mean_npv = self.post_stratified_estimate(
+            counts, np.bincount(strata, weights=npv_values, minlength=n_strata))
+        result.success_probability = self.post_stratified_estimate(
+            counts, np.bincount(strata, weights=(npv_values > 0) * 100.0, minlength=n_strata))
+        # Para que el bootstrap remuestree dentro de los estratos
+        result.strata = strata
+    
+    def _cash_flows(self, scenarios: List[BusinessScenario], horizon: int, normals: np.ndarray) -> np.ndarray:
+        """Flujos mensuales (escenarios, trayectorias, meses) a partir de las normales estándar
+        
+        Todos los escenarios usan las mismas normales (números aleatorios comunes), lo que
+        reduce la varianza al compararlos; cada uno mantiene su propia distribución.
+        """
+        def column(attr):
+            return np.array([getattr(s, attr) for s in scenarios], dtype=np.float64)[:, None, None]
+        
+        z_revenue, z_market, z_cost, z_inflation = normals
+        months = np.arange(horizon)
+        
+        # Ingresos con tendencia de crecimiento y shocks de mercado
+        revenues = column('revenue_mean') + column('revenue_std') * z_revenue
+        revenues *= 1 + 0.02 * months
+        revenues *= 1 + column('market_volatility') * z_market
+        np.maximum(revenues, 0, out=revenues)
+        
+        costs = np.maximum(column('cost_mean') + column('cost_std') * z_cost, 0)
+        
+        # Factores de inflación acumulada
+        inflation = column('inflation_rate') + 0.01 * z_inflation
+        inflation_factors = 1 - np.cumsum(inflation, axis=-1) / 12
         
-        success_probability = np.mean(npv_values > 0) * 100
-        mean_npv = np.mean(npv_values)
-        std_npv = np.std(npv_values)
-        percentile_5 = np.percentile(npv_values, 5)
-        percentile_95 = np.percentile(npv_values, 95)
-        var_95 = np.percentile(npv_values, 5)  # Value at Risk
-        
-        return SimulationResult(
-            scenario_name=name,
-            net_present_values=npv_values,
-            roi_values=roi_values,
-            break_even_months=break_even_months,
-            success_probability=success_probability,
-            mean_npv=mean_npv,
-            std_npv=std_npv,
-            percentile_5=percentile_5,
-            percentile_95=percentile_95,
-            var_95=var_95
-        )
\ No newline at end of file
+        return (revenues - costs) * inflation_factors
+    
+    def _simulate_block(self, scenarios: List[BusinessScenario], horizon: int, normals: np.ndarray) -> np.ndarray:
+        """Simula las trayectorias de `normals` para cada escenario; retorna un array (escenarios, 5, trayectorias)"""
+        cash_flows = self._cash_flows(scenarios, horizon, normals)
+        
+        investment = np.array([s.initial_investment for s in scenarios], dtype=np.float64)[:, None]
+        discount_rates = FinancialCalculator.discount_factors(self.discount_rate, horizon)
+        # Suma por trayectoria (no matmul): el resultado no depende de cuántas se calculen juntas
+        npv = (cash_flows * discount_rates).sum(axis=-1) - investment
+        
+        total_profit = cash_flows.sum(axis=-1)
+        safe_investment = np.where(investment > 0, investment, 1)
+        roi = np.where(investment > 0, total_profit / safe_investment * 100, 0)
+        
+        # Break-even: primer mes con flujo acumulado positivo (horizonte si no ocurre)
+        positive = np.cumsum(cash_flows, axis=-1) > investment[:, :, None]
+        break_even = np.where(positive.any(axis=-1), positive.argmax(axis=-1) + 1, horizon)
+        
+        # TIR (en %) y payback descontado de todas las trayectorias a la vez
+        irr, _ = FinancialCalculator.irr(cash_flows, investment)
+        payback = FinancialCalculator.discounted_payback(cash_flows, investment, self.discount_rate)
+        
+        return np.stack([npv, roi, break_even, irr * 100, payback], axis=1)
+    
+    def _calculate_statistics(self, name: str, paths: np.ndarray) -> SimulationResult:
+        """Calcula estadísticas del resultado de simulación"""
+        return SimulationResult.from_paths(name, paths)
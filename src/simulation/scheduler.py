@@ -0,0 +1,288 @@
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from ..models.business_scenario import BusinessScenario, SimulationResult
+from ..utils.memory_profile import format_bytes
+from ..utils.telemetry import get_logger, span
+from ..utils.instrumentation import QUEUE_DEPTH, SCHEDULER_JOBS
+
+logger = get_logger('scheduler')
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+class AdmissionRejected(RuntimeError):
+    """El planificador no admite el trabajo: cuota del usuario agotada o espera excedida"""
+
+    def __init__(self, user: str, reason: str):
+        self.user = user
+        self.reason = reason
+        super().__init__(f"Simulación rechazada para '{user}': {reason}")
+
+
+class JobTooLarge(AdmissionRejected):
+    """El trabajo supera el tamaño máximo admitido por el planificador"""
+
+
+class _Job:
+    __slots__ = ('user', 'priority', 'cost', 'start_tag', 'finish_tag', 'sequence', 'admitted')
+
+    def __init__(self, user: str, priority: str, cost: float, start_tag: float, finish_tag: float, sequence: int):
+        self.user = user
+        self.priority = priority
+        self.cost = cost
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.sequence = sequence
+        self.admitted = threading.Event()
+
+
+class SimulationScheduler:
+    """Control de admisión y reparto justo de la CPU entre simulaciones
+
+    Cada simulación ocupa un hueco de ejecución mientras dura; como mucho hay
+    `max_concurrent` a la vez en el proceso (SIMULATION_MAX_CONCURRENCY, por defecto
+    el número de CPUs). Los trabajos que esperan se ordenan por:
+
+    1. Prioridad: 'interactive' (clics del dashboard) antes que 'batch' (barridos,
+       comparaciones). Los 'batch' nunca ocupan los `interactive_reserved` últimos huecos.
+    2. Cola justa ponderada entre usuarios (start-time fair queueing): cada trabajo
+       cuesta trayectorias × meses / peso del usuario y se ejecuta primero el de menor
+       etiqueta de fin virtual, así que el barrido de 10M trayectorias de un usuario se
+       intercala con los clics de 5k de los demás en lugar de bloquearlos.
+
+    Cuotas por usuario: `max_running_per_user` trabajos en ejecución y
+    `max_queued_per_user` en espera; al superar la segunda, o `max_job_paths` en un
+    solo trabajo (SIMULATION_MAX_JOB_PATHS), se lanza AdmissionRejected / JobTooLarge
+    sin esperar. El trabajo se ejecuta en el hilo que llama.
+    """
+
+    PRIORITIES = ('interactive', 'batch')
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_running_per_user: int = 2,
+                 max_queued_per_user: int = 32, max_job_paths: Optional[int] = None,
+                 interactive_reserved: int = 1, user_weights: Optional[Dict[str, float]] = None,
+                 queue_timeout: Optional[float] = 300):
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv('SIMULATION_MAX_CONCURRENCY', '0')) or os.cpu_count() or 1
+        if max_job_paths is None:
+            max_job_paths = int(float(os.getenv('SIMULATION_MAX_JOB_PATHS', '20000000')))
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent debe ser al menos 1")
+        self.max_concurrent = max_concurrent
+        self.max_running_per_user = max_running_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.max_job_paths = max_job_paths
+        # Con un solo hueco los 'batch' también deben poder ejecutarse
+        self.batch_limit = max(1, max_concurrent - interactive_reserved)
+        self.user_weights = dict(user_weights or {})
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._queued: List[_Job] = []
+        self._running = 0
+        self._running_batch = 0
+        self._running_by_user: Dict[str, int] = {}
+        self._queued_by_user: Dict[str, int] = {}
+        self._finish_tags: Dict[str, float] = {}  # última etiqueta de fin de cada usuario
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self.stats = {'admitted': 0, 'rejected': 0, 'timed_out': 0}
+        QUEUE_DEPTH.track(self.queue_depth, queue='scheduler')
+
+    def queue_depth(self) -> int:
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def bind(self, engine, user: str, priority: str = 'interactive',
+             timeout: Optional[float] = None) -> 'ScheduledEngine':
+        """Vista del motor cuyas simulaciones pasan por este planificador"""
+        return ScheduledEngine(engine, self, user, priority, timeout)
+
+    @contextmanager
+    def slot(self, user: str, priority: str = 'interactive', n_paths: int = 0, months: int = 1,
+             timeout: Optional[float] = None):
+        """Espera turno para un trabajo de `n_paths` trayectorias de `months` meses y ocupa un hueco
+
+        Lanza JobTooLarge o AdmissionRejected sin esperar si el trabajo no es admisible,
+        y AdmissionRejected si no obtiene hueco en `timeout` segundos (por defecto
+        queue_timeout).
+        """
+        job = self.acquire(user, priority, n_paths, months, timeout)
+        try:
+            yield
+        finally:
+            self.release(job)
+
+    def acquire(self, user: str, priority: str = 'interactive', n_paths: int = 0, months: int = 1,
+                timeout: Optional[float] = None) -> _Job:
+        """Como slot(), para trabajos que terminan en otro hilo o proceso: retorna el
+        trabajo admitido, que debe devolverse con release()"""
+        if priority not in self.PRIORITIES:
+            raise ValueError(f"Prioridad desconocida: {priority}. Opciones: {', '.join(self.PRIORITIES)}")
+        user = str(user)
+        if n_paths > self.max_job_paths:
+            self._reject(priority)
+            raise JobTooLarge(user, f"{n_paths:,} trayectorias superan el máximo por trabajo "
+                                    f"({self.max_job_paths:,}); reduzca n_simulations o divida el barrido")
+
+        job = self._enqueue(user, priority, max(1, n_paths) * max(1, months))
+        timeout = self.queue_timeout if timeout is None else timeout
+        with span('scheduler.wait', user=user, priority=priority, n_paths=n_paths):
+            admitted = job.admitted.wait(timeout)
+        if not admitted and not self._withdraw(job):
+            self._reject(priority, 'timed_out')
+            raise AdmissionRejected(user, f"sin hueco de ejecución tras {timeout:g} s de espera")
+        SCHEDULER_JOBS.inc(priority=priority, outcome='admitted')
+        return job
+
+    def release(self, job: _Job):
+        """Libera el hueco de un trabajo admitido con acquire()"""
+        self._finish(job)
+
+    def _enqueue(self, user: str, priority: str, cost: float) -> _Job:
+        with self._lock:
+            if self._queued_by_user.get(user, 0) >= self.max_queued_per_user:
+                self.stats['rejected'] += 1
+                SCHEDULER_JOBS.inc(priority=priority, outcome='rejected')
+                logger.warning("Cola llena para '%s' (%d trabajos en espera)", user, self.max_queued_per_user)
+                raise AdmissionRejected(user, f"ya tiene {self.max_queued_per_user} simulaciones en espera")
+            # Etiquetas virtuales: el trabajo empieza cuando acaba el anterior del usuario
+            # o en el tiempo virtual actual si el usuario estaba inactivo
+            start_tag = max(self._virtual_time, self._finish_tags.get(user, 0.0))
+            finish_tag = start_tag + cost / self.user_weights.get(user, 1.0)
+            self._finish_tags[user] = finish_tag
+            job = _Job(user, priority, cost, start_tag, finish_tag, next(self._sequence))
+            self._queued.append(job)
+            self._queued_by_user[user] = self._queued_by_user.get(user, 0) + 1
+            self._dispatch()
+        return job
+
+    def _dispatch(self):
+        # Con el lock tomado: admite trabajos mientras queden huecos y candidatos
+        while self._running < self.max_concurrent:
+            candidates = [job for job in self._queued
+                          if self._running_by_user.get(job.user, 0) < self.max_running_per_user
+                          and (job.priority == 'interactive' or self._running_batch < self.batch_limit)]
+            if not candidates:
+                return
+            job = min(candidates, key=lambda j: (self.PRIORITIES.index(j.priority), j.finish_tag, j.sequence))
+            self._queued.remove(job)
+            self._queued_by_user[job.user] -= 1
+            if not self._queued_by_user[job.user]:
+                del self._queued_by_user[job.user]
+            self._virtual_time = max(self._virtual_time, job.start_tag)
+            self._running += 1
+            self._running_by_user[job.user] = self._running_by_user.get(job.user, 0) + 1
+            if job.priority == 'batch':
+                self._running_batch += 1
+            self.stats['admitted'] += 1
+            job.admitted.set()
+
+    def _withdraw(self, job: _Job) -> bool:
+        """Retira un trabajo cuya espera expiró; True si entretanto había sido admitido"""
+        with self._lock:
+            if job.admitted.is_set():
+                return True
+            self._queued.remove(job)
+            self._queued_by_user[job.user] -= 1
+            if not self._queued_by_user[job.user]:
+                del self._queued_by_user[job.user]
+            # Devuelve al usuario el coste que no llegó a consumir
+            if self._finish_tags.get(job.user) == job.finish_tag:
+                self._finish_tags[job.user] = job.start_tag
+            return False
+
+    def _finish(self, job: _Job):
+        with self._lock:
+            self._running -= 1
+            self._running_by_user[job.user] -= 1
+            if not self._running_by_user[job.user]:
+                del self._running_by_user[job.user]
+            if job.priority == 'batch':
+                self._running_batch -= 1
+            if not self._queued and not self._running:
+                # Sistema vacío: se reinicia el reloj virtual para que no crezca sin límite
+                self._virtual_time = 0.0
+                self._finish_tags.clear()
+            self._dispatch()
+
+    def _reject(self, priority: str, outcome: str = 'rejected'):
+        with self._lock:
+            self.stats[outcome] += 1
+        SCHEDULER_JOBS.inc(priority=priority, outcome=outcome)
+
+
+class ScheduledEngine:
+    """MonteCarloEngine cuyas simulaciones esperan turno en un SimulationScheduler
+
+    Se usa donde se espera un motor: simulate_scenario y simulate_scenarios pasan por
+    el planificador con el usuario y la prioridad de la vista; el resto de atributos
+    son los del motor. Pasada a StatisticsCalculator.sensitivity_analysis, cada paso
+    del barrido es un trabajo propio y se intercala con los de otros usuarios (con
+    n_jobs > 1, cada escenario enviado a un worker de ParallelSimulator).
+    """
+
+    def __init__(self, engine, scheduler: SimulationScheduler, user: str, priority: str = 'interactive',
+                 timeout: Optional[float] = None):
+        self.engine = engine
+        self.scheduler = scheduler
+        self.user = user
+        self.priority = priority
+        self.timeout = timeout
+
+    def simulate_scenario(self, scenario: BusinessScenario, sampling: Optional[str] = None) -> SimulationResult:
+        with self._slot([scenario], None, sampling):
+            return self.engine.simulate_scenario(scenario, sampling)
+
+    def simulate_scenarios(self, scenarios: List[BusinessScenario], n_simulations: Optional[int] = None,
+                           sampling: Optional[str] = None) -> List[SimulationResult]:
+        with self._slot(scenarios, n_simulations, sampling):
+            return self.engine.simulate_scenarios(scenarios, n_simulations, sampling)
+
+    def _slot(self, scenarios: List[BusinessScenario], n_simulations: Optional[int], sampling: Optional[str]):
+        n = n_simulations or self.engine.n_simulations
+        months = max(int(scenario.time_horizon) for scenario in scenarios)
+        self._check_memory(scenarios, n, months, sampling)
+        return self.scheduler.slot(self.user, self.priority, len(scenarios) * n, months, self.timeout)
+
+    def _check_memory(self, scenarios: List[BusinessScenario], n: int, months: int, sampling: Optional[str]):
+        # Con on_budget='refuse' el motor rechazaría el trabajo al ejecutarlo: se rechaza
+        # antes de que ocupe sitio en la cola (previsión conservadora: el horizonte mayor)
+        budget = self.engine.memory_budget
+        if budget is None or self.engine.on_budget != 'refuse':
+            return
+        predicted = self.engine.predict_memory(n, months, len(scenarios), sampling)
+        if predicted * self.engine.MEMORY_HEADROOM > budget:
+            raise JobTooLarge(self.user, f"se prevén {format_bytes(predicted)} de memoria y el presupuesto es "
+                                         f"{format_bytes(budget)}; reduzca n_simulations")
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+
+def client_identity(user: Optional[Dict] = None) -> str:
+    """Clave de cuotas y reparto de un cliente: el usuario autenticado o, si es anónimo,
+    la dirección remota de la petición en curso (no un id emitido por el navegador)"""
+    if user and user.get('id') is not None:
+        return f"user:{user['id']}"
+    from flask import has_request_context, request
+    if has_request_context() and request.remote_addr:
+        return f"ip:{request.remote_addr}"
+    return 'anonymous'
+
+
+def get_default_scheduler() -> SimulationScheduler:
+    """Planificador compartido por todas las entradas de simulación del proceso"""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = SimulationScheduler()
+        return _default_scheduler
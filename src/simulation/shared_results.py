@@ -0,0 +1,194 @@
+import os
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ..models.business_scenario import BusinessScenario, SimulationResult
+from .monte_carlo_engine import MonteCarloEngine
+from ..utils.instrumentation import record_simulation
+from ..utils.memory_profile import MemoryBudgetExceeded
+from ..utils.telemetry import get_logger
+
+logger = get_logger('shared_results')
+
+
+class SharedPathsBlock:
+    """Bloque (5, n) de trayectorias en multiprocessing.shared_memory
+
+    El proceso padre crea el bloque y es su único propietario: los workers se adjuntan
+    por nombre, escriben las trayectorias y cierran su vista. release() cierra y
+    elimina el segmento; un finalizador lo hace igualmente si se olvida llamarlo.
+    """
+
+    def __init__(self, n_simulations: int, name: Optional[str] = None):
+        self.shape = (len(SimulationResult.ARRAY_FIELDS), n_simulations)
+        nbytes = max(1, int(np.prod(self.shape)) * np.dtype(np.float64).itemsize)
+        create = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=nbytes if create else 0)
+        self.owner = create
+        self._finalizer = weakref.finalize(self, self._cleanup, self.shm, self.owner)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def array(self) -> np.ndarray:
+        """Vista NumPy sin copia sobre el segmento compartido"""
+        return np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)
+
+    def to_result(self, scenario_name: str, summary: Optional[Dict] = None) -> SimulationResult:
+        """SimulationResult que envuelve el segmento; result.release() lo libera"""
+        return SimulationResult.from_paths(scenario_name, self.array(), summary, release=self.release)
+
+    def release(self):
+        """Cierra la vista local y, si es el propietario, elimina el segmento"""
+        self._finalizer()
+
+    @staticmethod
+    def _cleanup(shm: shared_memory.SharedMemory, owner: bool):
+        if owner:
+            shm.unlink()
+        try:
+            shm.close()
+        except BufferError:
+            # Aún hay vistas NumPy vivas: el mapeo se libera cuando se recolecten;
+            # el nombre ya no existe, así que la memoria no sobrevive al proceso
+            pass
+
+
+def _simulate_into_shared(block_name: str, scenario: BusinessScenario, n_simulations: int,
+                          discount_rate: float, seed: int, sampling: str = 'random') -> Dict:
+    """Tarea de worker: simula en el bloque compartido y retorna solo el resumen"""
+    block = SharedPathsBlock(n_simulations, name=block_name)
+    try:
+        engine = MonteCarloEngine(n_simulations=n_simulations, use_database=False, discount_rate=discount_rate,
+                                  seed=seed, sampling=sampling)
+        result = engine.simulate_result_into(scenario, block.array())
+        summary = {name: float(value) for name, value in result.summary.items()}
+        del result
+    finally:
+        block.release()
+    return summary
+
+
+def _simulate_bounded(scenario: BusinessScenario, n_simulations: int, discount_rate: float, seed: int,
+                      sampling: str, memory_budget: int) -> SimulationResult:
+    """Tarea de worker en modo acotado: retorna el resultado con la muestra de trayectorias"""
+    engine = MonteCarloEngine(n_simulations=n_simulations, use_database=False, discount_rate=discount_rate,
+                              seed=seed, sampling=sampling, memory_budget=memory_budget, on_budget='bounded')
+    return engine.simulate_scenarios([scenario])[0]
+
+
+class ParallelSimulator:
+    """Simula escenarios en procesos worker devolviendo los resultados por memoria compartida
+
+    Cada escenario se escribe directamente en un SharedPathsBlock creado por el padre;
+    de vuelta solo viaja el resumen, así que no hay copias pickle de los arrays. Los
+    resultados deben liberarse con release() (o usarse como context manager).
+    Con `scheduler`, cada escenario espera su turno (acquire) antes de enviarse a un
+    worker y libera el hueco al terminar, como cualquier otro trabajo de `user`.
+
+    `sampling`, `memory_budget` y `on_budget` tienen el significado de MonteCarloEngine;
+    el presupuesto cubre los bloques compartidos y los intermedios de los workers
+    simultáneos. Si no cabe, se rechaza o cada worker simula en modo acotado con su parte.
+    """
+
+    def __init__(self, n_workers: Optional[int] = None, n_simulations: int = 10000,
+                 discount_rate: float = 0.10, seed: int = 42, scheduler=None,
+                 user: str = 'batch', priority: str = 'batch', timeout: Optional[float] = None,
+                 sampling: str = 'random', memory_budget: Optional[int] = None, on_budget: str = 'bounded'):
+        self.n_workers = n_workers
+        self.n_simulations = n_simulations
+        self.discount_rate = discount_rate
+        self.seed = seed
+        self.scheduler = scheduler
+        self.user = user
+        self.priority = priority
+        self.timeout = timeout
+        # Motor de referencia: valida la configuración y resuelve el presupuesto por defecto
+        self._engine = MonteCarloEngine(n_simulations=n_simulations, use_database=False, discount_rate=discount_rate,
+                                        seed=seed, sampling=sampling, memory_budget=memory_budget,
+                                        on_budget=on_budget)
+
+    @property
+    def sampling(self) -> str:
+        return self._engine.sampling
+
+    @property
+    def memory_budget(self) -> Optional[int]:
+        return self._engine.memory_budget
+
+    @property
+    def on_budget(self) -> str:
+        return self._engine.on_budget
+
+    def predict_memory(self, scenarios: List[BusinessScenario], n_simulations: Optional[int] = None) -> int:
+        """Bytes previstos: los bloques compartidos más los intermedios de los workers simultáneos"""
+        n = n_simulations or self.n_simulations
+        block_bytes = len(SimulationResult.ARRAY_FIELDS) * n * 8
+        per_worker = max(self._engine.predict_memory(n, int(scenario.time_horizon)) for scenario in scenarios)
+        return len(scenarios) * block_bytes + self._workers(scenarios) * (per_worker - block_bytes)
+
+    def simulate_scenarios(self, scenarios: List[BusinessScenario],
+                           n_simulations: Optional[int] = None) -> List[SimulationResult]:
+        """Simula los escenarios en paralelo; el orden de salida es el de entrada
+
+        Con la misma semilla el resultado es idéntico al de MonteCarloEngine en un proceso.
+        """
+        n = n_simulations or self.n_simulations
+        predicted = self.predict_memory(scenarios, n)
+        if not self._engine._fits_budget(predicted):
+            if self.on_budget == 'refuse':
+                raise MemoryBudgetExceeded('parallel_simulate_scenarios', predicted, self.memory_budget)
+            return self._simulate_bounded(scenarios, n)
+
+        blocks = [SharedPathsBlock(n) for _ in scenarios]
+        started = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                futures = [self._submit(executor, scenario, n, _simulate_into_shared, block.name, scenario, n,
+                                        self.discount_rate, self.seed, self.sampling)
+                           for block, scenario in zip(blocks, scenarios)]
+                summaries = [future.result() for future in futures]
+        except BaseException:
+            for block in blocks:
+                block.release()
+            raise
+        record_simulation(len(scenarios) * n, time.perf_counter() - started)
+        return [block.to_result(scenario.name, summary)
+                for block, scenario, summary in zip(blocks, scenarios, summaries)]
+
+    def _simulate_bounded(self, scenarios: List[BusinessScenario], n: int) -> List[SimulationResult]:
+        # Sin bloques compartidos: cada worker simula por bloques con su parte del presupuesto
+        share = self.memory_budget // self._workers(scenarios)
+        logger.warning("ParallelSimulator: %d × %d trayectorias superan el presupuesto de memoria; modo acotado",
+                       len(scenarios), n)
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            futures = [self._submit(executor, scenario, n, _simulate_bounded, scenario, n, self.discount_rate,
+                                    self.seed, self.sampling, share)
+                       for scenario in scenarios]
+            results = [future.result() for future in futures]
+        record_simulation(len(scenarios) * n, time.perf_counter() - started)
+        return results
+
+    def _workers(self, scenarios: List[BusinessScenario]) -> int:
+        return max(1, min(len(scenarios), self.n_workers or os.cpu_count() or 1))
+
+    def _submit(self, executor: ProcessPoolExecutor, scenario: BusinessScenario, n: int, task, *args):
+        job = None
+        if self.scheduler is not None:
+            job = self.scheduler.acquire(self.user, self.priority, n, int(scenario.time_horizon), self.timeout)
+        try:
+            future = executor.submit(task, *args)
+        except BaseException:
+            if job is not None:
+                self.scheduler.release(job)
+            raise
+        if job is not None:
+            future.add_done_callback(lambda _: self.scheduler.release(job))
+        return future
@@ -4,37 +4,62 @@ import plotly.graph_objs as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
+from typing import Optional
 from ..simulation.monte_carlo_engine import MonteCarloEngine
+from ..simulation.scheduler import AdmissionRejected, client_identity, get_default_scheduler
 from ..models.business_scenario import BusinessScenario
 from ..utils.statistics import StatisticsCalculator
 from ..auth.auth_manager import AuthManager
 from .projects_manager import ProjectsManager
+from .result_cache import SessionResultCache
+from ..api.routes import register_simulation_api
+from ..api.monitoring import register_metrics_endpoint
+from ..utils.telemetry import get_logger, span
+
+logger = get_logger('ui')
 
 class DecisionDashboard:
     """Dashboard interactivo para análisis de decisiones empresariales"""
     
-    def __init__(self):
+    def __init__(self, auth_manager: Optional[AuthManager] = None):
         self.app = dash.Dash(__name__)
-        self.engine = MonteCarloEngine(n_simulations=5000)
+        # API JSON de simulación en el servidor Flask subyacente (/api/simulate)
+        register_simulation_api(self.app.server)
+        # Métricas operativas en formato Prometheus (/metrics)
+        register_metrics_endpoint(self.app.server)
+        self.engine = MonteCarloEngine(n_simulations=5000, sampling='stratified')
+        # Control de admisión y reparto justo de la CPU entre sesiones
+        self.scheduler = get_default_scheduler()
+        # Resultados, métricas y figuras en el servidor; el navegador solo guarda claves
+        self.result_cache = SessionResultCache()
         try:
-            self.auth = AuthManager()
+            self.auth = auth_manager or AuthManager()
             self.projects_manager = ProjectsManager(self.auth)
             self.auth_enabled = True
         except Exception as e:
-            print(f"⚠️ Autenticación deshabilitada: {e}")
+            logger.warning("Autenticación deshabilitada: %s", e)
             self.auth = None
             self.projects_manager = None
             self.auth_enabled = False
         
-        self.current_user = None
         self.setup_layout()
         self.setup_callbacks()
+        if self.projects_manager:
+            # Paginación de listados y detalle de simulaciones
+            self.projects_manager.register_callbacks(self.app, self.session_user)
     
     def setup_layout(self):
         """Configura el layout del dashboard"""
         
-        self.app.layout = html.Div([
+        # Layout como función: cada carga de página recibe su propio id de sesión
+        self.app.layout = self.serve_layout
+    
+    def serve_layout(self):
+        """Layout raíz con el id de sesión de la caché de resultados"""
+        return html.Div([
             dcc.Store(id='session-store'),
+            dcc.Store(id='session-id', data=SessionResultCache.new_session_id()),
+            dcc.Store(id='last-result-key', data=None),
             html.Div(id='main-content')
         ])
     
@@ -72,6 +97,7 @@ class DecisionDashboard:
                         options=[
                             {'label': '📊 Dashboard', 'value': 'dashboard'},
                             {'label': '📁 Mis Proyectos', 'value': 'projects'},
+                            {'label': '🔬 Mis Simulaciones', 'value': 'simulations'},
                             {'label': '👥 Gestión Usuarios', 'value': 'users'},
                             {'label': '🚪 Cerrar Sesión', 'value': 'logout'}
                         ],
@@ -85,7 +111,7 @@ class DecisionDashboard:
             html.Div(id='page-content')
         ])
     
-    def dashboard_content(self):
+    def dashboard_content(self, results=None):
         """Contenido del dashboard de simulación"""
         return html.Div([
             html.H1("📊 Simulación Monte Carlo", 
@@ -143,18 +169,26 @@ class DecisionDashboard:
             ], style={'backgroundColor': '#ecf0f1', 'padding': '20px', 'borderRadius': '10px', 'marginBottom': '20px'}),
             
             # Resultados
-            html.Div(id='results-container'),
+            html.Div(id='results-container', children=results),
             
         ], style={'maxWidth': '1200px', 'margin': '0 auto', 'padding': '20px'})
     
-    def projects_content(self):
+    def projects_content(self, user):
         """Contenido de proyectos"""
-        if self.current_user:
-            return self.projects_manager.projects_content(self.current_user['id'])
+        if user:
+            return self.projects_manager.projects_content(user['id'])
         return html.Div("Error: Usuario no autenticado")
     
-    def users_content(self):
-        """Contenido de usuarios"""
+    def simulations_content(self, user):
+        """Contenido de simulaciones"""
+        if user:
+            return self.projects_manager.simulations_content(user['id'])
+        return html.Div("Error: Usuario no autenticado")
+    
+    def users_content(self, user):
+        """Contenido de usuarios (solo admin)"""
+        if not user or user.get('role') != 'admin':
+            return html.Div("Error: Acceso restringido a administradores")
         return self.projects_manager.users_content()
     
     def setup_callbacks(self):
@@ -162,12 +196,15 @@ class DecisionDashboard:
         
         @self.app.callback(
             Output('main-content', 'children'),
-            Input('session-store', 'data')
+            Input('session-store', 'data'),
+            [State('session-id', 'data'),
+             State('last-result-key', 'data')]
         )
-        def display_page(session_data):
+        def display_page(session_data, session_id, result_key):
             if not self.auth_enabled:
-                return self.dashboard_content()  # Modo sin autenticación
-            if not session_data:
+                return self.dashboard_content(self.cached_results(session_id, result_key))  # Modo sin autenticación
+            # La sesión se valida en el almacén compartido: el navegador solo guarda el token
+            if not self.session_user(session_data):
                 return self.login_layout()
             return self.main_dashboard_layout()
         
@@ -180,41 +217,62 @@ class DecisionDashboard:
             if n_clicks and username and password:
                 result = self.auth.login(username, password)
                 if result:
-                    self.current_user = result['user']
-                    return result
+                    return {'session_id': result['session_id']}
+            return None
+        
+        @self.app.callback(
+            Output('session-store', 'data', allow_duplicate=True),
+            Input('menu-dropdown', 'value'),
+            State('session-store', 'data'),
+            prevent_initial_call=True
+        )
+        def logout(selected_page, session_data):
+            if selected_page != 'logout':
+                return dash.no_update
+            if session_data and session_data.get('session_id'):
+                self.auth.logout(session_data['session_id'])
             return None
         
         @self.app.callback(
             Output('page-content', 'children'),
-            Input('menu-dropdown', 'value')
+            Input('menu-dropdown', 'value'),
+            [State('session-id', 'data'),
+             State('last-result-key', 'data'),
+             State('session-store', 'data')]
         )
-        def display_content(selected_page):
+        def display_content(selected_page, session_id, result_key, session_data):
             if selected_page == 'dashboard':
-                return self.dashboard_content()
+                # Al volver al dashboard se reutiliza el último resultado sin re-simular
+                return self.dashboard_content(self.cached_results(session_id, result_key))
             elif selected_page == 'projects':
-                return self.projects_content()
+                return self.projects_content(self.session_user(session_data))
+            elif selected_page == 'simulations':
+                return self.simulations_content(self.session_user(session_data))
             elif selected_page == 'users':
-                return self.users_content()
+                return self.users_content(self.session_user(session_data))
             return self.dashboard_content()
         
         @self.app.callback(
-            Output('results-container', 'children'),
+            [Output('results-container', 'children'),
+             Output('last-result-key', 'data')],
             Input('run-simulation', 'n_clicks'),
-            [State('scenario-name', 'value'),
+            [State('session-id', 'data'),
+             State('scenario-name', 'value'),
              State('initial-investment', 'value'),
              State('revenue-mean', 'value'),
              State('revenue-std', 'value'),
              State('cost-mean', 'value'),
              State('cost-std', 'value'),
              State('inflation-rate', 'value'),
-             State('market-volatility', 'value')]
+             State('market-volatility', 'value'),
+             State('session-store', 'data')]
         )
-        def run_simulation(n_clicks, name, investment, rev_mean, rev_std, 
-                          cost_mean, cost_std, inflation, volatility):
+        def run_simulation(n_clicks, session_id, name, investment, rev_mean, rev_std, 
+                          cost_mean, cost_std, inflation, volatility, session_data):
             
             if not n_clicks:
                 return html.Div("👆 Configure los parámetros y ejecute la simulación", 
-                               style={'textAlign': 'center', 'color': '#7f8c8d', 'fontSize': '18px'})
+                               style={'textAlign': 'center', 'color': '#7f8c8d', 'fontSize': '18px'}), dash.no_update
             
             # Crear escenario
             scenario = BusinessScenario(
@@ -228,13 +286,49 @@ class DecisionDashboard:
                 market_volatility=volatility
             )
             
-            # Ejecutar simulación
-            result = self.engine.simulate_scenario(scenario)
-            metrics = StatisticsCalculator.calculate_risk_metrics(result)
-            
-            return self.create_results_layout(result, metrics)
+            with span('dashboard.run_simulation', scenario=name):
+                # Ejecutar simulación (o reutilizar la de la misma sesión con iguales parámetros)
+                key = SessionResultCache.scenario_key(scenario)
+                try:
+                    # Turno justo por usuario autenticado (o dirección remota) en el planificador
+                    # compartido, con prioridad interactiva
+                    engine = self.scheduler.bind(self.engine, user=client_identity(self.session_user(session_data)))
+                    result = self.result_cache.get_or_compute(session_id, ('result', key),
+                                                              lambda: engine.simulate_scenario(scenario))
+                except AdmissionRejected as e:
+                    return self.rejected_layout(e), dash.no_update
+                
+                def render():
+                    with span('metrics'):
+                        metrics = result.metrics
+                        intervals = StatisticsCalculator.bootstrap_confidence_intervals(result, n_resamples=200)
+                    with span('render'):
+                        return self.create_results_layout(result, metrics, intervals)
+                
+                return self.result_cache.get_or_compute(session_id, ('layout', key), render), key
+    
+    def session_user(self, session_data):
+        """Usuario del token de sesión del navegador según el almacén de sesiones compartido
+
+        No se confía en datos de usuario enviados por el cliente: un login hecho en otro
+        worker se resuelve igual y un token cerrado o caducado no da acceso.
+        """
+        if not self.auth or not session_data:
+            return None
+        return self.auth.get_session(session_data.get('session_id'))
+    
+    def cached_results(self, session_id, result_key):
+        """Layout de resultados ya renderizado para la sesión, si sigue en caché"""
+        if not session_id or not result_key:
+            return None
+        return self.result_cache.get(session_id, ('layout', result_key))
     
-    def create_results_layout(self, result, metrics):
+    def rejected_layout(self, error):
+        """Mensaje para una simulación que el planificador no admitió"""
+        return html.Div(f"⏳ Simulación no admitida: {error.reason}",
+                        style={'textAlign': 'center', 'color': '#e67e22', 'fontSize': '18px'})
+    
+    def create_results_layout(self, result, metrics, intervals=None):
         """Crea el layout de resultados"""
         
         return html.Div([
@@ -262,7 +356,7 @@ class DecisionDashboard:
             
             # Tabla de estadísticas detalladas
             html.H4("📊 Estadísticas Detalladas"),
-            self.create_statistics_table(metrics)
+            self.create_statistics_table(metrics, intervals)
         ])
     
     def create_metric_card(self, title, value, color):
@@ -273,15 +367,32 @@ class DecisionDashboard:
         ], style={'backgroundColor': 'white', 'padding': '20px', 'borderRadius': '8px', 
                  'boxShadow': '0 2px 4px rgba(0,0,0,0.1)', 'textAlign': 'center', 'flex': '1'})
     
-    def create_npv_histogram(self, result):
-        """Crea histograma de distribución NPV"""
+    def create_npv_histogram(self, result, bins=50):
+        """Crea histograma de distribución NPV
+        
+        Los bins y la curva de densidad se calculan en el servidor: al navegador solo
+        llegan `bins` barras y la malla del KDE, sea cual sea n_simulations.
+        """
+        histogram = StatisticsCalculator.histogram_bins(result.net_present_values, bins)
+        kde = StatisticsCalculator.binned_kde(result.net_present_values, grid_size=128)
+        n = len(result.net_present_values)
+        
         fig = go.Figure()
-        fig.add_trace(go.Histogram(
-            x=result.net_present_values,
-            nbinsx=50,
+        fig.add_trace(go.Bar(
+            x=histogram['centers'],
+            y=histogram['counts'],
+            width=histogram['width'],
             name='Distribución NPV',
             marker_color='rgba(55, 128, 191, 0.7)'
         ))
+        # Densidad escalada a frecuencias por bin
+        fig.add_trace(go.Scatter(
+            x=kde['grid'],
+            y=kde['density'] * n * histogram['width'],
+            mode='lines',
+            name='Densidad',
+            line=dict(color='rgba(44, 62, 80, 0.9)')
+        ))
         
         # Líneas de percentiles
         fig.add_vline(x=result.percentile_5, line_dash="dash", line_color="red", 
@@ -293,6 +404,7 @@ class DecisionDashboard:
             title="Distribución de Valor Presente Neto (NPV)",
             xaxis_title="NPV ($)",
             yaxis_title="Frecuencia",
+            bargap=0,
             showlegend=False
         )
         return fig
@@ -318,7 +430,7 @@ class DecisionDashboard:
         )
         return fig
     
-    def create_statistics_table(self, metrics):
+    def create_statistics_table(self, metrics, intervals=None):
         """Crea tabla de estadísticas"""
         data = [
             {"Métrica": "NPV Promedio", "Valor": f"${metrics['media_npv']:,.0f}"},
@@ -328,8 +440,26 @@ class DecisionDashboard:
             {"Métrica": "Coef. Variación", "Valor": f"{metrics['coeficiente_variacion']:.2f}"},
             {"Métrica": "Asimetría", "Valor": f"{metrics['asimetria']:.2f}"},
             {"Métrica": "Curtosis", "Valor": f"{metrics['curtosis']:.2f}"},
+            {"Métrica": "TIR Mediana (anual)",
+             "Valor": f"{metrics['tir_mediana']:.1f}%" if np.isfinite(metrics['tir_mediana']) else "N/D"},
+            {"Métrica": "Payback Descontado Mediano",
+             "Valor": f"{metrics['payback_descontado_mediano']:.0f} meses"
+                      if np.isfinite(metrics['payback_descontado_mediano']) else "No se recupera"},
         ]
         
+        # Error Monte Carlo de las métricas principales (IC 95% por bootstrap)
+        if intervals:
+            success = intervals['probabilidad_exito']
+            mean_npv = intervals['media_npv']
+            # Sin estratos el intervalo es el de la media simple, no el del valor postestratificado
+            label = "" if mean_npv['estimador'] == 'postestratificado' else " (media simple)"
+            data.extend([
+                {"Métrica": f"Prob. Éxito IC 95%{label}",
+                 "Valor": f"{success['inferior']:.1f}% – {success['superior']:.1f}%"},
+                {"Métrica": f"NPV Promedio IC 95%{label}",
+                 "Valor": f"${mean_npv['inferior']:,.0f} – ${mean_npv['superior']:,.0f}"},
+            ])
+        
         return dash_table.DataTable(
             data=data,
             columns=[{"name": i, "id": i} for i in data[0].keys()],
@@ -4,22 +4,40 @@ import plotly.graph_objs as go
 import pandas as pd
 import numpy as np
 from ..simulation.monte_carlo_engine import MonteCarloEngine
+from ..simulation.scheduler import AdmissionRejected, client_identity, get_default_scheduler
 from ..models.business_scenario import BusinessScenario
-from ..utils.statistics import StatisticsCalculator
+from .result_cache import SessionResultCache
+from ..api.routes import register_simulation_api
+from ..api.monitoring import register_metrics_endpoint
+from ..utils.telemetry import span
 
 class MonteCarloApp:
     def __init__(self):
         self.app = dash.Dash(__name__)
-        self.engine = MonteCarloEngine(n_simulations=5000)
+        # API JSON de simulación en el servidor Flask subyacente (/api/simulate)
+        register_simulation_api(self.app.server)
+        # Métricas operativas en formato Prometheus (/metrics)
+        register_metrics_endpoint(self.app.server)
+        self.engine = MonteCarloEngine(n_simulations=5000, sampling='stratified')
+        # Control de admisión y reparto justo de la CPU entre sesiones
+        self.scheduler = get_default_scheduler()
+        # Resultados en el servidor; el navegador solo guarda claves
+        self.result_cache = SessionResultCache()
         self.current_user = {'id': 1, 'username': 'admin', 'role': 'admin'}
         self.logged_in = False
         self.setup_layout()
         self.setup_callbacks()
     
     def setup_layout(self):
-        self.app.layout = html.Div([
+        # Layout como función: cada carga de página recibe su propio id de sesión
+        self.app.layout = self.serve_layout
+    
+    def serve_layout(self):
+        return html.Div([
             dcc.Store(id='login-state', data=False),
             dcc.Store(id='current-page', data='login'),
+            dcc.Store(id='session-id', data=SessionResultCache.new_session_id()),
+            dcc.Store(id='last-result-key', data=None),
             html.Div(id='app-content')
         ])
     
@@ -155,7 +173,7 @@ class MonteCarloApp:
             ])
         ])
     
-    def simulations_page(self):
+    def simulations_page(self, results=None):
         return html.Div([
             html.H2("🧮 Simulaciones Monte Carlo", style={'color': '#2c3e50'}),
             
@@ -198,7 +216,7 @@ class MonteCarloApp:
             ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '8px', 'marginBottom': '20px'}),
             
             # Resultados
-            html.Div(id='simulation-results')
+            html.Div(id='simulation-results', children=results)
         ])
     
     def visualizations_page(self):
@@ -242,15 +260,19 @@ class MonteCarloApp:
         
         @self.app.callback(
             Output('page-content', 'children'),
-            Input('main-menu', 'value')
+            Input('main-menu', 'value'),
+            [State('session-id', 'data'),
+             State('last-result-key', 'data')]
         )
-        def display_page(selected_page):
+        def display_page(selected_page, session_id, result_key):
             if selected_page == 'dashboard':
                 return self.dashboard_page()
             elif selected_page == 'projects':
                 return self.projects_page()
             elif selected_page == 'simulations':
-                return self.simulations_page()
+                # Al volver a la página se reutiliza el último resultado sin re-simular
+                cached = self.result_cache.get(session_id, ('layout', result_key)) if result_key else None
+                return self.simulations_page(cached)
             elif selected_page == 'visualizations':
                 return self.visualizations_page()
             elif selected_page == 'users':
@@ -260,14 +282,16 @@ class MonteCarloApp:
             return self.dashboard_page()
         
         @self.app.callback(
-            Output('simulation-results', 'children'),
+            [Output('simulation-results', 'children'),
+             Output('last-result-key', 'data')],
             Input('run-simulation', 'n_clicks'),
             [State('scenario-name', 'value'), State('initial-investment', 'value'),
-             State('revenue-mean', 'value'), State('revenue-std', 'value')]
+             State('revenue-mean', 'value'), State('revenue-std', 'value'),
+             State('session-id', 'data')]
         )
-        def run_simulation(n_clicks, name, investment, revenue_mean, revenue_std):
+        def run_simulation(n_clicks, name, investment, revenue_mean, revenue_std, session_id):
             if not n_clicks:
-                return html.Div("👆 Configure los parámetros y ejecute la simulación")
+                return html.Div("👆 Configure los parámetros y ejecute la simulación"), dash.no_update
             
             # Crear escenario
             scenario = BusinessScenario(
@@ -279,29 +303,52 @@ class MonteCarloApp:
                 cost_std=3000
             )
             
-            # Ejecutar simulación
-            result = self.engine.simulate_scenario(scenario)
-            metrics = StatisticsCalculator.calculate_risk_metrics(result)
-            
-            return html.Div([
-                html.H3("📈 Resultados de la Simulación"),
+            with span('dashboard.run_simulation', scenario=scenario.name):
+                # Ejecutar simulación (o reutilizar la de la misma sesión con iguales parámetros)
+                key = SessionResultCache.scenario_key(scenario)
+                try:
+                    # Sin almacén de sesiones, el turno justo se reparte por dirección remota
+                    engine = self.scheduler.bind(self.engine, user=client_identity())
+                    result = self.result_cache.get_or_compute(session_id, ('result', key),
+                                                              lambda: engine.simulate_scenario(scenario))
+                except AdmissionRejected as e:
+                    return self.rejected_layout(e), dash.no_update
+                layout = self.result_cache.get_or_compute(session_id, ('layout', key),
+                                                          lambda: self.render_results(result))
+            return layout, key
+    
+    def render_results(self, result):
+        """Calcula las métricas y el layout de resultados, cada etapa en su span"""
+        with span('metrics'):
+            metrics = result.metrics
+        with span('render'):
+            return self.results_layout(metrics)
+    
+    def rejected_layout(self, error):
+        """Mensaje para una simulación que el planificador no admitió"""
+        return html.Div(f"⏳ Simulación no admitida: {error.reason}",
+                        style={'textAlign': 'center', 'color': '#e67e22', 'fontSize': '18px'})
+    
+    def results_layout(self, metrics):
+        return html.Div([
+            html.H3("📈 Resultados de la Simulación"),
+            html.Div([
                 html.Div([
-                    html.Div([
-                        html.H4(f"${metrics['media_npv']:,.0f}"),
-                        html.P("NPV Promedio")
-                    ], style={'backgroundColor': '#2ecc71', 'color': 'white', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px'}),
-                    
-                    html.Div([
-                        html.H4(f"{metrics['probabilidad_exito']:.1f}%"),
-                        html.P("Probabilidad de Éxito")
-                    ], style={'backgroundColor': '#3498db', 'color': 'white', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px'}),
-                    
-                    html.Div([
-                        html.H4(f"{metrics['roi_medio']:.1f}%"),
-                        html.P("ROI Promedio")
-                    ], style={'backgroundColor': '#e74c3c', 'color': 'white', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px'})
-                ], style={'display': 'flex', 'justifyContent': 'space-around'})
-            ])
+                    html.H4(f"${metrics['media_npv']:,.0f}"),
+                    html.P("NPV Promedio")
+                ], style={'backgroundColor': '#2ecc71', 'color': 'white', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px'}),
+                
+                html.Div([
+                    html.H4(f"{metrics['probabilidad_exito']:.1f}%"),
+                    html.P("Probabilidad de Éxito")
+                ], style={'backgroundColor': '#3498db', 'color': 'white', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px'}),
+                
+                html.Div([
+                    html.H4(f"{metrics['roi_medio']:.1f}%"),
+                    html.P("ROI Promedio")
+                ], style={'backgroundColor': '#e74c3c', 'color': 'white', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px'})
+            ], style={'display': 'flex', 'justifyContent': 'space-around'})
+        ])
     
     def run_server(self, debug=False, port=8050):
         self.app.run(debug=debug, port=port, host='0.0.0.0')
\ No newline at end of file
@@ -1,14 +1,61 @@
-from dash import html, dash_table, dcc
+import dash
+from dash import html, dash_table, dcc, Input, Output, State
 import dash_bootstrap_components as dbc
 import pandas as pd
+import json
 
 class ProjectsManager:
+    # Filas por página en los listados (paginación por cursor)
+    PAGE_SIZE = 50
+
     def __init__(self, auth_manager):
         self.auth = auth_manager
 
+    def register_callbacks(self, app, resolve_user, session_input=('session-store', 'data')):
+        """Registra 'Cargar más' de proyectos y simulaciones y la apertura del detalle
+
+        `resolve_user(session_data)` retorna el usuario autenticado (dict con 'id') o None
+        a partir del dato de sesión de `session_input`.
+        """
+        for prefix, search_input, next_page in (('projects', 'project-search-input', self.next_projects_page),
+                                                ('simulations', 'simulation-search-input', self.next_simulations_page)):
+            self._register_load_more(app, resolve_user, session_input, prefix, search_input, next_page)
+
+        @app.callback(
+            Output('simulation-detail', 'children'),
+            Input('simulations-table', 'selected_rows'),
+            [State('simulations-table', 'data'),
+             State(*session_input)],
+            prevent_initial_call=True
+        )
+        def open_simulation(selected_rows, rows, session_data):
+            user = resolve_user(session_data)
+            if not user or not selected_rows or not rows or selected_rows[0] >= len(rows):
+                return dash.no_update
+            return self.simulation_detail_content(user['id'], rows[selected_rows[0]]['id'])
+
+    def _register_load_more(self, app, resolve_user, session_input, prefix, search_input, next_page):
+        @app.callback(
+            [Output(f'{prefix}-table', 'data'),
+             Output(f'{prefix}-next-cursor', 'data'),
+             Output(f'{prefix}-load-more-btn', 'style')],
+            Input(f'{prefix}-load-more-btn', 'n_clicks'),
+            [State(f'{prefix}-next-cursor', 'data'),
+             State(f'{prefix}-table', 'data'),
+             State(search_input, 'value'),
+             State(*session_input)],
+            prevent_initial_call=True
+        )
+        def load_more(n_clicks, cursor, rows, query, session_data):
+            user = resolve_user(session_data)
+            if not n_clicks or not cursor or not user:
+                return dash.no_update, dash.no_update, dash.no_update
+            rows, next_cursor = next_page(user['id'], query, cursor, rows)
+            return rows, next_cursor, self.load_more_style(next_cursor)
+
     def projects_content(self, user_id):
         """Contenido de gestión de proyectos"""
-        projects = self.auth.get_user_projects(user_id)
+        projects, next_cursor = self.auth.get_user_projects_page(user_id, limit=self.PAGE_SIZE)
 
         return html.Div([
             html.H2("📁 Mis Proyectos"),
@@ -45,6 +92,7 @@ class ProjectsManager:
                 row_selectable='single',
                 markdown_options={"html": True}
             ),
+            self.load_more_button('projects', next_cursor),
 
             # Modal para nuevo proyecto
             dbc.Modal([
@@ -166,8 +214,8 @@ class ProjectsManager:
 
     def simulations_content(self, user_id):
         """Contenido de gestión de simulaciones"""
-        # Obtener todas las simulaciones del usuario
-        simulations = self.auth.search_simulations(user_id, '')
+        # Obtener la primera página de simulaciones (sin params/results)
+        simulations, next_cursor = self.auth.search_simulations_page(user_id, '', limit=self.PAGE_SIZE)
 
         return html.Div([
             html.H2("🔬 Mis Simulaciones"),
@@ -205,6 +253,10 @@ class ProjectsManager:
                 row_selectable='single',
                 markdown_options={"html": True}
             ),
+            self.load_more_button('simulations', next_cursor),
+
+            # Detalle de la simulación seleccionada (se carga al abrirla)
+            html.Div(id='simulation-detail'),
 
             # Modal para nueva simulación
             dbc.Modal([
@@ -225,6 +277,43 @@ class ProjectsManager:
             dcc.Store(id='selected-simulation-id')
         ])
 
+    def load_more_button(self, prefix, next_cursor):
+        """Botón 'Cargar más' con el cursor de la siguiente página"""
+        return html.Div([
+            dcc.Store(id=f'{prefix}-next-cursor', data=next_cursor),
+            html.Button("⬇️ Cargar más", id=f'{prefix}-load-more-btn', style=self.load_more_style(next_cursor))
+        ])
+
+    @staticmethod
+    def load_more_style(next_cursor):
+        """El botón solo se muestra si queda otra página"""
+        return {'marginTop': '10px', 'padding': '8px 15px', 'display': 'inline-block' if next_cursor else 'none'}
+
+    def next_simulations_page(self, user_id, query, cursor, current_rows=None):
+        """Añade la siguiente página de simulaciones a las filas ya mostradas"""
+        rows, next_cursor = self.auth.search_simulations_page(user_id, query or '', limit=self.PAGE_SIZE, cursor=cursor)
+        return (current_rows or []) + rows, next_cursor
+
+    def next_projects_page(self, user_id, query, cursor, current_rows=None):
+        """Añade la siguiente página de proyectos a las filas ya mostradas"""
+        rows, next_cursor = self.auth.search_projects_page(user_id, query or '', limit=self.PAGE_SIZE, cursor=cursor)
+        return (current_rows or []) + rows, next_cursor
+
+    def simulation_detail_content(self, user_id, simulation_id):
+        """Detalle de una simulación: solo aquí se cargan los JSON de params y results"""
+        simulation = self.auth.get_simulation_detail(simulation_id, user_id)
+        if not simulation:
+            return html.Div("Simulación no encontrada", style={'color': 'red'})
+
+        return html.Div([
+            html.H3(f"🔬 {simulation['name']}"),
+            html.P(f"Proyecto: {simulation['project_name']}"),
+            html.H4("Parámetros"),
+            html.Pre(json.dumps(simulation['params'], indent=2, default=str)),
+            html.H4("Resultados"),
+            html.Pre(json.dumps(simulation['results'], indent=2, default=str))
+        ], style={'marginTop': '20px', 'padding': '15px', 'backgroundColor': '#f8f9fa'})
+
     def visualizations_content(self, user_id):
         """Contenido de gestión de visualizaciones"""
         # Por ahora vacío, se implementará después
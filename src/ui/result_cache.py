@@ -0,0 +1,119 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+from ..models.business_scenario import SimulationResult
+from ..database.result_store import LocalResultStore
+from ..utils.instrumentation import record_cache
+
+
+class SessionResultCache:
+    """Caché en servidor de resultados, métricas y figuras por sesión de Dash
+
+    Los callbacks guardan aquí los objetos pesados y solo intercambian con el navegador
+    claves cortas (id de sesión y clave de resultado) a través de dcc.Store. Las entradas
+    caducan por TTL y, si se supera el tamaño total, se expulsan las menos usadas (LRU).
+    """
+
+    DEFAULT_ENTRY_SIZE = 16 * 1024
+
+    def __init__(self, ttl_seconds: float = 1800, max_bytes: int = 512 * 1024 ** 2,
+                 max_entries_per_session: int = 32):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_entries_per_session = max_entries_per_session
+        self._entries = OrderedDict()  # (session_id, key) -> (expires_at, size, value)
+        self._session_counts = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Identificador aleatorio para una sesión del navegador"""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def scenario_key(scenario) -> str:
+        """Clave estable de un escenario (mismos parámetros, misma clave)"""
+        return LocalResultStore.scenario_hash(scenario)
+
+    def get(self, session_id: str, key: Hashable, default: Any = None) -> Any:
+        """Retorna el valor guardado o `default` si no existe o caducó"""
+        entry_key = (session_id, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._pop(entry_key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+        record_cache('session_results', entry is not None)
+        return default if entry is None else entry[2]
+
+    def put(self, session_id: str, key: Hashable, value: Any, size: Optional[int] = None):
+        """Guarda un valor para la sesión, expulsando entradas si hace falta"""
+        entry_key = (session_id, key)
+        size = size if size is not None else self._estimate_size(value)
+        with self._lock:
+            if entry_key in self._entries:
+                self._pop(entry_key)
+            self._entries[entry_key] = (time.monotonic() + self.ttl_seconds, size, value)
+            self._session_counts[session_id] = self._session_counts.get(session_id, 0) + 1
+            self._total_bytes += size
+            self._evict(session_id)
+
+    def get_or_compute(self, session_id: str, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Lectura con cálculo en caso de fallo: `compute` solo se ejecuta si falta la entrada"""
+        value = self.get(session_id, key)
+        if value is None:
+            value = compute()
+            self.put(session_id, key, value)
+        return value
+
+    def drop_session(self, session_id: str):
+        """Elimina todas las entradas de una sesión (p. ej. al cerrar sesión)"""
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[0] == session_id]:
+                self._pop(entry_key)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, session_id: str):
+        now = time.monotonic()
+        # Caducadas primero (las más antiguas están al principio del OrderedDict)
+        for entry_key in [k for k, (expires_at, _, _) in self._entries.items() if expires_at < now]:
+            self._pop(entry_key)
+
+        if self._session_counts.get(session_id, 0) > self.max_entries_per_session:
+            oldest = next(k for k in self._entries if k[0] == session_id)
+            self._pop(oldest)
+
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, entry_key):
+        _, size, _ = self._entries.pop(entry_key)
+        self._total_bytes -= size
+        session_id = entry_key[0]
+        self._session_counts[session_id] -= 1
+        if not self._session_counts[session_id]:
+            del self._session_counts[session_id]
+
+    @classmethod
+    def _estimate_size(cls, value: Any) -> int:
+        if isinstance(value, SimulationResult):
+            return value.paths.nbytes + cls.DEFAULT_ENTRY_SIZE
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (tuple, list)):
+            return sum(cls._estimate_size(item) for item in value)
+        return cls.DEFAULT_ENTRY_SIZE
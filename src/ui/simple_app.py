@@ -1,32 +1,58 @@
+import copy
+import secrets
+import threading
 import dash
 from dash import dcc, html, Input, Output, State
 import plotly.graph_objs as go
 import numpy as np
 from ..simulation.monte_carlo_engine import MonteCarloEngine
+from ..simulation.scheduler import AdmissionRejected, client_identity, get_default_scheduler
 from ..models.business_scenario import BusinessScenario
-from ..utils.statistics import StatisticsCalculator
+from .result_cache import SessionResultCache
+from ..auth.session_store import create_session_store
+from ..api.routes import register_simulation_api
+from ..api.monitoring import register_metrics_endpoint
+from ..utils.telemetry import span
 
 class SimpleApp:
+    # Base de datos simulada de usuarios con la que empieza cada sesión del navegador
+    DEFAULT_USERS = (
+        {'id': 1, 'username': 'admin', 'email': 'admin@company.com', 'role': 'admin', 'status': 'active'},
+        {'id': 2, 'username': 'user1', 'email': 'user1@company.com', 'role': 'user', 'status': 'active'},
+        {'id': 3, 'username': 'manager1', 'email': 'manager1@company.com', 'role': 'manager', 'status': 'active'},
+    )
+    
     def __init__(self):
         self.app = dash.Dash(__name__)
-        self.engine = MonteCarloEngine(n_simulations=5000)
-        self.logged_in = False
-        # Base de datos simulada de usuarios
-        self.users_db = [
-            {'id': 1, 'username': 'admin', 'email': 'admin@company.com', 'role': 'admin', 'status': 'active'},
-            {'id': 2, 'username': 'user1', 'email': 'user1@company.com', 'role': 'user', 'status': 'active'},
-            {'id': 3, 'username': 'manager1', 'email': 'manager1@company.com', 'role': 'manager', 'status': 'active'}
-        ]
-        self.next_user_id = 4
+        # API JSON de simulación en el servidor Flask subyacente (/api/simulate)
+        register_simulation_api(self.app.server)
+        # Métricas operativas en formato Prometheus (/metrics)
+        register_metrics_endpoint(self.app.server)
+        self.engine = MonteCarloEngine(n_simulations=5000, sampling='stratified')
+        # Control de admisión y reparto justo de la CPU entre sesiones
+        self.scheduler = get_default_scheduler()
+        # Resultados en el servidor; el navegador solo guarda claves
+        self.result_cache = SessionResultCache()
+        # Sesiones en el almacén compartido (SESSION_BACKEND): el navegador solo guarda el token
+        self.sessions = create_session_store()
+        self.sessions.start_reaper()
+        # Usuarios simulados por sesión en result_cache; el navegador solo recibe su versión
+        self._users_lock = threading.Lock()
         self.setup_layout()
         self.setup_callbacks()
     
     def setup_layout(self):
-        self.app.layout = html.Div([
-            dcc.Store(id='session', data={'logged_in': False}),
+        # Layout como función: cada carga de página recibe su propio id de sesión
+        self.app.layout = self.serve_layout
+    
+    def serve_layout(self):
+        return html.Div([
+            dcc.Store(id='session', data=None),
+            dcc.Store(id='session-id', data=SessionResultCache.new_session_id()),
             dcc.Store(id='current-page', data='dashboard'),
-            dcc.Store(id='users-data', data=self.users_db),
+            dcc.Store(id='users-data', data=0),
             dcc.Store(id='edit-user-id', data=None),
+            dcc.Store(id='last-result-key', data=None),
             html.Div(id='main-container')
         ])
     
@@ -36,7 +62,7 @@ class SimpleApp:
             Input('session', 'data')
         )
         def display_main(session_data):
-            if session_data and session_data.get('logged_in'):
+            if self.session_user(session_data):
                 return self.dashboard_layout()
             return self.login_layout()
         
@@ -49,8 +75,11 @@ class SimpleApp:
         )
         def handle_login(n_clicks, username, password):
             if username == 'admin' and password == 'admin123':
-                return {'logged_in': True}
-            return {'logged_in': False}
+                user = next(u for u in self.DEFAULT_USERS if u['username'] == 'admin')
+                session_id = secrets.token_hex(16)
+                self.sessions.set(session_id, {'id': user['id'], 'username': user['username'], 'role': user['role']})
+                return {'session_id': session_id}
+            return None
         
         @self.app.callback(
             Output('current-page', 'data'),
@@ -79,13 +108,17 @@ class SimpleApp:
         
         @self.app.callback(
             Output('page-content', 'children'),
-            Input('current-page', 'data')
+            Input('current-page', 'data'),
+            [State('session-id', 'data'),
+             State('last-result-key', 'data')]
         )
-        def display_page_content(page):
+        def display_page_content(page, session_id, result_key):
             if page == 'projects':
                 return self.projects_page()
             elif page == 'simulations':
-                return self.simulations_page()
+                # Al volver a la página se reutiliza el último resultado sin re-simular
+                cached = self.result_cache.get(session_id, ('layout', result_key)) if result_key else None
+                return self.simulations_page(cached)
             elif page == 'visualizations':
                 return self.visualizations_page()
             elif page == 'users':
@@ -93,17 +126,20 @@ class SimpleApp:
             return self.dashboard_content()
         
         @self.app.callback(
-            Output('simulation-results', 'children'),
+            [Output('simulation-results', 'children'),
+             Output('last-result-key', 'data')],
             Input('run-simulation', 'n_clicks'),
             [State('scenario-name', 'value'),
              State('initial-investment', 'value'),
              State('revenue-mean', 'value'),
-             State('revenue-std', 'value')],
+             State('revenue-std', 'value'),
+             State('session-id', 'data'),
+             State('session', 'data')],
             prevent_initial_call=True
         )
-        def run_simulation(n_clicks, name, investment, revenue_mean, revenue_std):
+        def run_simulation(n_clicks, name, investment, revenue_mean, revenue_std, session_id, session_data):
             if not n_clicks:
-                return html.Div()
+                return html.Div(), dash.no_update
             
             scenario = BusinessScenario(
                 name=name or "Escenario Test",
@@ -114,28 +150,19 @@ class SimpleApp:
                 cost_std=3000
             )
             
-            result = self.engine.simulate_scenario(scenario)
-            metrics = StatisticsCalculator.calculate_risk_metrics(result)
-            
-            return html.Div([
-                html.H3("📈 Resultados de la Simulación", style={'color': '#2c3e50'}),
-                html.Div([
-                    html.Div([
-                        html.H2(f"${metrics['media_npv']:,.0f}", style={'color': 'white', 'margin': 0}),
-                        html.P("NPV Promedio", style={'color': 'white', 'margin': 0})
-                    ], style={'backgroundColor': '#27ae60', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px', 'minWidth': '200px'}),
-                    
-                    html.Div([
-                        html.H2(f"{metrics['probabilidad_exito']:.1f}%", style={'color': 'white', 'margin': 0}),
-                        html.P("Probabilidad Éxito", style={'color': 'white', 'margin': 0})
-                    ], style={'backgroundColor': '#3498db', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px', 'minWidth': '200px'}),
-                    
-                    html.Div([
-                        html.H2(f"{metrics['roi_medio']:.1f}%", style={'color': 'white', 'margin': 0}),
-                        html.P("ROI Promedio", style={'color': 'white', 'margin': 0})
-                    ], style={'backgroundColor': '#e74c3c', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px', 'minWidth': '200px'})
-                ], style={'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap'})
-            ])
+            with span('dashboard.run_simulation', scenario=scenario.name):
+                key = SessionResultCache.scenario_key(scenario)
+                try:
+                    # Turno justo por usuario autenticado (o dirección remota) en el planificador
+                    # compartido, con prioridad interactiva
+                    engine = self.scheduler.bind(self.engine, user=client_identity(self.session_user(session_data)))
+                    result = self.result_cache.get_or_compute(session_id, ('result', key),
+                                                              lambda: engine.simulate_scenario(scenario))
+                except AdmissionRejected as e:
+                    return self.rejected_layout(e), dash.no_update
+                layout = self.result_cache.get_or_compute(session_id, ('layout', key),
+                                                          lambda: self.render_results(result))
+            return layout, key
         
         @self.app.callback(
             Output('users-data', 'data'),
@@ -149,49 +176,50 @@ class SimpleApp:
              State('edit-email', 'value'),
              State('edit-role', 'value'),
              State('edit-user-id', 'data'),
-             State('users-data', 'data')],
+             State('session-id', 'data')],
             prevent_initial_call=True
         )
         def manage_users(create_clicks, save_clicks, delete_clicks, 
                         new_username, new_email, new_role,
-                        edit_username, edit_email, edit_role, edit_id, users_data):
+                        edit_username, edit_email, edit_role, edit_id, session_id):
+            # Los usuarios de la sesión viven en result_cache; el Store solo recibe un número de versión
             ctx = dash.callback_context
-            if not ctx.triggered:
-                return users_data
-            
-            trigger = ctx.triggered[0]['prop_id']
-            
-            # Crear usuario
-            if 'create-user-btn' in trigger and new_username and new_email:
-                new_user = {
-                    'id': self.next_user_id,
-                    'username': new_username,
-                    'email': new_email,
-                    'role': new_role or 'user',
-                    'status': 'active'
-                }
-                users_data.append(new_user)
-                self.next_user_id += 1
-                return users_data
-            
-            # Guardar edición
-            if 'save-user-btn' in trigger and edit_id and edit_username and edit_email:
-                for user in users_data:
-                    if user['id'] == edit_id:
-                        user['username'] = edit_username
-                        user['email'] = edit_email
-                        user['role'] = edit_role or 'user'
-                        break
-                return users_data
-            
-            # Eliminar usuario
-            if 'delete-user' in trigger:
-                button_data = eval(trigger.split('.')[0])
-                user_id = button_data['index']
-                users_data = [user for user in users_data if user['id'] != user_id]
-                return users_data
-            
-            return users_data
+            with self._users_lock:
+                state = self.session_users(session_id)
+                if not ctx.triggered:
+                    return state['version']
+                
+                trigger = ctx.triggered[0]['prop_id']
+                users = state['users']
+                
+                # Crear usuario
+                if 'create-user-btn' in trigger and new_username and new_email:
+                    users = users + [{
+                        'id': state['next_id'],
+                        'username': new_username,
+                        'email': new_email,
+                        'role': new_role or 'user',
+                        'status': 'active'
+                    }]
+                    state = dict(state, next_id=state['next_id'] + 1)
+                
+                # Guardar edición
+                elif 'save-user-btn' in trigger and edit_id and edit_username and edit_email:
+                    users = [dict(user, username=edit_username, email=edit_email, role=edit_role or 'user')
+                             if user['id'] == edit_id else user for user in users]
+                
+                # Eliminar usuario
+                elif 'delete-user' in trigger:
+                    button_data = eval(trigger.split('.')[0])
+                    user_id = button_data['index']
+                    users = [user for user in users if user['id'] != user_id]
+                
+                else:
+                    return state['version']
+                
+                state = dict(state, users=users, version=state['version'] + 1)
+                self.result_cache.put(session_id, 'users', state)
+                return state['version']
         
         @self.app.callback(
             [Output('edit-user-id', 'data'),
@@ -199,10 +227,10 @@ class SimpleApp:
              Output('edit-email', 'value'),
              Output('edit-role', 'value')],
             Input({'type': 'edit-user', 'index': dash.dependencies.ALL}, 'n_clicks'),
-            State('users-data', 'data'),
+            State('session-id', 'data'),
             prevent_initial_call=True
         )
-        def load_user_for_edit(edit_clicks, users_data):
+        def load_user_for_edit(edit_clicks, session_id):
             ctx = dash.callback_context
             if not ctx.triggered or not any(edit_clicks):
                 return None, '', '', 'user'
@@ -210,12 +238,56 @@ class SimpleApp:
             button_data = eval(ctx.triggered[0]['prop_id'].split('.')[0])
             user_id = button_data['index']
             
-            user = next((u for u in users_data if u['id'] == user_id), None)
+            user = next((u for u in self.session_users(session_id)['users'] if u['id'] == user_id), None)
             if user:
                 return user['id'], user['username'], user['email'], user['role']
             
             return None, '', '', 'user'
     
+    def session_users(self, session_id):
+        """Usuarios simulados de la sesión del navegador (los iniciales si aún no tiene)"""
+        return self.result_cache.get_or_compute(session_id, 'users', lambda: {
+            'users': copy.deepcopy(list(self.DEFAULT_USERS)), 'next_id': 4, 'version': 0})
+    
+    def session_user(self, session_data):
+        """Usuario del token de sesión según el almacén compartido (None si no es válido)"""
+        if not session_data or not session_data.get('session_id'):
+            return None
+        return self.sessions.get(session_data['session_id'])
+    
+    def render_results(self, result):
+        """Calcula las métricas y el layout de resultados, cada etapa en su span"""
+        with span('metrics'):
+            metrics = result.metrics
+        with span('render'):
+            return self.results_layout(metrics)
+    
+    def rejected_layout(self, error):
+        """Mensaje para una simulación que el planificador no admitió"""
+        return html.Div(f"⏳ Simulación no admitida: {error.reason}",
+                        style={'textAlign': 'center', 'color': '#e67e22', 'fontSize': '18px'})
+    
+    def results_layout(self, metrics):
+        return html.Div([
+            html.H3("📈 Resultados de la Simulación", style={'color': '#2c3e50'}),
+            html.Div([
+                html.Div([
+                    html.H2(f"${metrics['media_npv']:,.0f}", style={'color': 'white', 'margin': 0}),
+                    html.P("NPV Promedio", style={'color': 'white', 'margin': 0})
+                ], style={'backgroundColor': '#27ae60', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px', 'minWidth': '200px'}),
+                
+                html.Div([
+                    html.H2(f"{metrics['probabilidad_exito']:.1f}%", style={'color': 'white', 'margin': 0}),
+                    html.P("Probabilidad Éxito", style={'color': 'white', 'margin': 0})
+                ], style={'backgroundColor': '#3498db', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px', 'minWidth': '200px'}),
+                
+                html.Div([
+                    html.H2(f"{metrics['roi_medio']:.1f}%", style={'color': 'white', 'margin': 0}),
+                    html.P("ROI Promedio", style={'color': 'white', 'margin': 0})
+                ], style={'backgroundColor': '#e74c3c', 'padding': '20px', 'borderRadius': '8px', 'textAlign': 'center', 'margin': '10px', 'minWidth': '200px'})
+            ], style={'display': 'flex', 'justifyContent': 'center', 'flexWrap': 'wrap'})
+        ])
+    
     def login_layout(self):
         return html.Div([
             html.Div([
@@ -346,7 +418,7 @@ class SimpleApp:
             ])
         ])
     
-    def simulations_page(self):
+    def simulations_page(self, results=None):
         return html.Div([
             html.H2("🧮 Simulaciones Monte Carlo", style={'color': '#2c3e50'}),
             html.Div([
@@ -374,7 +446,7 @@ class SimpleApp:
                 html.Button("🚀 Ejecutar Simulación", id='run-simulation', 
                            style={'marginTop': '20px', 'padding': '12px 30px', 'backgroundColor': '#e74c3c', 'color': 'white', 'border': 'none', 'borderRadius': '5px', 'fontSize': '16px', 'cursor': 'pointer'})
             ], style={'backgroundColor': '#f8f9fa', 'padding': '20px', 'borderRadius': '8px', 'marginBottom': '20px'}),
-            html.Div(id='simulation-results')
+            html.Div(id='simulation-results', children=results)
         ])
     
     def visualizations_page(self):
@@ -447,9 +519,11 @@ class SimpleApp:
         
         @self.app.callback(
             Output('users-list', 'children'),
-            Input('users-data', 'data')
+            Input('users-data', 'data'),
+            State('session-id', 'data')
         )
-        def update_users_list(users_data):
+        def update_users_list(users_version, session_id):
+            users_data = self.session_users(session_id)['users']
             if not users_data:
                 return html.P("No hay usuarios")
             
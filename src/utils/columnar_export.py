@@ -0,0 +1,193 @@
+import json
+from dataclasses import asdict
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..models.business_scenario import SimulationResult
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Dependencia opcional: pip install pyarrow
+    pa = None
+
+# Columnas por trayectoria y el atributo de SimulationResult del que provienen
+PATH_COLUMNS = {
+    'npv': 'net_present_values',
+    'roi': 'roi_values',
+    'break_even_months': 'break_even_months',
+    'irr': 'irr_values',
+    'discounted_payback_months': 'discounted_payback_months',
+}
+SUMMARY_FIELDS = ('success_probability', 'mean_npv', 'std_npv', 'percentile_5', 'percentile_95', 'var_95')
+IPC_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow no está instalado. Instálelo con: pip install pyarrow")
+
+
+def _is_ipc(path: str) -> bool:
+    return str(path).lower().endswith(IPC_EXTENSIONS)
+
+
+class ColumnarExporter:
+    """Exportación de resultados y comparaciones a Apache Arrow IPC y Parquet"""
+
+    @staticmethod
+    def result_to_table(result: SimulationResult, scenario=None, metrics: Optional[Dict] = None):
+        """Convierte un SimulationResult en una tabla Arrow con los parámetros como metadatos"""
+        _require_pyarrow()
+        columns = {name: pa.array(np.asarray(getattr(result, attr), dtype=np.float64))
+                   for name, attr in PATH_COLUMNS.items()}
+
+        metadata = {
+            'scenario_name': result.scenario_name,
+            'summary': json.dumps({field: float(getattr(result, field)) for field in SUMMARY_FIELDS}),
+        }
+        if scenario is not None:
+            metadata['scenario'] = json.dumps(asdict(scenario), default=str)
+        if metrics is not None:
+            metadata['metrics'] = json.dumps(metrics, default=float)
+
+        return pa.table(columns).replace_schema_metadata(metadata)
+
+    @staticmethod
+    def write_result(result: SimulationResult, path: str, scenario=None, metrics: Optional[Dict] = None,
+                     row_group_size: int = 256 * 1024, compression: str = 'zstd'):
+        """Escribe un resultado en Parquet o Arrow IPC según la extensión del archivo"""
+        table = ColumnarExporter.result_to_table(result, scenario, metrics)
+        ColumnarExporter._write_table(table, path, row_group_size, compression)
+
+    @staticmethod
+    def write_comparison(comparison: pd.DataFrame, path: str, compression: str = 'zstd'):
+        """Escribe el DataFrame de compare_scenarios en Parquet o Arrow IPC"""
+        _require_pyarrow()
+        table = pa.Table.from_pandas(comparison, preserve_index=True)
+        ColumnarExporter._write_table(table, path, None, compression)
+
+    @staticmethod
+    def open(path: str) -> 'ColumnarResultReader':
+        """Abre un archivo exportado para lectura perezosa por columna o grupo de filas"""
+        return ColumnarResultReader(path)
+
+    @staticmethod
+    def read_comparison(path: str) -> pd.DataFrame:
+        """Lee un DataFrame de comparación exportado"""
+        with ColumnarResultReader(path) as reader:
+            return reader.read().to_pandas()
+
+    @staticmethod
+    def _write_table(table, path: str, row_group_size: Optional[int], compression: str):
+        _require_pyarrow()
+        if _is_ipc(path):
+            options = pa_ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+            with pa_ipc.new_file(path, table.schema, options=options) as writer:
+                writer.write_table(table, max_chunksize=row_group_size)
+        else:
+            pq.write_table(table, path, row_group_size=row_group_size,
+                           compression=None if compression == 'none' else compression)
+
+
+class ColumnarResultReader:
+    """Lector perezoso de archivos Parquet / Arrow IPC exportados
+
+    Parquet se lee por grupos de filas y columnas bajo demanda; Arrow IPC se mapea en
+    memoria, cada record batch equivale a un grupo de filas y solo se leen (y
+    descomprimen) las columnas pedidas. Se cierra con close() o como context manager;
+    las tablas ya leídas siguen siendo válidas.
+    """
+
+    def __init__(self, path: str):
+        _require_pyarrow()
+        self.path = path
+        if _is_ipc(path):
+            self._source = pa.memory_map(path, 'r')
+            self._ipc = pa_ipc.open_file(self._source)
+            self._parquet = None
+            self.schema = self._ipc.schema
+        else:
+            self._ipc = None
+            self._parquet = pq.ParquetFile(path)
+            self.schema = self._parquet.schema_arrow
+
+    def __enter__(self) -> 'ColumnarResultReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Cierra el archivo (el mapa de memoria en Arrow IPC)"""
+        if self._parquet is not None:
+            self._parquet.close()
+        else:
+            self._source.close()
+
+    @property
+    def metadata(self) -> Dict[str, str]:
+        """Metadatos del esquema decodificados a texto"""
+        raw = self.schema.metadata or {}
+        return {k.decode(): v.decode() for k, v in raw.items()}
+
+    @property
+    def scenario_params(self) -> Optional[Dict]:
+        """Parámetros del BusinessScenario guardados en los metadatos"""
+        scenario = self.metadata.get('scenario')
+        return json.loads(scenario) if scenario else None
+
+    @property
+    def num_row_groups(self) -> int:
+        if self._parquet is not None:
+            return self._parquet.num_row_groups
+        return self._ipc.num_record_batches
+
+    def read_row_group(self, index: int, columns: Optional[List[str]] = None):
+        """Lee un único grupo de filas (o record batch) como tabla Arrow"""
+        if self._parquet is not None:
+            return self._parquet.read_row_group(index, columns=columns)
+        table = pa.Table.from_batches([self._ipc_reader(columns).get_batch(index)])
+        return table.select(columns) if columns else table
+
+    def iter_row_groups(self, columns: Optional[List[str]] = None) -> Iterator:
+        """Recorre el archivo grupo a grupo sin cargarlo completo"""
+        for index in range(self.num_row_groups):
+            yield self.read_row_group(index, columns)
+
+    def read(self, columns: Optional[List[str]] = None):
+        """Lee las columnas indicadas (todas por defecto) como tabla Arrow"""
+        if self._parquet is not None:
+            return self._parquet.read(columns=columns)
+        table = self._ipc_reader(columns).read_all()
+        return table.select(columns) if columns else table
+
+    def _ipc_reader(self, columns: Optional[List[str]]):
+        # Lector IPC que solo deserializa las columnas pedidas (en el orden del esquema)
+        if not columns:
+            return self._ipc
+        indices = []
+        for name in columns:
+            index = self.schema.get_field_index(name)
+            if index < 0:
+                raise KeyError(f"Columna desconocida: {name}")
+            indices.append(index)
+        options = pa_ipc.IpcReadOptions(included_fields=sorted(set(indices)))
+        return pa_ipc.open_file(self._source, options=options)
+
+    def column(self, name: str) -> np.ndarray:
+        """Lee una sola columna como array de NumPy"""
+        return self.read([name]).column(name).to_numpy()
+
+    def to_result(self) -> SimulationResult:
+        """Reconstruye el SimulationResult completo a partir del archivo"""
+        metadata = self.metadata
+        # Los archivos exportados antes de añadir TIR/payback no tienen esas columnas
+        columns = [name for name in PATH_COLUMNS if name in self.schema.names]
+        table = self.read(columns)
+        arrays = {PATH_COLUMNS[name]: table.column(name).to_numpy() for name in columns}
+        return SimulationResult(scenario_name=metadata.get('scenario_name', ''),
+                                **arrays, **json.loads(metadata['summary']))
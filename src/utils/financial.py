@@ -0,0 +1,123 @@
+import numpy as np
+from typing import Tuple
+
+
+class FinancialCalculator:
+    """Indicadores financieros por trayectoria calculados sobre todas las trayectorias a la vez
+
+    Los flujos se reciben como una matriz (..., horizonte) de flujos mensuales; el flujo
+    del mes t (t = 0, 1, ...) se descuenta con (1 + r) ** (t / 12), igual que el NPV del
+    motor, y la inversión inicial es un desembolso en t = 0.
+    """
+
+    PERIODS_PER_YEAR = 12
+
+    @staticmethod
+    def discount_factors(annual_rate: float, horizon: int, periods_per_year: int = PERIODS_PER_YEAR) -> np.ndarray:
+        """Factores de descuento mensuales para una tasa anual"""
+        return (1 + annual_rate) ** (-np.arange(horizon) / periods_per_year)
+
+    @staticmethod
+    def irr(cash_flows: np.ndarray, initial_investment, periods_per_year: int = PERIODS_PER_YEAR,
+            tol: float = 1e-10, max_iter: int = 100,
+            monthly_bounds: Tuple[float, float] = (-0.9, 1.0)) -> Tuple[np.ndarray, np.ndarray]:
+        """TIR anual de cada trayectoria con Newton protegido por bisección
+
+        Se resuelve sum_t CF_t * v**t = inversión en el factor mensual v = 1 / (1 + m),
+        manteniendo para cada trayectoria un intervalo [v_lo, v_hi] con cambio de signo.
+        Un paso de Newton que sale del intervalo se sustituye por el punto medio, de modo
+        que todas las trayectorias avanzan en bloque y solo se iteran las no convergidas.
+        Con varias raíces se elige la más cercana a tasa cero en el sentido de sum(CF) - I.
+
+        Retorna (tasas, convergidas): la tasa es NaN donde no hay raíz en el intervalo de
+        tasas mensuales `monthly_bounds` o no se alcanzó la tolerancia.
+        """
+        cash_flows = np.asarray(cash_flows, dtype=np.float64)
+        leading_shape = cash_flows.shape[:-1]
+        horizon = cash_flows.shape[-1]
+        flows = cash_flows.reshape(-1, horizon)
+        investment = np.broadcast_to(np.asarray(initial_investment, dtype=np.float64), leading_shape).reshape(-1)
+        n = len(flows)
+
+        # Escala para la tolerancia: tamaño típico de los términos de la ecuación
+        scale = np.abs(flows).sum(axis=1) + np.abs(investment)
+        degenerate = scale == 0  # sin flujos ni inversión: cualquier tasa es raíz
+        scale[degenerate] = 1
+
+        def npv_and_derivative(v, rows):
+            # Horner sobre los meses: f(v) = sum CF_t v^t - I, f'(v) = sum t CF_t v^(t-1)
+            value = np.zeros(len(rows))
+            derivative = np.zeros(len(rows))
+            block = flows[rows]
+            for t in range(horizon - 1, -1, -1):
+                derivative = derivative * v + value
+                value = value * v + block[:, t]
+            return value - investment[rows], derivative
+
+        # Se parte el intervalo en v = 1 (tasa cero) y se elige la mitad con cambio de signo:
+        # flujos con meses negativos pueden tener otra raíz espuria a tasas muy negativas
+        all_rows = np.arange(n)
+        v_min, v_max = 1 / (1 + monthly_bounds[1]), 1 / (1 + monthly_bounds[0])
+        f_min, _ = npv_and_derivative(np.full(n, v_min), all_rows)
+        f_one, _ = npv_and_derivative(np.ones(n), all_rows)
+        f_max, _ = npv_and_derivative(np.full(n, v_max), all_rows)
+
+        lower_half = np.sign(f_min) * np.sign(f_one) <= 0
+        v_lo = np.where(lower_half, v_min, 1.0)
+        v_hi = np.where(lower_half, 1.0, v_max)
+        f_lo = np.where(lower_half, f_min, f_one)
+        f_hi = np.where(lower_half, f_one, f_max)
+
+        bracketed = (np.sign(f_lo) * np.sign(f_hi) <= 0) & ~degenerate
+        v = np.full(n, np.nan)
+        converged = np.zeros(n, dtype=bool)
+
+        # Extremos que ya son raíz
+        for edge, f_edge in ((v_lo, f_lo), (v_hi, f_hi)):
+            exact = bracketed & ~converged & (np.abs(f_edge) <= tol * scale)
+            v[exact] = edge[exact]
+            converged |= exact
+
+        active = np.flatnonzero(bracketed & ~converged)
+        lo, hi, sign_lo = v_lo[active], v_hi[active], np.sign(f_lo[active])
+        guess = (lo + hi) / 2
+
+        for _ in range(max_iter):
+            if len(active) == 0:
+                break
+            f, df = npv_and_derivative(guess, active)
+            done = (np.abs(f) <= tol * scale[active]) | (hi - lo <= tol * hi)
+            v[active[done]] = guess[done]
+            converged[active[done]] = True
+
+            # Estrechar el intervalo conservando el cambio de signo
+            same_side = np.sign(f) == sign_lo
+            lo = np.where(same_side, guess, lo)
+            hi = np.where(same_side, hi, guess)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                newton = guess - f / df
+            inside = np.isfinite(newton) & (newton > lo) & (newton < hi)
+            guess = np.where(inside, newton, (lo + hi) / 2)
+
+            keep = ~done
+            active, lo, hi, sign_lo, guess = active[keep], lo[keep], hi[keep], sign_lo[keep], guess[keep]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = v ** (-periods_per_year) - 1
+        rates[~converged] = np.nan
+        return rates.reshape(leading_shape), converged.reshape(leading_shape)
+
+    @staticmethod
+    def discounted_payback(cash_flows: np.ndarray, initial_investment, annual_rate: float,
+                           periods_per_year: int = PERIODS_PER_YEAR) -> np.ndarray:
+        """Mes (1-indexado) en que el flujo descontado acumulado supera la inversión
+
+        NaN en las trayectorias que no recuperan la inversión dentro del horizonte.
+        """
+        cash_flows = np.asarray(cash_flows, dtype=np.float64)
+        discounted = cash_flows * FinancialCalculator.discount_factors(annual_rate, cash_flows.shape[-1],
+                                                                       periods_per_year)
+        recovered = np.cumsum(discounted, axis=-1) > np.asarray(initial_investment, dtype=np.float64)[..., None]
+        months = recovered.argmax(axis=-1) + 1.0
+        return np.where(recovered.any(axis=-1), months, np.nan)
@@ -0,0 +1,411 @@
+import atexit
+import bisect
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Métricas operativas en formato de exposición de Prometheus
+#
+# Cada hilo escribe en su propio dict de valores (threading.local), así que incrementar
+# un contador u observar una latencia no toma ningún lock; la lectura suma los dicts de
+# todos los hilos vivos y el acumulado de los que ya terminaron. Para agregar varios procesos (workers del servidor web) se define
+# METRICS_MULTIPROC_DIR: cada proceso vuelca su instantánea en <dir>/<pid>.json cada
+# METRICS_FLUSH_SECONDS y /metrics suma las de todos los procesos.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class _ShardHolder:
+    """Contenedor del dict de un hilo; se recoge cuando el hilo termina"""
+    __slots__ = ('values', '__weakref__')
+
+    def __init__(self, values: Dict):
+        self.values = values
+
+
+class _ThreadShards:
+    """Valores por hilo: solo el hilo propietario modifica su dict
+
+    Al terminar un hilo su threading.local se libera y `fold(base, values)` suma su dict
+    en un acumulado común, de modo que el número de dicts no crece con los hilos de vida
+    corta (un hilo por petición en el servidor web).
+    """
+
+    def __init__(self, fold: Callable[[Dict, Dict], None]):
+        self._local = threading.local()
+        self._fold = fold
+        self._base: Dict = {}
+        self._shards: List[Dict] = []
+        self._lock = threading.Lock()  # solo al registrar o retirar un hilo
+
+    def shard(self) -> Dict:
+        try:
+            return self._local.holder.values
+        except AttributeError:
+            values = {}
+            holder = _ShardHolder(values)
+            with self._lock:
+                self._shards.append(values)
+            weakref.finalize(holder, self._retire, values)
+            self._local.holder = holder
+            return values
+
+    def _retire(self, values: Dict):
+        with self._lock:
+            self._shards = [shard for shard in self._shards if shard is not values]
+            self._fold(self._base, values)
+
+    def shards(self) -> List[Dict]:
+        with self._lock:
+            shards = list(self._shards)
+            base = {key: list(value) if isinstance(value, list) else value
+                    for key, value in self._base.items()}
+        # dict() copia cada dict de forma atómica respecto al GIL
+        return [base] + [dict(shard) for shard in shards]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._shards)
+
+
+class Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def collect(self) -> Dict[Tuple[str, ...], object]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Contador monótono por combinación de etiquetas"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = _ThreadShards(self._fold)
+
+    @staticmethod
+    def _fold(base: Dict, shard: Dict):
+        for key, value in shard.items():
+            base[key] = base.get(key, 0) + value
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._values.shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        for shard in self._values.shards():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class Histogram(Metric):
+    """Histograma con cubetas fijas; por clave guarda [conteos por cubeta..., suma, total]"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = _ThreadShards(self._fold)
+
+    @staticmethod
+    def _fold(base: Dict, shard: Dict):
+        for key, state in shard.items():
+            total = base.setdefault(key, [0] * len(state))
+            for i, value in enumerate(state):
+                total[i] += value
+
+    def observe(self, value: float, **labels):
+        shard = self._values.shard()
+        key = self._key(labels)
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 3)
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def time(self, **labels):
+        """Context manager que observa la duración del bloque en segundos"""
+        return _Timer(self, labels)
+
+    def collect(self) -> Dict[Tuple[str, ...], List[float]]:
+        totals: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in self._values.shards():
+            for key, state in shard.items():
+                total = totals.setdefault(key, [0] * len(state))
+                for i, value in enumerate(list(state)):
+                    total[i] += value
+        return totals
+
+
+class Gauge(Metric):
+    """Valor instantáneo leído en cada recolección de las funciones registradas con track()"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._sources: List[Tuple[Tuple[str, ...], Callable[[], float]]] = []
+        self._lock = threading.Lock()
+
+    def track(self, source: Callable[[], float], **labels):
+        """Registra una fuente; si es un método ligado se guarda por referencia débil"""
+        ref = weakref.WeakMethod(source) if hasattr(source, '__self__') else (lambda: source)
+        with self._lock:
+            self._sources.append((self._key(labels), ref))
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        totals: Dict[Tuple[str, ...], float] = {}
+        with self._lock:
+            sources = [(key, ref) for key, ref in self._sources if ref() is not None]
+            self._sources = sources
+        for key, ref in sources:
+            source = ref()
+            if source is not None:
+                totals[key] = totals.get(key, 0) + float(source())
+        return totals
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Conjunto de métricas del proceso y agregación entre procesos"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        return {name: metric.collect() for name, metric in self.metrics.items()}
+
+    def multiproc_dir(self) -> Optional[str]:
+        return os.getenv('METRICS_MULTIPROC_DIR') or None
+
+    def start_flusher(self):
+        """Vuelca periódicamente la instantánea del proceso si hay directorio multiproceso"""
+        if self.multiproc_dir() is None or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        interval = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.flush()
+
+        self._flusher = threading.Thread(target=loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def flush(self):
+        directory = self.multiproc_dir()
+        if directory is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        data = {name: [[list(key), value] for key, value in values.items()]
+                for name, values in self.snapshot().items()}
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def aggregate(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """Instantánea de este proceso sumada a las volcadas por los demás
+
+        Contadores e histogramas de procesos terminados se conservan (son monótonos);
+        los gauges solo se suman de procesos que siguen vivos.
+        """
+        totals = self.snapshot()
+        directory = self.multiproc_dir()
+        if directory is None or not os.path.isdir(directory):
+            return totals
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == f"{os.getpid()}.json":
+                continue
+            try:
+                pid = int(filename[:-5])
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    data = json.load(f)
+            except (ValueError, OSError):
+                continue
+            alive = _process_alive(pid)
+            for name, entries in data.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                values = totals.setdefault(name, {})
+                for key, value in entries:
+                    key = tuple(key)
+                    if metric.kind == 'histogram':
+                        current = values.setdefault(key, [0] * len(value))
+                        values[key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        values[key] = values.get(key, 0) + value
+        return totals
+
+    def exposition(self) -> str:
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)"""
+        totals = self.aggregate()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(totals.get(name, {}).items()):
+                labels = dict(zip(metric.labelnames, key))
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[:-2]):
+                        cumulative += count
+                        bucket_labels = {**labels, 'le': '+Inf' if bound == float('inf') else repr(float(bound))}
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {_format_value(value[-1])}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        lines.extend(_cache_hit_ratio_lines(totals))
+        return '\n'.join(lines) + '\n'
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not float(value).is_integer() else str(int(value))
+
+
+def _cache_hit_ratio_lines(totals: Dict) -> List[str]:
+    # Derivada de montecarlo_cache_requests_total ya agregado entre procesos
+    by_cache: Dict[str, Dict[str, float]] = {}
+    for (cache, result), value in totals.get(CACHE_REQUESTS.name, {}).items():
+        by_cache.setdefault(cache, {})[result] = value
+    lines = ["# HELP montecarlo_cache_hit_ratio Aciertos / consultas por caché",
+             "# TYPE montecarlo_cache_hit_ratio gauge"]
+    for cache, results in sorted(by_cache.items()):
+        total = sum(results.values())
+        if total:
+            lines.append(f'montecarlo_cache_hit_ratio{_format_labels({"cache": cache})} '
+                         f'{results.get("hit", 0) / total:.6f}')
+    return lines
+
+
+def timed_methods(histogram: Histogram, component: str, exclude: Iterable[str] = ()):
+    """Decorador de clase: observa la latencia de cada método público en `histogram`
+
+    Las etiquetas son (component, method). Los staticmethod/classmethod no se envuelven.
+    """
+    excluded = set(exclude)
+
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            # staticmethod es invocable desde Python 3.10: se excluye explícitamente
+            if (attr.startswith('_') or attr in excluded or isinstance(value, (staticmethod, classmethod, property, type))
+                    or not callable(value)):
+                continue
+            setattr(cls, attr, _timed(value, histogram, component, attr))
+        return cls
+    return decorator
+
+
+def _timed(method, histogram: Histogram, component: str, name: str):
+    if inspect.isgeneratorfunction(method):
+        # Generadores (p. ej. cursores en streaming): se mide la iteración completa
+        @functools.wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                yield from method(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, component=component, method=name)
+        return generator_wrapper
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start, component=component, method=name)
+    return wrapper
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = Counter('montecarlo_http_requests_total', 'Peticiones HTTP atendidas',
+                        ('endpoint', 'method', 'status'))
+HTTP_LATENCY = Histogram('montecarlo_http_request_duration_seconds', 'Latencia de las peticiones HTTP',
+                         ('endpoint',))
+STAGE_LATENCY = Histogram('montecarlo_stage_duration_seconds',
+                          'Duración de las etapas trazadas (callbacks de simulación, simulate, metrics, persist, '
+                          'render, API)', ('stage',))
+PATHS_SIMULATED = Counter('montecarlo_paths_simulated_total', 'Trayectorias simuladas (escenarios × n)')
+SIMULATION_THROUGHPUT = Histogram('montecarlo_simulation_paths_per_second', 'Trayectorias por segundo de cada simulación',
+                                  buckets=(1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7))
+DB_LATENCY = Histogram('montecarlo_db_query_duration_seconds', 'Latencia por método de NeonDB y AuthManager',
+                       ('component', 'method'))
+CACHE_REQUESTS = Counter('montecarlo_cache_requests_total', 'Consultas a cachés por resultado (hit/miss)',
+                         ('cache', 'result'))
+QUEUE_DEPTH = Gauge('montecarlo_queue_depth', 'Elementos pendientes en colas de trabajo', ('queue',))
+SCHEDULER_JOBS = Counter('montecarlo_scheduler_jobs_total', 'Trabajos del planificador por prioridad y resultado',
+                         ('priority', 'outcome'))
+
+
+def record_simulation(n_paths: int, seconds: float):
+    """Cuenta trayectorias simuladas y observa el rendimiento de la llamada"""
+    PATHS_SIMULATED.inc(n_paths)
+    if seconds > 0:
+        SIMULATION_THROUGHPUT.observe(n_paths / seconds)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
@@ -0,0 +1,79 @@
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+# Una única medición activa por proceso: tracemalloc es global y reiniciar su pico
+# desde otro hilo falsearía la medición en curso
+_tracking_lock = threading.Lock()
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """El consumo previsto de una simulación supera el presupuesto de memoria configurado"""
+
+    def __init__(self, label: str, predicted_bytes: int, budget_bytes: int):
+        self.label = label
+        self.predicted_bytes = predicted_bytes
+        self.budget_bytes = budget_bytes
+        super().__init__(f"{label}: se prevén {format_bytes(predicted_bytes)} y el presupuesto es "
+                         f"{format_bytes(budget_bytes)}")
+
+
+@dataclass
+class MemoryReport:
+    """Memoria de una llamada del motor: prevista, pico medido y arrays del resultado"""
+    label: str
+    n_paths: int  # trayectorias simuladas (escenarios × n_simulations)
+    predicted_bytes: int
+    peak_bytes: Optional[int] = None  # None si otra medición estaba activa
+    result_bytes: int = 0  # bytes de los buffers NumPy retenidos en los resultados
+    bounded: bool = False  # ejecutado en modo de memoria acotada
+
+    @property
+    def bytes_per_path(self) -> Optional[float]:
+        if self.peak_bytes is None or not self.n_paths:
+            return None
+        return self.peak_bytes / self.n_paths
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), 'bytes_per_path': self.bytes_per_path}
+
+    def __str__(self) -> str:
+        peak = format_bytes(self.peak_bytes) if self.peak_bytes is not None else 'no medido'
+        per_path = f", {self.bytes_per_path:,.0f} B/trayectoria" if self.bytes_per_path else ''
+        mode = ' (acotado)' if self.bounded else ''
+        return (f"{self.label}{mode}: pico {peak} (previsto {format_bytes(self.predicted_bytes)}{per_path}), "
+                f"resultados {format_bytes(self.result_bytes)}")
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+@contextmanager
+def track_peak(report: MemoryReport):
+    """Mide con tracemalloc el pico de memoria del bloque y lo guarda en report.peak_bytes
+
+    NumPy registra sus buffers en tracemalloc, así que el pico incluye los arrays
+    intermedios. Mide la memoria de todo el proceso durante el bloque (incluidos otros
+    hilos); si ya hay una medición activa, el bloque queda incluido en ella y no se mide.
+    """
+    if not _tracking_lock.acquire(blocking=False):
+        yield report
+        return
+    started = not tracemalloc.is_tracing()
+    try:
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        yield report
+        report.peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if started:
+            tracemalloc.stop()
+        _tracking_lock.release()
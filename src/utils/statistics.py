@@ -1,16 +1,98 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, List
-from ..models.business_scenario import SimulationResult
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from ..models.business_scenario import NPV_PERCENTILES, TAIL_LEVELS, TAIL_PERCENTS, SimulationResult
+
+# Métricas de calculate_risk_metrics que admiten intervalo de confianza por bootstrap
+BOOTSTRAP_METRICS = ('media_npv', 'desviacion_std', 'probabilidad_exito', 'var_95', 'cvar_95',
+                     'percentil_10', 'percentil_25', 'mediana', 'percentil_75', 'percentil_90',
+                     'roi_medio', 'roi_std', 'prob_roi_positivo',
+                     'break_even_medio', 'prob_break_even_6m', 'prob_break_even_12m')
+# Métricas que el motor estima por postestratificación con muestreo 'stratified' o 'lhs'
+POST_STRATIFIED_METRICS = ('media_npv', 'probabilidad_exito')
+
+def _bootstrap_block(npv_sorted: np.ndarray, roi_values: np.ndarray, break_even: np.ndarray,
+                     n_resamples: int, seed, strata: Optional[np.ndarray] = None) -> np.ndarray:
+    """Evalúa todas las métricas de BOOTSTRAP_METRICS para un bloque de remuestreos
+    
+    Los arrays llegan ordenados por NPV, así que ordenar los índices remuestreados
+    (enteros, más barato que ordenar floats) deja cada remuestreo ya ordenado y los
+    percentiles se leen por posición sin particionar. Con `strata` (en el mismo orden)
+    se remuestrea dentro de cada estrato y media y probabilidad de éxito se recalculan
+    con el estimador postestratificado. Retorna una matriz
+    (n_resamples, len(BOOTSTRAP_METRICS)); cada fila es un remuestreo.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(npv_sorted)
+    if strata is None:
+        idx = rng.integers(0, n, size=(n_resamples, n))
+    else:
+        parts = [group[rng.integers(0, len(group), size=(n_resamples, len(group)))]
+                 for group in (np.flatnonzero(strata == label) for label in np.unique(strata))]
+        stratum_npv = [npv_sorted[part] for part in parts]
+        post_mean = np.mean([values.mean(axis=1) for values in stratum_npv], axis=0)
+        post_success = np.mean([(values > 0).mean(axis=1) for values in stratum_npv], axis=0) * 100
+        del stratum_npv
+        idx = np.hstack(parts)
+    idx.sort(axis=1)
+    npv = npv_sorted[idx]
+    roi = roi_values[idx]
+    be = break_even[idx]
+    
+    # Interpolación lineal, igual que np.percentile por defecto
+    positions = np.array([5, 10, 25, 50, 75, 90]) / 100 * (n - 1)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, n - 1)
+    fraction = positions - lower
+    p5, p10, p25, p50, p75, p90 = (npv[:, lower] + (npv[:, upper] - npv[:, lower]) * fraction).T
+    tail = npv <= p5[:, None]
+    cvar = np.sum(npv * tail, axis=1) / np.maximum(np.sum(tail, axis=1), 1)
+    
+    columns = [
+        np.mean(npv, axis=1), np.std(npv, axis=1), np.mean(npv > 0, axis=1) * 100, p5, cvar,
+        p10, p25, p50, p75, p90,
+        np.mean(roi, axis=1), np.std(roi, axis=1), np.mean(roi > 0, axis=1) * 100,
+        np.mean(be, axis=1), np.mean(be <= 6, axis=1) * 100, np.mean(be <= 12, axis=1) * 100,
+    ]
+    if strata is not None:
+        columns[BOOTSTRAP_METRICS.index('media_npv')] = post_mean
+        columns[BOOTSTRAP_METRICS.index('probabilidad_exito')] = post_success
+    return np.column_stack(columns)
 
 class StatisticsCalculator:
     """Calculadora de estadísticas avanzadas para análisis de riesgo"""
     
+    # Percentiles de NPV reportados y niveles de cola extrema (definidos junto a SimulationResult)
+    NPV_PERCENTILES = NPV_PERCENTILES
+    TAIL_LEVELS = TAIL_LEVELS
+    
     @staticmethod
     def calculate_risk_metrics(result: SimulationResult) -> Dict:
-        """Calcula métricas de riesgo empresarial"""
+        """Calcula métricas de riesgo empresarial (memorizadas en el resultado)"""
+        # Copia superficial: quien llama puede modificar el dict sin tocar la caché
+        if isinstance(result, SimulationResult):
+            return dict(result.metrics)
+        return StatisticsCalculator.compute_risk_metrics(result)
+    
+    @staticmethod
+    def compute_risk_metrics(result: SimulationResult) -> Dict:
+        """Calcula métricas de riesgo empresarial sin usar la caché del resultado
+        
+        Cada array se recorre el mínimo de veces: todos los percentiles de NPV (incluidas
+        las colas) salen de una única llamada a np.percentile, compartida con el resumen
+        del resultado; los momentos de una sola pasada sin pandas y el break-even de un
+        único conteo por mes.
+        """
         
         npv_values = result.net_present_values
+        skewness, kurtosis = StatisticsCalculator._skew_kurtosis(npv_values)
+        percents = NPV_PERCENTILES + TAIL_PERCENTS
+        if isinstance(result, SimulationResult):
+            quantiles = result.npv_percentiles(percents)
+        else:
+            quantiles = np.percentile(npv_values, percents)
+        p10, p25, p50, p75, p90, *tail_values = quantiles
         
         # Métricas básicas
         metrics = {
@@ -22,15 +104,21 @@ class StatisticsCalculator:
             'cvar_95': np.mean(npv_values[npv_values <= result.var_95]),  # Conditional VaR
         }
         
+        # Colas extremas por muestreo simple (inestables con pocas trayectorias; para
+        # estimaciones precisas ver MonteCarloEngine.estimate_tail_risk)
+        for suffix, var in zip(TAIL_LEVELS, tail_values):
+            metrics[f'var_{suffix}'] = var
+            metrics[f'cvar_{suffix}'] = np.mean(npv_values[npv_values <= var])
+        
         # Métricas de distribución
         metrics.update({
-            'asimetria': float(pd.Series(npv_values).skew()),
-            'curtosis': float(pd.Series(npv_values).kurtosis()),
-            'percentil_10': np.percentile(npv_values, 10),
-            'percentil_25': np.percentile(npv_values, 25),
-            'mediana': np.percentile(npv_values, 50),
-            'percentil_75': np.percentile(npv_values, 75),
-            'percentil_90': np.percentile(npv_values, 90),
+            'asimetria': skewness,
+            'curtosis': kurtosis,
+            'percentil_10': p10,
+            'percentil_25': p25,
+            'mediana': p50,
+            'percentil_75': p75,
+            'percentil_90': p90,
         })
         
         # Métricas de ROI
@@ -44,16 +132,229 @@ class StatisticsCalculator:
         })
         
         # Análisis de break-even
-        break_even = result.break_even_months
-        metrics.update({
-            'break_even_medio': np.mean(break_even),
-            'break_even_mediano': np.median(break_even),
-            'prob_break_even_6m': np.mean(break_even <= 6) * 100,
-            'prob_break_even_12m': np.mean(break_even <= 12) * 100,
-        })
+        metrics.update(StatisticsCalculator._break_even_metrics(result.break_even_months))
+        
+        # TIR y payback descontado
+        metrics.update(StatisticsCalculator._irr_payback_metrics(result.irr_values,
+                                                                 result.discounted_payback_months))
+        
+        return metrics
+    
+    @staticmethod
+    def _skew_kurtosis(values: np.ndarray):
+        """Asimetría y curtosis en exceso (estimadores ajustados, iguales a pandas) en una pasada"""
+        n = len(values)
+        deviations = values - np.mean(values)
+        squared = deviations * deviations
+        m2 = np.sum(squared)
+        m3 = np.dot(squared, deviations)
+        m4 = np.dot(squared, squared)
+        
+        if n < 3:
+            skewness = float('nan')
+        elif m2 == 0:
+            skewness = 0.0
+        else:
+            skewness = float(n * np.sqrt(n - 1) / (n - 2) * m3 / m2 ** 1.5)
+        
+        if n < 4:
+            kurtosis = float('nan')
+        elif m2 == 0:
+            kurtosis = 0.0
+        else:
+            adjustment = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+            kurtosis = float(n * (n + 1) * (n - 1) * m4 / ((n - 2) * (n - 3) * m2 ** 2) - adjustment)
+        
+        return skewness, kurtosis
+    
+    @staticmethod
+    def _break_even_metrics(break_even: np.ndarray) -> Dict:
+        """Métricas de break-even a partir de un único conteo por mes"""
+        months = break_even.astype(np.int64)
+        if len(months) == 0 or months.min() < 0 or not np.array_equal(months, break_even):
+            # Meses no enteros: se recurre a los cálculos generales
+            return {
+                'break_even_medio': np.mean(break_even),
+                'break_even_mediano': np.median(break_even),
+                'prob_break_even_6m': np.mean(break_even <= 6) * 100,
+                'prob_break_even_12m': np.mean(break_even <= 12) * 100,
+            }
+        
+        n = len(months)
+        counts = np.bincount(months)
+        cumulative = np.cumsum(counts)
+        # Posiciones (0-indexadas) de los elementos centrales en el array ordenado
+        lower = np.searchsorted(cumulative, (n - 1) // 2, side='right')
+        upper = np.searchsorted(cumulative, n // 2, side='right')
+        
+        def prob_within(month):
+            return cumulative[min(month, len(cumulative) - 1)] / n * 100
+        
+        return {
+            'break_even_medio': np.dot(counts, np.arange(len(counts))) / n,
+            'break_even_mediano': (lower + upper) / 2,
+            'prob_break_even_6m': prob_within(6),
+            'prob_break_even_12m': prob_within(12),
+        }
+    
+    @staticmethod
+    def weighted_tail_risk(values: np.ndarray, weights: np.ndarray, levels: Optional[Dict[str, float]] = None) -> Dict:
+        """VaR y CVaR de la cola inferior con pesos de verosimilitud (muestreo por importancia)
+        
+        La probabilidad de cola se estima como la media de los pesos de las trayectorias
+        por debajo de cada valor (insesgado; no depende de los pesos lejos de la cola). VaR
+        es el primer valor cuya probabilidad acumulada alcanza 1 - nivel y CVaR la media
+        ponderada por debajo. Reporta el tamaño muestral efectivo (ESS) global y por cola.
+        """
+        levels = levels or StatisticsCalculator.TAIL_LEVELS
+        order = np.argsort(values)
+        values, weights = values[order], weights[order]
+        cumulative = np.cumsum(weights) / len(weights)
         
+        def ess(w):
+            return float(w.sum() ** 2 / np.dot(w, w)) if len(w) and w.any() else 0.0
+        
+        metrics = {'ess': ess(weights), 'ess_pct': ess(weights) / len(weights) * 100}
+        for suffix, level in levels.items():
+            # Tolerancia relativa: 1 - 0.99 no es exactamente 0.01 en coma flotante
+            tail_end = min(int(np.searchsorted(cumulative, (1 - level) * (1 - 1e-9))), len(values) - 1) + 1
+            tail_weights = weights[:tail_end]
+            metrics[f'var_{suffix}'] = values[tail_end - 1]
+            metrics[f'cvar_{suffix}'] = float(np.dot(tail_weights, values[:tail_end]) / tail_weights.sum())
+            metrics[f'ess_cola_{suffix}'] = ess(tail_weights)
         return metrics
     
+    @staticmethod
+    def _irr_payback_metrics(irr: np.ndarray, payback: np.ndarray) -> Dict:
+        """Métricas de TIR y payback descontado ignorando las trayectorias sin valor (NaN)"""
+        n = len(irr)
+        irr_valid = irr[np.isfinite(irr)]
+        recovered = payback[np.isfinite(payback)]
+        
+        if len(irr_valid):
+            irr_p5, irr_p50, irr_p95 = np.percentile(irr_valid, [5, 50, 95])
+            irr_mean = np.mean(irr_valid)
+        else:
+            irr_p5 = irr_p50 = irr_p95 = irr_mean = float('nan')
+        
+        return {
+            'tir_media': irr_mean,
+            'tir_mediana': irr_p50,
+            'tir_percentil_5': irr_p5,
+            'tir_percentil_95': irr_p95,
+            'tir_convergencia': len(irr_valid) / n * 100 if n else float('nan'),
+            'payback_descontado_medio': np.mean(recovered) if len(recovered) else float('nan'),
+            'payback_descontado_mediano': np.median(recovered) if len(recovered) else float('nan'),
+            'prob_payback_descontado': len(recovered) / n * 100 if n else float('nan'),
+        }
+    
+    @staticmethod
+    def bootstrap_confidence_intervals(result: SimulationResult, n_resamples: int = 1000,
+                                       confidence: float = 0.95, block_size: Optional[int] = None,
+                                       seed: Optional[int] = None, n_jobs: int = 1) -> Dict[str, Dict]:
+        """Intervalos de confianza por bootstrap para las métricas de riesgo
+        
+        Los remuestreos se procesan por bloques: cada bloque genera una matriz de índices
+        (bloque, n) y evalúa todas las métricas en NumPy vectorizado. Con n_jobs > 1 los
+        bloques se reparten entre procesos con semillas independientes.
+        
+        Si el resultado conserva sus estratos (muestreo 'stratified' o 'lhs'), el bootstrap
+        remuestrea dentro de cada estrato y los intervalos de media_npv y
+        probabilidad_exito son los del estimador postestratificado que se muestra; si no,
+        son los de la media simple, que pasa a ser su 'estimacion'. La clave 'estimador'
+        de esas dos métricas indica cuál se usó.
+        """
+        # Se ordena una sola vez por NPV; ROI, break-even y estratos siguen el mismo orden
+        order = np.argsort(result.net_present_values, kind='stable')
+        npv_values = np.asarray(result.net_present_values)[order]
+        roi_values = np.asarray(result.roi_values)[order]
+        break_even = np.asarray(result.break_even_months)[order]
+        strata = getattr(result, 'strata', None)
+        if strata is not None:
+            strata = np.asarray(strata)[order]
+        n = len(npv_values)
+        
+        # Bloques de ~2M elementos por array para acotar la memoria de cada remuestreo
+        block_size = block_size or max(1, min(n_resamples, 2_000_000 // max(n, 1)))
+        sizes = [min(block_size, n_resamples - start) for start in range(0, n_resamples, block_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        
+        if n_jobs > 1 and len(sizes) > 1:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                blocks = list(executor.map(_bootstrap_block, [npv_values] * len(sizes), [roi_values] * len(sizes),
+                                           [break_even] * len(sizes), sizes, seeds, [strata] * len(sizes)))
+        else:
+            blocks = [_bootstrap_block(npv_values, roi_values, break_even, size, block_seed, strata)
+                      for size, block_seed in zip(sizes, seeds)]
+        samples = np.vstack(blocks)
+        
+        alpha = (1 - confidence) / 2
+        lower, upper = np.percentile(samples, [alpha * 100, (1 - alpha) * 100], axis=0)
+        std_errors = np.std(samples, axis=0, ddof=1)
+        metrics = result.metrics if isinstance(result, SimulationResult) else StatisticsCalculator.compute_risk_metrics(result)
+        estimates = {name: metrics[name] for name in BOOTSTRAP_METRICS}
+        if strata is None:
+            # Intervalo de la media simple: la estimación puntual debe ser la misma
+            estimates.update(media_npv=np.mean(npv_values), probabilidad_exito=np.mean(npv_values > 0) * 100)
+        
+        intervals = {
+            name: {
+                'estimacion': float(estimates[name]),
+                'inferior': float(lower[i]),
+                'superior': float(upper[i]),
+                'error_std': float(std_errors[i]),
+            }
+            for i, name in enumerate(BOOTSTRAP_METRICS)
+        }
+        for name in POST_STRATIFIED_METRICS:
+            intervals[name]['estimador'] = 'postestratificado' if strata is not None else 'media simple'
+        return intervals
+    
+    @staticmethod
+    def histogram_bins(values: np.ndarray, bins: int = 50) -> Dict:
+        """Agrega valores en bins uniformes para graficar sin enviar cada trayectoria"""
+        counts, edges = np.histogram(values, bins=bins)
+        return {
+            'counts': counts,
+            'edges': edges,
+            'centers': (edges[:-1] + edges[1:]) / 2,
+            'width': edges[1] - edges[0],
+        }
+    
+    @staticmethod
+    def binned_kde(values: np.ndarray, grid_size: int = 256,
+                   bandwidth: Optional[float] = None) -> Dict:
+        """Estimación de densidad kernel gaussiana por binning lineal
+        
+        Cada valor reparte su peso entre los dos puntos de malla vecinos (una pasada
+        O(n) con bincount) y la densidad se obtiene convolucionando esos pesos con
+        el kernel muestreado en la malla, con coste O(grid_size) independiente de n.
+        """
+        values = np.asarray(values)
+        n = len(values)
+        if bandwidth is None:
+            # Regla de Silverman
+            q25, q75 = np.percentile(values, [25, 75])
+            spread = min(np.std(values), (q75 - q25) / 1.34) or np.std(values) or 1.0
+            bandwidth = 0.9 * spread * n ** -0.2
+        
+        low, high = np.min(values) - 3 * bandwidth, np.max(values) + 3 * bandwidth
+        grid = np.linspace(low, high, grid_size)
+        delta = grid[1] - grid[0]
+        
+        positions = (values - low) / delta
+        left = np.clip(np.floor(positions).astype(np.intp), 0, grid_size - 2)
+        right_weight = positions - left
+        weights = (np.bincount(left, weights=1 - right_weight, minlength=grid_size) +
+                   np.bincount(left + 1, weights=right_weight, minlength=grid_size))
+        
+        reach = min(grid_size - 1, int(np.ceil(4 * bandwidth / delta)))
+        offsets = np.arange(-reach, reach + 1) * delta
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / np.sqrt(2 * np.pi)
+        density = np.convolve(weights, kernel)[reach:reach + grid_size] / (n * bandwidth)
+        
+        return {'grid': grid, 'density': density, 'bandwidth': bandwidth}
+    
     @staticmethod
     def compare_scenarios(results: List[SimulationResult]) -> pd.DataFrame:
         """Compara múltiples escenarios de negocio"""
@@ -75,31 +376,61 @@ class StatisticsCalculator:
         return df.sort_values('score_atractivo', ascending=False)
     
     @staticmethod
-    def sensitivity_analysis(base_scenario, engine, parameter_ranges: Dict) -> Dict:
-        """Análisis de sensibilidad de parámetros"""
+    def sensitivity_analysis(base_scenario, engine, parameter_ranges: Dict, n_jobs: int = 1,
+                             user: str = 'batch') -> Dict:
+        """Análisis de sensibilidad de parámetros
+        
+        Con n_jobs > 1 cada barrido se simula en procesos worker que devuelven las
+        trayectorias por memoria compartida; los bloques se liberan tras leer el resumen.
+        Cada paso del barrido espera su turno en el planificador compartido con prioridad
+        'batch', a nombre del usuario de `engine` si es un ScheduledEngine o de `user`.
+        """
+        from ..simulation.scheduler import ScheduledEngine, get_default_scheduler
+        if isinstance(engine, ScheduledEngine):
+            engine = engine.scheduler.bind(engine.engine, engine.user, 'batch', engine.timeout)
+        else:
+            engine = get_default_scheduler().bind(engine, user, 'batch')
         
         sensitivity_results = {}
         
-        for param, (min_val, max_val, steps) in parameter_ranges.items():
-            param_values = np.linspace(min_val, max_val, steps)
-            npv_means = []
-            success_probs = []
+        # Con engine.profile_memory se mide el pico del barrido completo
+        step_counts = [int(steps) for _, _, steps in parameter_ranges.values()]
+        predicted = engine.predict_memory(time_horizon=int(base_scenario.time_horizon),
+                                          n_scenarios=max(step_counts, default=1))
+        with engine.track_memory('sensitivity_analysis', sum(step_counts) * engine.n_simulations, predicted):
+            for param, (min_val, max_val, steps) in parameter_ranges.items():
+                param_values = np.linspace(min_val, max_val, steps)
+            
+                # Crear escenarios modificados
+                scenarios = []
+                for value in param_values:
+                    scenario_copy = base_scenario.__class__(**base_scenario.__dict__)
+                    setattr(scenario_copy, param, value)
+                    scenarios.append(scenario_copy)
             
-            for value in param_values:
-                # Crear escenario modificado
-                scenario_copy = base_scenario.__class__(**base_scenario.__dict__)
-                setattr(scenario_copy, param, value)
-                
                 # Simular
-                result = engine.simulate_scenario(scenario_copy)
-                npv_means.append(result.mean_npv)
-                success_probs.append(result.success_probability)
+                if n_jobs > 1:
+                    from ..simulation.shared_results import ParallelSimulator
+                    simulator = ParallelSimulator(n_workers=n_jobs, n_simulations=engine.n_simulations,
+                                                  discount_rate=engine.discount_rate, seed=engine.seed,
+                                                  scheduler=engine.scheduler, user=engine.user,
+                                                  priority=engine.priority, timeout=engine.timeout,
+                                                  sampling=engine.sampling, memory_budget=engine.memory_budget,
+                                                  on_budget=engine.on_budget)
+                    results = simulator.simulate_scenarios(scenarios)
+                else:
+                    results = [engine.simulate_scenario(scenario) for scenario in scenarios]
             
-            sensitivity_results[param] = {
-                'values': param_values,
-                'npv_means': npv_means,
-                'success_probs': success_probs,
-                'elasticity_npv': np.std(npv_means) / np.mean(npv_means) if np.mean(npv_means) != 0 else 0
-            }
+                npv_means = [result.mean_npv for result in results]
+                success_probs = [result.success_probability for result in results]
+                for result in results:
+                    result.release()
+            
+                sensitivity_results[param] = {
+                    'values': param_values,
+                    'npv_means': npv_means,
+                    'success_probs': success_probs,
+                    'elasticity_npv': np.std(npv_means) / np.mean(npv_means) if np.mean(npv_means) != 0 else 0
+                }
         
-        return sensitivity_results
\ No newline at end of file
+        return sensitivity_results
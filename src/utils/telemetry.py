@@ -0,0 +1,193 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from .instrumentation import STAGE_LATENCY
+
+# Registro estructurado y trazas del sistema
+#
+# Los módulos obtienen su logger con get_logger('engine') y emiten con formato diferido
+# (logger.info("Escenario %s guardado", name)): el mensaje solo se construye si el nivel
+# está habilitado y, entonces, en el hilo del exportador. Los handlers escriben desde un
+# QueueListener en segundo plano, así que la ruta caliente solo encola.
+#
+# span('simulate', ...) mide una etapa; las etapas anidadas comparten trace_id y los
+# registros emitidos dentro llevan trace_id/span_id. El muestreo se decide en la raíz de
+# cada traza: en las trazas no muestreadas no se exportan spans ni registros por debajo
+# de WARNING. Configuración por variables de entorno:
+#   TELEMETRY_LOG_LEVEL    nivel de consola (WARNING por defecto)
+#   TELEMETRY_EXPORT_PATH  fichero JSON Lines para registros y spans (sin exportar si falta)
+#   TELEMETRY_SAMPLE_RATE  fracción de trazas muestreadas (1.0 por defecto)
+#   TELEMETRY_HIGH_VOLUME_SAMPLE_RATE  fracción para trazas de alto volumen, p. ej. la API (0.1)
+
+LOGGER_ROOT = 'montecarlo'
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('telemetry_span', default=None)
+_config_lock = threading.Lock()
+_state = {'configured': False, 'listener': None, 'sample_rate': 1.0, 'high_volume_sample_rate': 0.1,
+          'exporting': False}
+
+
+class Span:
+    """Etapa medida de una traza; los atributos se exportan con su duración"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'sampled', 'attributes', 'start', 'duration_ms',
+                 'status')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status = 'ok'
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {'span': self.name, 'trace_id': self.trace_id, 'span_id': self.span_id,
+                'parent_id': self.parent_id, 'start': self.start, 'duration_ms': self.duration_ms,
+                'status': self.status, 'attributes': self.attributes}
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro o span"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        span = getattr(record, 'span', None)
+        if span is not None:
+            return json.dumps({'type': 'span', **span}, default=str, ensure_ascii=False)
+        entry = {'type': 'log', 'ts': record.created, 'level': record.levelname, 'logger': record.name,
+                 'message': record.getMessage(), 'trace_id': getattr(record, 'trace_id', None),
+                 'span_id': getattr(record, 'span_id', None)}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _TraceContextFilter(logging.Filter):
+    # En el hilo que emite: añade el contexto de traza y descarta el detalle de trazas no muestreadas
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = _current_span.get()
+        record.trace_id = span.trace_id if span else None
+        record.span_id = span.span_id if span else None
+        return span is None or span.sampled or record.levelno >= logging.WARNING
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # QueueHandler formatea el mensaje al encolar; aquí se difiere al hilo del listener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_telemetry(level: Optional[str] = None, export_path: Optional[str] = None,
+                        sample_rate: Optional[float] = None, high_volume_sample_rate: Optional[float] = None):
+    """(Re)configura consola, exportador JSON y muestreo; sin argumentos usa las variables de entorno"""
+    level = (level or os.getenv('TELEMETRY_LOG_LEVEL', 'WARNING')).upper()
+    export_path = export_path if export_path is not None else os.getenv('TELEMETRY_EXPORT_PATH')
+    if sample_rate is None:
+        sample_rate = float(os.getenv('TELEMETRY_SAMPLE_RATE', '1.0'))
+    if high_volume_sample_rate is None:
+        high_volume_sample_rate = float(os.getenv('TELEMETRY_HIGH_VOLUME_SAMPLE_RATE', '0.1'))
+
+    with _config_lock:
+        _stop_listener()
+        console = logging.StreamHandler()
+        console.setLevel(level)
+        console.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        handlers = [console]
+        if export_path:
+            exporter = logging.FileHandler(export_path, encoding='utf-8')
+            exporter.setFormatter(JsonFormatter())
+            handlers.append(exporter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(_TraceContextFilter())
+        root = logging.getLogger(LOGGER_ROOT)
+        root.handlers[:] = [queue_handler]
+        root.propagate = False
+        # El nivel del logger filtra antes de crear el registro: sin exportador, el de consola
+        root.setLevel(logging.DEBUG if export_path else level)
+        # Los spans solo van al exportador JSON, nunca a la consola
+        console.addFilter(lambda record: getattr(record, 'span', None) is None)
+
+        listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _state.update(configured=True, listener=listener, sample_rate=sample_rate,
+                      high_volume_sample_rate=high_volume_sample_rate, exporting=bool(export_path))
+
+
+def shutdown_telemetry():
+    """Vacía la cola y cierra los handlers (los registros pendientes se escriben)"""
+    with _config_lock:
+        _stop_listener()
+        _state['configured'] = False
+
+
+atexit.register(shutdown_telemetry)
+
+
+def _stop_listener():
+    listener = _state['listener']
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        _state['listener'] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger 'montecarlo.<name>'; configura la telemetría desde el entorno la primera vez"""
+    if not _state['configured']:
+        configure_telemetry()
+    return logging.getLogger(f'{LOGGER_ROOT}.{name}')
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, high_volume: bool = False, parent: Optional[Span] = None, **attributes):
+    """Mide una etapa como span hijo del actual (o raíz de una traza nueva)
+
+    El muestreo se decide en la raíz con TELEMETRY_SAMPLE_RATE, o con la tasa de alto
+    volumen si `high_volume`; los hijos heredan la decisión. `parent` permite continuar
+    una traza en otro hilo. Las excepciones marcan el span como 'error'.
+    """
+    parent = parent or _current_span.get()
+    if parent is None:
+        rate = _state['high_volume_sample_rate' if high_volume else 'sample_rate']
+        current = Span(name, f"{random.getrandbits(128):032x}", None, random.random() < rate, attributes)
+    else:
+        current = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.attributes['error'] = repr(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        current.duration_ms = elapsed * 1000
+        _current_span.reset(token)
+        # El histograma por etapa no depende del muestreo de trazas
+        STAGE_LATENCY.observe(elapsed, stage=name)
+        if current.sampled and _state['exporting']:
+            logging.getLogger(f'{LOGGER_ROOT}.trace').info(name, extra={'span': current.to_dict()})
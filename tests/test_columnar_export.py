@@ -0,0 +1,60 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.utils import columnar_export
+from src.utils.columnar_export import ColumnarExporter
+
+@unittest.skipIf(columnar_export.pa is None, "pyarrow no está instalado")
+class TestColumnarExport(unittest.TestCase):
+    """Pruebas de exportación a Parquet y Arrow IPC"""
+
+    def test_roundtrip_by_row_group(self):
+        """El resultado se reconstruye igual y se puede leer por grupos de filas"""
+        engine = MonteCarloEngine(n_simulations=1000, use_database=False)
+        scenario = BusinessScenario(
+            name="Export Scenario",
+            initial_investment=50000,
+            revenue_mean=15000,
+            revenue_std=3000,
+            cost_mean=8000,
+            cost_std=1500
+        )
+        result = engine.simulate_scenario(scenario)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for filename in ('result.parquet', 'result.arrow'):
+                path = os.path.join(tmpdir, filename)
+                ColumnarExporter.write_result(result, path, scenario=scenario, row_group_size=250)
+                reader = ColumnarExporter.open(path)
+
+                self.assertEqual(reader.num_row_groups, 4)
+                self.assertEqual(reader.scenario_params['name'], "Export Scenario")
+                self.assertEqual(reader.read_row_group(2, ['npv']).num_rows, 250)
+                np.testing.assert_array_equal(reader.to_result().net_present_values, result.net_present_values)
+                reader.close()
+
+    def test_ipc_reads_only_requested_columns(self):
+        """Arrow IPC proyecta las columnas al leer y el mapa de memoria se cierra al salir"""
+        engine = MonteCarloEngine(n_simulations=500, use_database=False)
+        result = engine.simulate_scenario(BusinessScenario("IPC", 50000, 15000, 3000, 8000, 1500))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'result.arrow')
+            ColumnarExporter.write_result(result, path, row_group_size=100)
+            with ColumnarExporter.open(path) as reader:
+                table = reader.read(['roi', 'npv'])
+                self.assertEqual(table.column_names, ['roi', 'npv'])
+                self.assertEqual(reader.read_row_group(1, ['irr']).column_names, ['irr'])
+                with self.assertRaises(KeyError):
+                    reader.read(['desconocida'])
+            self.assertTrue(reader._source.closed)
+            np.testing.assert_array_equal(table.column('npv').to_numpy(), result.net_present_values)
+
+if __name__ == '__main__':
+    unittest.main()
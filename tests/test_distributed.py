@@ -0,0 +1,146 @@
+import unittest
+import multiprocessing
+import multiprocessing.pool
+import socket
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.simulation.distributed import (DistributedCoordinator, PathAccumulator, handshake_proof, run_worker,
+                                        send_message, recv_message, session_key)
+
+SECRET = b'secreto-de-pruebas'
+
+class TestDistributed(unittest.TestCase):
+    """Pruebas del coordinador TCP y los workers en localhost"""
+
+    def setUp(self):
+        self.coordinator = DistributedCoordinator(shard_size=1000, shard_timeout=30, secret=SECRET).start()
+        self.scenarios = [BusinessScenario("A", 50000, 15000, 3000, 8000, 1500),
+                          BusinessScenario("B", 80000, 15000, 3000, 8000, 1500, time_horizon=24)]
+        self.workers = []
+
+    def tearDown(self):
+        self.coordinator.close()
+        for worker in self.workers:
+            worker.join(10)
+            if worker.is_alive():
+                worker.terminate()
+
+    def start_workers(self, count, secret=SECRET):
+        host, port = self.coordinator.address
+        for i in range(count):
+            # spawn: los workers no heredan los sockets del proceso de pruebas
+            context = multiprocessing.get_context('spawn')
+            worker = context.Process(target=run_worker, args=(host, port, f'w{i}'),
+                                     kwargs={'secret': secret, 'reconnect_attempts': 0}, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def test_accumulators_merge_exactly(self):
+        """Combinar acumuladores por tramos equivale a calcular sobre todas las trayectorias"""
+        rng = np.random.default_rng(0)
+        paths = rng.normal(size=(5, 3000))
+        paths[3, ::7] = np.nan
+        merged = PathAccumulator()
+        for start in range(0, 3000, 1000):
+            merged.merge(PathAccumulator.from_paths(paths[:, start:start + 1000], start))
+
+        self.assertAlmostEqual(merged.summary['mean_npv'], paths[0].mean())
+        self.assertAlmostEqual(merged.summary['std_npv'], paths[0].std())
+        self.assertAlmostEqual(merged.means()['irr_values'], np.nanmean(paths[3]))
+
+    def test_distributed_run_is_deterministic(self):
+        """El resultado depende de la semilla del trabajo, no del reparto entre workers"""
+        self.start_workers(2)
+        first = self.coordinator.run(self.scenarios, 5000, seed=7, keep_paths=True, timeout=60)
+        second = self.coordinator.run(self.scenarios, 5000, seed=7, timeout=60)
+
+        self.assertEqual([acc.n for acc in first], [5000, 5000])
+        result = first[1].to_result("B")
+        self.assertEqual(result.paths.shape, (5, 5000))
+        # Los tramos son rangos de la misma ejecución: coincide con un único proceso
+        engine = MonteCarloEngine(n_simulations=5000, use_database=False, seed=7)
+        np.testing.assert_array_equal(result.paths, engine.simulate_scenario(self.scenarios[1]).paths)
+        self.assertAlmostEqual(second[1].summary['mean_npv'], result.mean_npv)
+        self.assertAlmostEqual(second[1].summary['success_probability'], result.success_probability)
+
+    def test_lost_worker_shard_is_reissued(self):
+        """Un worker que se desconecta con un tramo asignado no impide terminar el trabajo"""
+        host, port = self.coordinator.address
+        with socket.create_connection((host, port)) as sock:
+            key = self.handshake(sock)
+            self.start_workers(1)
+            job = multiprocessing.pool.ThreadPool(1).apply_async(
+                self.coordinator.run, (self.scenarios[:1], 3000), {'seed': 1, 'timeout': 60})
+            message = recv_message(sock, key)
+            self.assertEqual(message['type'], 'shard')
+        # Al cerrar la conexión el tramo vuelve a la cola y lo ejecuta el worker real
+        accumulators = job.get(60)
+        self.assertEqual(accumulators[0].n, 3000)
+        self.assertGreaterEqual(self.coordinator.stats['shards_reissued'], 1)
+
+    def handshake(self, sock, secret=SECRET):
+        """Saludo de un worker simulado; retorna la clave de sesión"""
+        challenge = recv_message(sock)['nonce']
+        send_message(sock, {'type': 'hello', 'worker': 'simulado', 'nonce': 'n1',
+                            'proof': handshake_proof(secret, challenge, 'n1')})
+        return session_key(secret, challenge, 'n1')
+
+    def test_workers_must_know_the_secret(self):
+        """Un worker sin el secreto no recibe tramos y un resultado mal firmado se descarta"""
+        host, port = self.coordinator.address
+        with socket.create_connection((host, port)) as sock:
+            self.handshake(sock, b'otro-secreto')
+            with self.assertRaises(ConnectionError):
+                recv_message(sock)
+        self.assertEqual(self.coordinator.stats['rejected_workers'], 1)
+
+        with socket.create_connection((host, port)) as sock:
+            key = self.handshake(sock)
+            job = multiprocessing.pool.ThreadPool(1).apply_async(
+                self.coordinator.run, (self.scenarios[:1], 1000), {'seed': 1, 'timeout': 60})
+            shard = recv_message(sock, key)['shard']
+            forged = PathAccumulator.from_paths(np.zeros((5, 1000)))
+            send_message(sock, {'type': 'result', 'shard_id': shard['shard_id'],
+                                'accumulator': forged.to_message()}, b'clave-falsa')
+            self.start_workers(1)
+            accumulators = job.get(60)
+        self.assertNotEqual(accumulators[0].summary['mean_npv'], 0.0)
+        self.assertEqual(self.coordinator.stats['shards_reissued'], 1)
+
+    def test_job_fails_without_workers(self):
+        """Sin workers conectados el trabajo falla en vez de esperar indefinidamente"""
+        self.coordinator.worker_wait = 0.5
+        with self.assertRaises(RuntimeError):
+            self.coordinator.run(self.scenarios[:1], 1000)
+
+    def test_shards_use_sampling(self):
+        """Los tramos usan el muestreo pedido y coinciden con un único proceso"""
+        self.start_workers(1)
+        accumulators = self.coordinator.run(self.scenarios[:1], 3000, seed=3, keep_paths=True,
+                                            sampling='stratified', timeout=60)
+        engine = MonteCarloEngine(n_simulations=3000, use_database=False, seed=3, sampling='stratified')
+        expected = engine.simulate_scenario(self.scenarios[0])
+        result = accumulators[0].to_result("A")
+        np.testing.assert_array_equal(result.paths, expected.paths)
+        np.testing.assert_array_equal(result.strata, expected.strata)
+
+    def test_post_stratified_summary_matches_single_process(self):
+        """Con muestreo estratificado o LHS el resumen combinado es el postestratificado de un proceso"""
+        self.start_workers(2)
+        for sampling in ('stratified', 'lhs'):
+            accumulators = self.coordinator.run(self.scenarios, 3500, seed=5, sampling=sampling, timeout=60)
+            engine = MonteCarloEngine(n_simulations=3500, use_database=False, seed=5, sampling=sampling)
+            for accumulator, expected in zip(accumulators, engine.simulate_scenarios(self.scenarios)):
+                self.assertAlmostEqual(accumulator.summary['mean_npv'], expected.mean_npv, places=6)
+                self.assertAlmostEqual(accumulator.summary['success_probability'],
+                                       expected.success_probability, places=9)
+                self.assertNotAlmostEqual(accumulator.summary['mean_npv'],
+                                          np.mean(expected.net_present_values), places=6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import gc
+import multiprocessing
+import tempfile
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.api.simulation_service import SimulationService
+from src.api.routes import register_simulation_api
+from src.api.monitoring import register_metrics_endpoint
+from src.database.neon_db import NeonDB
+from src.utils.instrumentation import CACHE_REQUESTS, DB_LATENCY, PATHS_SIMULATED, REGISTRY
+
+def metric_value(text, prefix):
+    """Valor de la primera línea de la exposición que empieza por `prefix`"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+def simulate_and_flush(directory):
+    """Proceso hijo: simula y vuelca sus métricas en el directorio multiproceso"""
+    os.environ['METRICS_MULTIPROC_DIR'] = directory
+    engine = MonteCarloEngine(n_simulations=700, use_database=False)
+    engine.simulate_scenario(BusinessScenario("Hijo", 50000, 15000, 3000, 8000, 1500))
+    REGISTRY.flush()
+
+class TestInstrumentation(unittest.TestCase):
+    """Pruebas de las métricas operativas y del endpoint /metrics"""
+
+    def test_thread_counters_are_summed(self):
+        """Los incrementos de varios hilos se suman sin perder ninguno"""
+        before = CACHE_REQUESTS.collect().get(('prueba', 'hit'), 0)
+
+        def work():
+            for _ in range(10000):
+                CACHE_REQUESTS.inc(cache='prueba', result='hit')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(CACHE_REQUESTS.collect()[('prueba', 'hit')] - before, 40000)
+
+    def test_finished_threads_are_folded(self):
+        """Los hilos que terminan suman sus valores al acumulado y no dejan su dict"""
+        before = CACHE_REQUESTS.collect().get(('efimero', 'hit'), 0)
+        for _ in range(200):
+            thread = threading.Thread(target=CACHE_REQUESTS.inc, kwargs={'cache': 'efimero', 'result': 'hit'})
+            thread.start()
+            thread.join()
+        gc.collect()
+        self.assertLess(len(CACHE_REQUESTS._values), 20)
+        self.assertEqual(CACHE_REQUESTS.collect()[('efimero', 'hit')] - before, 200)
+
+    def test_timed_methods_skip_static_helpers(self):
+        """Los staticmethod de NeonDB siguen funcionando desde una instancia y no se miden"""
+        db = NeonDB.__new__(NeonDB)
+        rows, cursor = db.paginate([{'created_at': 1, 'id': 1}, {'created_at': 2, 'id': 2}], 1)
+        self.assertEqual(len(rows), 1)
+        self.assertIsNotNone(cursor)
+        clause, params = db.keyset_clause(None, 'created_at', 'id')
+        self.assertEqual(params, ())
+        methods = {key[1] for key in DB_LATENCY.collect() if key[0] == 'neon_db'}
+        self.assertNotIn('paginate', methods)
+        self.assertNotIn('keyset_clause', methods)
+
+    def test_metrics_endpoint(self):
+        """/metrics publica peticiones, latencias por etapa, trayectorias, cachés y colas"""
+        server = Flask(__name__)
+        service = SimulationService(MonteCarloEngine(n_simulations=300, use_database=False), max_wait_ms=10)
+        register_simulation_api(server, service)
+        register_metrics_endpoint(server)
+        client = server.test_client()
+        try:
+            before = client.get('/metrics').get_data(as_text=True)
+            scenario = {'name': 'M', 'initial_investment': 50000, 'revenue_mean': 15000, 'revenue_std': 3000,
+                        'cost_mean': 8000, 'cost_std': 1500}
+            for _ in range(2):
+                self.assertEqual(client.post('/api/simulate', json={'scenario': scenario}).status_code, 200)
+            response = client.get('/metrics')
+        finally:
+            service.close()
+
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        requests_line = 'montecarlo_http_requests_total{endpoint="/api/simulate",method="POST",status="200"}'
+        self.assertEqual(metric_value(text, requests_line) - metric_value(before, requests_line), 2)
+        self.assertEqual(metric_value(text, 'montecarlo_paths_simulated_total')
+                         - metric_value(before, 'montecarlo_paths_simulated_total'), 600)
+        # Histograma acumulativo: la cubeta +Inf coincide con el total
+        stage = '{stage="simulate"}'
+        self.assertEqual(metric_value(text, f'montecarlo_stage_duration_seconds_bucket{{stage="simulate",le="+Inf"}}'),
+                         metric_value(text, f'montecarlo_stage_duration_seconds_count{stage}'))
+        self.assertIn('montecarlo_cache_hit_ratio{cache="api_in_flight"}', text)
+        self.assertIn('montecarlo_queue_depth{queue="api_simulation"} 0', text)
+
+    def test_processes_are_aggregated(self):
+        """Con METRICS_MULTIPROC_DIR se suman las métricas volcadas por otros procesos"""
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['METRICS_MULTIPROC_DIR'] = directory
+            try:
+                local = PATHS_SIMULATED.collect().get((), 0)
+                child = multiprocessing.get_context('spawn').Process(target=simulate_and_flush, args=(directory,))
+                child.start()
+                child.join(60)
+                text = REGISTRY.exposition()
+            finally:
+                del os.environ['METRICS_MULTIPROC_DIR']
+        self.assertEqual(metric_value(text, 'montecarlo_paths_simulated_total'), local + 700)
+
+if __name__ == '__main__':
+    unittest.main()
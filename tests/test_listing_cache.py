@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.auth.listing_cache import ListingCache, cached_listing
+
+class FakeListings:
+    """Sustituto mínimo de AuthManager que cuenta las consultas"""
+
+    def __init__(self):
+        self.listing_cache = ListingCache()
+        self.queries = 0
+
+    @cached_listing('projects')
+    def search_projects(self, user_id, query):
+        self.queries += 1
+        return [{'user_id': user_id, 'query': query}]
+
+class TestListingCache(unittest.TestCase):
+    """Pruebas de la caché de listados con invalidación por escritura"""
+
+    def test_read_through_and_invalidation(self):
+        """Las lecturas repetidas no consultan y la invalidación afecta solo al usuario"""
+        listings = FakeListings()
+        listings.search_projects(1, 'alpha')
+        listings.search_projects(user_id=1, query='alpha')
+        listings.search_projects(2, 'alpha')
+        self.assertEqual(listings.queries, 2)
+
+        listings.listing_cache.invalidate(1, 'simulations')
+        listings.search_projects(1, 'alpha')
+        self.assertEqual(listings.queries, 2)
+
+        listings.listing_cache.invalidate(1, 'projects')
+        listings.search_projects(1, 'alpha')
+        listings.search_projects(2, 'alpha')
+        self.assertEqual(listings.queries, 3)
+
+    def test_stale_load_is_not_cached(self):
+        """Una carga solapada con una invalidación no deja en caché el valor anterior"""
+        cache = ListingCache()
+
+        def loader():
+            cache.invalidate(1, 'projects')  # escritura concurrente durante la consulta
+            return ['antiguo']
+
+        self.assertEqual(cache.get_or_load(1, 'projects', 'k', loader), ['antiguo'])
+        self.assertEqual(cache.stale_loads, 1)
+        self.assertEqual(cache.get_or_load(1, 'projects', 'k', lambda: ['nuevo']), ['nuevo'])
+        self.assertEqual(cache.get_or_load(1, 'projects', 'k', lambda: ['otro']), ['nuevo'])
+
+    def test_returned_listings_are_copies(self):
+        """Modificar un listado retornado no altera la caché"""
+        listings = FakeListings()
+        rows = listings.search_projects(1, 'alpha')
+        rows[0]['query'] = 'modificado'
+        rows.append({})
+        cached = listings.search_projects(1, 'alpha')
+        cached[0]['query'] = 'otra vez'
+        self.assertEqual(listings.search_projects(1, 'alpha'), [{'user_id': 1, 'query': 'alpha'}])
+        self.assertEqual(listings.queries, 1)
+
+    def test_entries_are_bounded_and_expired_ones_removed(self):
+        """La caché descarta los listados menos usados por encima de max_entries y los caducados al guardar"""
+        cache = ListingCache(max_entries=3)
+        for i in range(3):
+            cache.get_or_load(1, 'projects', f'k{i}', lambda i=i: [i])
+        cache.get_or_load(1, 'projects', 'k0', lambda: ['recargado'])  # acierto: k0 pasa a ser el más reciente
+        cache.get_or_load(2, 'simulations', 'k3', lambda: [3])
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get_or_load(1, 'projects', 'k0', lambda: ['recargado']), [0])
+        self.assertEqual(cache.get_or_load(1, 'projects', 'k1', lambda: ['recargado']), ['recargado'])
+
+        cache = ListingCache(ttl_seconds=0)
+        for i in range(5):
+            cache.get_or_load(i, 'projects', 'k', lambda: [])
+        self.assertEqual(len(cache), 1)
+        cache.invalidate(4)
+        self.assertEqual(len(cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from load_test import PROFILES, LocalServer, run_load, seed_users
+from local_db import LocalDB
+
+class TestLoadHarness(unittest.TestCase):
+    """Pruebas del arnés de carga contra un servidor local"""
+
+    def setUp(self):
+        self.db = LocalDB()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_virtual_users_complete_flow(self):
+        """Layout, login y simulaciones concurrentes sin errores en ambos dashboards"""
+        for name in ('simple', 'dashboard'):
+            profile = PROFILES[name]
+            app = profile.build(self.db)
+            seed_users(app, 3)
+            with LocalServer(app.app.server) as server:
+                rows = run_load(app, server.port, profile, n_simulations=300, concurrency=3, clicks=2)
+            counts = {row['operation']: row['requests'] for row in rows}
+            self.assertEqual(counts, {'layout': 3, 'login': 3, 'simulate': 6}, name)
+            for row in rows:
+                self.assertEqual(row['errors'], 0, (name, row['operation']))
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+
+    def test_wrong_password_counts_as_error(self):
+        """Un login rechazado por AuthManager se cuenta como error"""
+        profile = PROFILES['dashboard']
+        app = profile.build(self.db)  # sin usuarios de carga: el login falla
+        with LocalServer(app.app.server) as server:
+            rows = run_load(app, server.port, profile, n_simulations=200, concurrency=1, clicks=1)
+        login = next(row for row in rows if row['operation'] == 'login')
+        self.assertEqual(login['error_rate'], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.utils.memory_profile import MemoryBudgetExceeded
+from src.utils.statistics import StatisticsCalculator
+
+class TestMemoryProfile(unittest.TestCase):
+    """Pruebas de la medición, previsión y presupuesto de memoria del motor"""
+
+    def setUp(self):
+        self.scenario = BusinessScenario("Memoria", 50000, 15000, 3000, 8000, 1500)
+
+    def test_peak_matches_prediction(self):
+        """El pico medido con tracemalloc coincide con la previsión"""
+        engine = MonteCarloEngine(n_simulations=50000, use_database=False, profile_memory=True)
+        result = engine.simulate_scenario(self.scenario)
+
+        report = engine.memory_reports[-1]
+        self.assertEqual(report.label, 'simulate_scenario')
+        self.assertEqual(report.predicted_bytes, engine.predict_memory(50000, 12))
+        self.assertAlmostEqual(report.peak_bytes / report.predicted_bytes, 1, delta=0.1)
+        self.assertEqual(report.result_bytes, result.paths.nbytes)
+        self.assertAlmostEqual(report.bytes_per_path, report.peak_bytes / 50000)
+
+        # Un barrido se mide como una única llamada
+        StatisticsCalculator.sensitivity_analysis(self.scenario, engine, {'revenue_mean': (10000, 20000, 3)})
+        self.assertEqual(engine.memory_reports[-1].label, 'sensitivity_analysis')
+        self.assertEqual(engine.memory_reports[-1].n_paths, 150000)
+
+    def test_budget_refuses_or_bounds(self):
+        """Un trabajo que excede el presupuesto se rechaza o se ejecuta con memoria acotada"""
+        budget = 20 * 1024 ** 2
+        n = 500000
+        self.assertGreater(MonteCarloEngine(use_database=False).predict_memory(n, 12), budget)
+
+        refusing = MonteCarloEngine(n_simulations=n, use_database=False, memory_budget=budget, on_budget='refuse')
+        with self.assertRaises(MemoryBudgetExceeded):
+            refusing.simulate_scenario(self.scenario)
+
+        bounded = MonteCarloEngine(n_simulations=n, use_database=False, memory_budget=budget, profile_memory=True)
+        result = bounded.simulate_scenario(self.scenario)
+        report = bounded.memory_reports[-1]
+        self.assertTrue(report.bounded)
+        self.assertLess(report.peak_bytes, budget)
+        self.assertEqual(result.paths.shape, (5, bounded.BOUNDED_SAMPLE_PATHS))
+
+        # Media y probabilidad de éxito son exactas sobre todas las trayectorias
+        full = MonteCarloEngine(n_simulations=n, use_database=False).simulate_scenario(self.scenario)
+        self.assertAlmostEqual(result.mean_npv, full.mean_npv, places=6)
+        self.assertAlmostEqual(result.std_npv, full.std_npv, places=6)
+        self.assertAlmostEqual(result.success_probability, full.success_probability)
+        self.assertAlmostEqual(result.percentile_5, full.percentile_5, delta=0.05 * full.std_npv)
+        np.testing.assert_array_equal(result.paths, full.paths[:, :bounded.BOUNDED_SAMPLE_PATHS])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,17 @@
 import unittest
+import unittest.mock
 import numpy as np
+import pandas as pd
+import pickle
+from scipy import stats
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.models.business_scenario import BusinessScenario
+from src.models.business_scenario import BusinessScenario, SimulationResult
 from src.simulation.monte_carlo_engine import MonteCarloEngine
 from src.utils.statistics import StatisticsCalculator
+from src.utils.financial import FinancialCalculator
 
 class TestMonteCarloEngine(unittest.TestCase):
     """Pruebas unitarias para el motor Monte Carlo"""
@@ -67,6 +72,212 @@ class TestMonteCarloEngine(unittest.TestCase):
         
         # VaR debe ser menor o igual que el percentil 5
         self.assertLessEqual(metrics['var_95'], result.percentile_5)
+    
+    def test_risk_metrics_match_reference(self):
+        """Prueba que el cálculo fusionado coincide con pandas y np.percentile"""
+        result = self.engine.simulate_scenario(self.test_scenario)
+        metrics = StatisticsCalculator.calculate_risk_metrics(result)
+        npv = result.net_present_values
+        break_even = result.break_even_months
+        
+        self.assertAlmostEqual(metrics['asimetria'], pd.Series(npv).skew())
+        self.assertAlmostEqual(metrics['curtosis'], pd.Series(npv).kurtosis())
+        self.assertAlmostEqual(metrics['percentil_25'], np.percentile(npv, 25))
+        self.assertAlmostEqual(metrics['mediana'], np.percentile(npv, 50))
+        self.assertAlmostEqual(metrics['break_even_mediano'], np.median(break_even))
+        self.assertAlmostEqual(metrics['break_even_medio'], np.mean(break_even))
+        self.assertAlmostEqual(metrics['prob_break_even_6m'], np.mean(break_even <= 6) * 100)
+    
+    def test_npv_percentiles_single_pass(self):
+        """Resumen y métricas obtienen todos los percentiles de NPV de una sola llamada"""
+        rng = np.random.default_rng(3)
+        npv = rng.normal(1000, 500, 2000)
+        calls = []
+        percentile = np.percentile
+        
+        def counting(*args, **kwargs):
+            calls.append(args[1])
+            return percentile(*args, **kwargs)
+        
+        with unittest.mock.patch.object(np, 'percentile', counting):
+            result = SimulationResult.from_arrays("P", npv, npv / 1000, np.full(2000, 6.0))
+            metrics = result.metrics
+        self.assertEqual(len(calls), 1)
+        self.assertAlmostEqual(result.percentile_5, np.percentile(npv, 5))
+        self.assertAlmostEqual(metrics['percentil_90'], np.percentile(npv, 90))
+        self.assertAlmostEqual(metrics['var_999'], np.percentile(npv, 0.1))
+    
+    def test_metrics_are_memoized(self):
+        """Prueba que las métricas se memorizan y se invalidan al extender el resultado"""
+        result = self.engine.simulate_scenario(self.test_scenario)
+        metrics = result.metrics
+        self.assertIs(result.metrics, metrics)
+        
+        extra = self.engine.simulate_scenario(self.test_scenario)
+        result.extend(extra.net_present_values, extra.roi_values, extra.break_even_months)
+        self.assertIsNot(result.metrics, metrics)
+        self.assertEqual(len(result.net_present_values), 2000)
+        self.assertAlmostEqual(result.metrics['media_npv'], np.mean(result.net_present_values))
+    
+    def test_result_compact_layout_and_pickle(self):
+        """Prueba el bloque contiguo de trayectorias, la vista de solo lectura y el pickle"""
+        result = self.engine.simulate_scenario(self.test_scenario)
+        self.assertEqual(result.paths.shape, (5, 1000))
+        self.assertTrue(np.shares_memory(result.net_present_values, result.paths))
+        self.assertFalse(hasattr(result, '__dict__'))
+        
+        view = result.readonly_view()
+        self.assertTrue(np.shares_memory(view.paths, result.paths))
+        with self.assertRaises(ValueError):
+            view.net_present_values[0] = 0
+        
+        metrics = result.metrics
+        restored = pickle.loads(pickle.dumps(result, protocol=5))
+        np.testing.assert_array_equal(restored.paths, result.paths)
+        self.assertEqual(restored.metrics, metrics)
+        self.assertEqual(restored.mean_npv, result.mean_npv)
+    
+    def test_bootstrap_confidence_intervals(self):
+        """Prueba que los intervalos bootstrap contienen la estimación puntual"""
+        result = self.engine.simulate_scenario(self.test_scenario)
+        intervals = StatisticsCalculator.bootstrap_confidence_intervals(result, n_resamples=200, seed=0)
+        
+        for name in ('media_npv', 'probabilidad_exito', 'var_95', 'mediana', 'prob_break_even_12m'):
+            interval = intervals[name]
+            self.assertLessEqual(interval['inferior'], interval['estimacion'])
+            self.assertGreaterEqual(interval['superior'], interval['estimacion'])
+        self.assertGreater(intervals['media_npv']['error_std'], 0)
+    
+    def test_bootstrap_follows_post_stratification(self):
+        """Con estratos el bootstrap remuestrea dentro de ellos y acompaña al estimador mostrado"""
+        engine = MonteCarloEngine(n_simulations=4000, use_database=False, seed=1, sampling='stratified')
+        result = engine.simulate_scenario(self.test_scenario)
+        self.assertEqual(len(result.strata), 4000)
+        stratified = StatisticsCalculator.bootstrap_confidence_intervals(result, n_resamples=200, seed=0)
+        self.assertEqual(stratified['media_npv']['estimador'], 'postestratificado')
+        self.assertEqual(stratified['media_npv']['estimacion'], result.mean_npv)
+        self.assertLessEqual(stratified['media_npv']['inferior'], result.mean_npv)
+        self.assertGreaterEqual(stratified['media_npv']['superior'], result.mean_npv)
+        
+        # Sin estratos (p. ej. un resultado restaurado) el intervalo es el de la media simple
+        plain = SimulationResult.from_paths(result.scenario_name, result.paths, result.summary)
+        simple = StatisticsCalculator.bootstrap_confidence_intervals(plain, n_resamples=200, seed=0)
+        self.assertEqual(simple['media_npv']['estimador'], 'media simple')
+        self.assertAlmostEqual(simple['media_npv']['estimacion'], np.mean(result.net_present_values))
+        # La estratificación reduce la varianza del estimador
+        self.assertLess(stratified['media_npv']['error_std'], simple['media_npv']['error_std'])
+        np.testing.assert_array_equal(pickle.loads(pickle.dumps(result)).strata, result.strata)
+    
+    def test_path_ranges_are_regenerated_independently(self):
+        """Prueba que cualquier rango de trayectorias se regenera sin simular los anteriores"""
+        engine = MonteCarloEngine(n_simulations=10000, use_database=False, seed=3)
+        full = engine.simulate_scenario(self.test_scenario)
+        
+        # Rango que cruza un límite de bloque y una única trayectoria
+        start, stop = engine.PATH_BLOCK_SIZE - 100, engine.PATH_BLOCK_SIZE + 500
+        np.testing.assert_array_equal(engine.simulate_path_range(self.test_scenario, start, stop),
+                                      full.paths[:, start:stop])
+        np.testing.assert_array_equal(engine.simulate_path_range(self.test_scenario, 9999, 10000),
+                                      full.paths[:, 9999:])
+        
+        # Los flujos regenerados reproducen el NPV de la trayectoria
+        cash_flows = engine.path_cash_flows(self.test_scenario, 42, 43)[0]
+        npv = cash_flows @ (1.1 ** (-np.arange(12) / 12)) - self.test_scenario.initial_investment
+        self.assertAlmostEqual(npv, full.net_present_values[42])
+        
+        # Otra semilla, otras trayectorias; la misma semilla, el mismo resultado
+        other = MonteCarloEngine(n_simulations=10000, use_database=False, seed=4).simulate_scenario(self.test_scenario)
+        self.assertFalse(np.array_equal(other.net_present_values, full.net_present_values))
+        np.testing.assert_array_equal(engine.simulate_scenario(self.test_scenario).paths, full.paths)
+    
+    def test_irr_and_discounted_payback(self):
+        """Prueba la TIR vectorizada contra las raíces del polinomio y el payback descontado"""
+        rng = np.random.default_rng(0)
+        cash_flows = rng.normal(7000, 3000, (200, 24))
+        rates, converged = FinancialCalculator.irr(cash_flows, 100000)
+        self.assertTrue(converged.all())
+        
+        # La TIR anula el NPV descontado con (1 + r) ** (t / 12)
+        factors = (1 + rates[:, None]) ** (-np.arange(24) / 12)
+        np.testing.assert_allclose((cash_flows * factors).sum(axis=1), 100000, rtol=1e-8)
+        
+        # Sin raíz (flujos negativos): NaN y no convergida
+        rates, converged = FinancialCalculator.irr(np.full((1, 12), -5000.0), 100000)
+        self.assertTrue(np.isnan(rates[0]) and not converged[0])
+        
+        payback = FinancialCalculator.discounted_payback(np.full((2, 12), [[10000.0], [1000.0]]), 50000, 0.10)
+        self.assertEqual(payback[0], 6)
+        self.assertTrue(np.isnan(payback[1]))
+    
+    def test_engine_irr_metrics(self):
+        """Prueba que el motor expone TIR y payback descontado en el resultado y las métricas"""
+        result = self.engine.simulate_scenario(self.test_scenario)
+        metrics = result.metrics
+        
+        self.assertEqual(len(result.irr_values), 1000)
+        self.assertAlmostEqual(metrics['tir_mediana'], np.nanmedian(result.irr_values))
+        self.assertAlmostEqual(metrics['payback_descontado_mediano'], np.nanmedian(result.discounted_payback_months))
+        # El payback descontado nunca llega antes que el break-even sin descontar
+        recovered = np.isfinite(result.discounted_payback_months)
+        self.assertTrue(np.all(result.discounted_payback_months[recovered] >= result.break_even_months[recovered]))
+        
+        # La tasa de descuento es configurable: una tasa mayor reduce el NPV
+        self.assertLess(MonteCarloEngine(n_simulations=1000, use_database=False, discount_rate=0.5)
+                        .simulate_scenario(self.test_scenario).mean_npv, result.mean_npv)
+    
+    def test_importance_sampling_tail_risk(self):
+        """Prueba que el muestreo por importancia estima la cola extrema con pocas trayectorias"""
+        engine = MonteCarloEngine(n_simulations=5000, use_database=False, seed=3)
+        tail = engine.estimate_tail_risk(self.test_scenario)
+        
+        # Referencia: muestreo simple con muchas más trayectorias
+        reference = MonteCarloEngine(n_simulations=400000, use_database=False, seed=11)
+        result = reference.simulate_scenario(self.test_scenario)
+        metrics = result.metrics
+        scale = result.std_npv
+        for suffix in ('995', '999'):
+            self.assertAlmostEqual(tail[f'var_{suffix}'], metrics[f'var_{suffix}'], delta=0.1 * scale)
+            self.assertAlmostEqual(tail[f'cvar_{suffix}'], metrics[f'cvar_{suffix}'], delta=0.1 * scale)
+            self.assertLessEqual(tail[f'cvar_{suffix}'], tail[f'var_{suffix}'])
+            # La mayoría de las trayectorias cae en la cola (por muestreo simple serían ~5-25)
+            self.assertGreater(tail[f'ess_cola_{suffix}'], 200)
+        self.assertLess(tail['tilt']['revenue'], 0)
+        
+        # Con pesos unitarios coincide con el percentil ordinario
+        values = np.arange(1000.0)
+        plain = StatisticsCalculator.weighted_tail_risk(values, np.ones(1000), {'99': 0.99})
+        self.assertEqual(plain['var_99'], 9.0)
+        self.assertEqual(plain['ess'], 1000)
+    
+    def test_stratified_and_lhs_sampling(self):
+        """Prueba que el muestreo estratificado y LHS reducen el error de los estimadores"""
+        engine = MonteCarloEngine(n_simulations=4096, use_database=False, seed=5)
+        normals = engine._block_normals(0, 12, 'stratified')
+        sums = normals.sum(axis=-1) / np.sqrt(12)
+        # Cada estrato de la suma mensual de cada factor recibe la misma cantidad de trayectorias
+        for factor_sums in sums:
+            counts = np.bincount((stats.norm.cdf(factor_sums) * engine.STRATA).astype(int), minlength=engine.STRATA)
+            self.assertTrue(np.all(counts == 4096 // engine.STRATA))
+        lhs = engine._block_normals(0, 12, 'lhs')
+        self.assertTrue(np.all(np.sort((stats.norm.cdf(lhs[0, :, 0]) * 4096).astype(int)) == np.arange(4096)))
+        
+        with self.assertRaises(ValueError):
+            engine.simulate_scenario(self.test_scenario, sampling='sobol')
+        
+        reference = MonteCarloEngine(n_simulations=400000, use_database=False, seed=11).simulate_scenario(self.test_scenario)
+        errors = {}
+        for sampling in ('random', 'stratified', 'lhs'):
+            means = [MonteCarloEngine(n_simulations=5000, use_database=False, seed=seed, sampling=sampling)
+                     .simulate_scenario(self.test_scenario).mean_npv for seed in range(8)]
+            errors[sampling] = np.sqrt(np.mean((np.array(means) - reference.mean_npv) ** 2))
+        self.assertLess(errors['stratified'], errors['random'] / 2)
+        self.assertLess(errors['lhs'], errors['random'] / 2)
+        
+        # Los rangos de trayectorias siguen siendo regenerables con el muestreo del motor
+        stratified = MonteCarloEngine(n_simulations=5000, use_database=False, seed=2, sampling='stratified')
+        result = stratified.simulate_scenario(self.test_scenario)
+        np.testing.assert_array_equal(stratified.simulate_path_range(self.test_scenario, 4500, 5000),
+                                      result.paths[:, 4500:])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
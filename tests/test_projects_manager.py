@@ -0,0 +1,95 @@
+import unittest
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dash
+from dash import html
+
+from src.ui.projects_manager import ProjectsManager
+
+class FakeAuth:
+    """AuthManager en memoria con 120 proyectos y simulaciones paginados por cursor"""
+
+    def __init__(self):
+        self.rows = [{'id': i, 'name': f'Elemento {i}', 'created_at': f'2024-01-01T00:{i // 60:02d}:{i % 60:02d}'}
+                     for i in range(120, 0, -1)]
+        self.detail_requests = []
+
+    def _page(self, query, limit, cursor):
+        rows = [row for row in self.rows if query in row['name']]
+        if cursor:
+            rows = [row for row in rows if row['id'] < cursor[1]]
+        page = rows[:limit]
+        return page, ([page[-1]['created_at'], page[-1]['id']] if len(rows) > limit else None)
+
+    def search_projects_page(self, user_id, query, limit=50, cursor=None):
+        return self._page(query, limit, cursor)
+
+    def search_simulations_page(self, user_id, query, limit=50, cursor=None):
+        return self._page(query, limit, cursor)
+
+    def get_simulation_detail(self, simulation_id, user_id):
+        self.detail_requests.append((simulation_id, user_id))
+        return {'name': f'Elemento {simulation_id}', 'project_name': 'P', 'params': {'n': 1}, 'results': {}}
+
+def payload(outputs, inputs, state):
+    return {
+        'output': '..' + '...'.join(f'{i}.{p}' for i, p in outputs) + '..' if len(outputs) > 1 else '.'.join(outputs[0]),
+        'outputs': [{'id': i, 'property': p} for i, p in outputs] if len(outputs) > 1
+                   else {'id': outputs[0][0], 'property': outputs[0][1]},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+        'changedPropIds': [f'{i}.{p}' for i, p, _ in inputs],
+    }
+
+class TestProjectsCallbacks(unittest.TestCase):
+    """Callbacks de 'Cargar más' y del detalle de simulaciones"""
+
+    def setUp(self):
+        self.auth = FakeAuth()
+        self.manager = ProjectsManager(self.auth)
+        app = dash.Dash(__name__, suppress_callback_exceptions=True)
+        app.layout = html.Div()
+        self.manager.register_callbacks(app, lambda data: (data or {}).get('user'))
+        self.client = app.server.test_client()
+        self.session = {'session_id': 'x', 'user': {'id': 7}}
+
+    def load_more(self, prefix, search_input, rows, cursor):
+        body = payload([(f'{prefix}-table', 'data'), (f'{prefix}-next-cursor', 'data'),
+                        (f'{prefix}-load-more-btn', 'style')],
+                       [(f'{prefix}-load-more-btn', 'n_clicks', 1)],
+                       [(f'{prefix}-next-cursor', 'data', cursor), (f'{prefix}-table', 'data', rows),
+                        (search_input, 'value', ''), ('session-store', 'data', self.session)])
+        response = self.client.post('/_dash-update-component', json=body)
+        self.assertEqual(response.status_code, 200)
+        outputs = json.loads(response.data)['response']
+        return (outputs[f'{prefix}-table']['data'], outputs[f'{prefix}-next-cursor']['data'],
+                outputs[f'{prefix}-load-more-btn']['style'])
+
+    def test_load_more_appends_pages(self):
+        """Cada clic añade la siguiente página hasta ocultar el botón"""
+        for prefix, search_input in (('projects', 'project-search-input'),
+                                     ('simulations', 'simulation-search-input')):
+            rows, cursor = self.auth.search_projects_page(7, '', ProjectsManager.PAGE_SIZE)
+            rows, cursor, style = self.load_more(prefix, search_input, rows, cursor)
+            self.assertEqual(len(rows), 100)
+            self.assertEqual(style['display'], 'inline-block')
+            rows, cursor, style = self.load_more(prefix, search_input, rows, cursor)
+            self.assertEqual([row['id'] for row in rows], list(range(120, 0, -1)))
+            self.assertIsNone(cursor)
+            self.assertEqual(style['display'], 'none')
+
+    def test_selection_opens_detail(self):
+        """Seleccionar una fila carga el detalle de esa simulación para el usuario"""
+        rows, _ = self.auth.search_simulations_page(7, '', ProjectsManager.PAGE_SIZE)
+        body = payload([('simulation-detail', 'children')], [('simulations-table', 'selected_rows', [2])],
+                       [('simulations-table', 'data', rows), ('session-store', 'data', self.session)])
+        response = self.client.post('/_dash-update-component', json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.auth.detail_requests, [(118, 7)])
+        self.assertIn('Elemento 118', response.get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
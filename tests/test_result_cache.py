@@ -0,0 +1,41 @@
+import unittest
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import SimulationResult
+from src.ui.result_cache import SessionResultCache
+
+class TestSessionResultCache(unittest.TestCase):
+    """Pruebas de la caché de resultados por sesión"""
+
+    def make_result(self, n):
+        return SimulationResult.from_arrays("Cache", np.arange(n, dtype=float), np.ones(n), np.ones(n))
+
+    def test_get_or_compute_runs_once_per_session(self):
+        """El cálculo solo se ejecuta la primera vez para cada sesión"""
+        cache = SessionResultCache()
+        calls = []
+        compute = lambda: calls.append(1) or self.make_result(10)
+
+        first = cache.get_or_compute('s1', 'key', compute)
+        self.assertIs(cache.get_or_compute('s1', 'key', compute), first)
+        cache.get_or_compute('s2', 'key', compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_ttl_and_size_eviction(self):
+        """Las entradas caducan por TTL y se expulsan las menos usadas al superar el tamaño"""
+        cache = SessionResultCache(ttl_seconds=-1)
+        cache.put('s1', 'key', 'value')
+        self.assertIsNone(cache.get('s1', 'key'))
+
+        cache = SessionResultCache(max_bytes=100_000)
+        cache.put('s1', 'old', self.make_result(2000))
+        cache.put('s1', 'new', self.make_result(2000))
+        self.assertIsNone(cache.get('s1', 'old'))
+        self.assertIsNotNone(cache.get('s1', 'new'))
+        self.assertLessEqual(cache.total_bytes, 100_000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario, SimulationResult
+from src.database.result_store import LocalResultStore
+
+class TestLocalResultStore(unittest.TestCase):
+    """Pruebas del almacén local de resultados mapeado en memoria"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = LocalResultStore(root=self.tmpdir.name)
+        self.scenario = BusinessScenario(
+            name="Store Scenario",
+            initial_investment=50000,
+            revenue_mean=15000,
+            revenue_std=3000,
+            cost_mean=8000,
+            cost_std=1500
+        )
+        self.result = self.make_result(1000)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_result(self, n):
+        rng = np.random.default_rng(0)
+        npv = rng.normal(1000, 500, n)
+        return SimulationResult(
+            scenario_name="Store Scenario",
+            net_present_values=npv,
+            roi_values=rng.normal(10, 5, n),
+            break_even_months=rng.integers(1, 13, n).astype(float),
+            success_probability=float(np.mean(npv > 0) * 100),
+            mean_npv=float(np.mean(npv)),
+            std_npv=float(np.std(npv)),
+            percentile_5=float(np.percentile(npv, 5)),
+            percentile_95=float(np.percentile(npv, 95)),
+            var_95=float(np.percentile(npv, 5))
+        )
+
+    def test_roundtrip_is_readonly_memmap(self):
+        """Los arrays se reabren como vistas de solo lectura idénticas a las originales"""
+        scenario_hash = LocalResultStore.scenario_hash(self.scenario)
+        run_id = self.store.save(scenario_hash, self.result)
+        loaded = self.store.load(scenario_hash, run_id)
+
+        np.testing.assert_array_equal(loaded.net_present_values, self.result.net_present_values)
+        np.testing.assert_array_equal(loaded.break_even_months, self.result.break_even_months)
+        self.assertIsInstance(loaded.roi_values, np.memmap)
+        self.assertFalse(loaded.roi_values.flags.writeable)
+        self.assertEqual(loaded.mean_npv, self.result.mean_npv)
+
+        roi = self.store.open_array(scenario_hash, 'roi_values', run_id)
+        np.testing.assert_array_equal(roi, self.result.roi_values)
+
+    def test_size_cap_evicts_oldest(self):
+        """Al superar el tamaño máximo se eliminan las ejecuciones más antiguas"""
+        store = LocalResultStore(root=self.tmpdir.name, max_bytes=60000)
+        first = store.save('a', self.result)
+        store.save('b', self.result)
+        store.save('c', self.result)
+
+        self.assertLessEqual(store.total_bytes(), 60000)
+        self.assertIsNone(store.load('a', first))
+        self.assertIsNotNone(store.load('c'))
+
+    def test_stores_sharing_a_directory_merge_their_runs(self):
+        """Dos procesos (dos instancias) sobre el mismo directorio no se pisan el índice"""
+        other = LocalResultStore(root=self.tmpdir.name)
+        first = self.store.save('a', self.result)
+        second = other.save('b', self.result)
+        third = self.store.save('c', self.result)
+
+        for store in (self.store, other):
+            self.assertEqual({run['run_id'] for run in store.list_runs()}, {first, second, third})
+        self.assertIsNotNone(self.store.load('b', second))
+        self.assertTrue(other.delete('a', first))
+        self.assertIsNone(self.store.load('a', first))
+
+    def test_run_larger_than_cap_is_rejected(self):
+        """Una ejecución que no cabe sola en max_bytes se rechaza sin vaciar el almacén"""
+        store = LocalResultStore(root=self.tmpdir.name, max_bytes=60000)
+        kept = store.save('a', self.result)
+        with self.assertRaises(ValueError):
+            store.save('b', self.make_result(2000))
+        self.assertEqual([run['run_id'] for run in store.list_runs()], [kept])
+        self.assertEqual(sorted(f for f in os.listdir(self.tmpdir.name) if f.endswith('.npy')), [f'a_{kept}.npy'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import unittest
+import threading
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from flask import Flask
+
+from src.simulation.scheduler import AdmissionRejected, JobTooLarge, SimulationScheduler, client_identity
+from src.utils.statistics import StatisticsCalculator
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Condición no alcanzada")
+        time.sleep(0.005)
+
+class TestScheduler(unittest.TestCase):
+    """Pruebas del control de admisión y la cola justa de simulaciones"""
+
+    def start_job(self, scheduler, user, n_paths, priority='interactive', hold=None, order=None):
+        """Lanza un trabajo en otro hilo; `hold` lo mantiene ocupando su hueco"""
+        def run():
+            with scheduler.slot(user, priority, n_paths, 12):
+                if order is not None:
+                    order.append(user)
+                if hold is not None:
+                    hold.wait(5)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_concurrency_limit(self):
+        """Nunca hay más de max_concurrent trabajos en ejecución"""
+        scheduler = SimulationScheduler(max_concurrent=2)
+        peak, lock = [0], threading.Lock()
+
+        def run(user):
+            with scheduler.slot(user, 'interactive', 1000):
+                with lock:
+                    peak[0] = max(peak[0], scheduler.running)
+                time.sleep(0.02)
+
+        threads = [threading.Thread(target=run, args=(f'u{i}',)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(scheduler.stats['admitted'], 8)
+        self.assertEqual(scheduler.running, 0)
+
+    def test_small_jobs_are_not_starved_by_sweep(self):
+        """El clic de 5k trayectorias adelanta a los pasos pendientes de un barrido grande"""
+        scheduler = SimulationScheduler(max_concurrent=1, max_running_per_user=1)
+        hold, order = threading.Event(), []
+        threads = [self.start_job(scheduler, 'bloqueo', 1000, hold=hold)]
+        wait_until(lambda: scheduler.running == 1)
+        for step in range(4):
+            threads.append(self.start_job(scheduler, 'barrido', 1_000_000, order=order))
+            wait_until(lambda: scheduler.queue_depth() == step + 1)
+        threads.append(self.start_job(scheduler, 'clic', 5000, order=order))
+        wait_until(lambda: scheduler.queue_depth() == 5)
+
+        hold.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order[0], 'clic')
+        self.assertEqual(order.count('barrido'), 4)
+
+    def test_interactive_slot_is_reserved(self):
+        """Los trabajos 'batch' dejan libre el hueco reservado a los interactivos"""
+        scheduler = SimulationScheduler(max_concurrent=2, interactive_reserved=1)
+        hold = threading.Event()
+        threads = [self.start_job(scheduler, 'a', 1000, 'batch', hold=hold),
+                   self.start_job(scheduler, 'b', 1000, 'batch', hold=hold)]
+        wait_until(lambda: scheduler.running == 1 and scheduler.queue_depth() == 1)
+
+        threads.append(self.start_job(scheduler, 'c', 1000, 'interactive', hold=hold))
+        wait_until(lambda: scheduler.running == 2)
+        self.assertEqual(scheduler.queue_depth(), 1)
+        hold.set()
+        for thread in threads:
+            thread.join()
+
+    def test_rejections(self):
+        """Trabajos demasiado grandes, colas llenas y esperas agotadas se rechazan con un error claro"""
+        scheduler = SimulationScheduler(max_concurrent=1, max_queued_per_user=1, max_job_paths=100_000)
+        with self.assertRaises(JobTooLarge):
+            with scheduler.slot('u', 'batch', 200_000):
+                pass
+
+        hold = threading.Event()
+        blocker = self.start_job(scheduler, 'bloqueo', 1000, hold=hold)
+        wait_until(lambda: scheduler.running == 1)
+        waiting = self.start_job(scheduler, 'u', 1000)
+        wait_until(lambda: scheduler.queue_depth() == 1)
+        with self.assertRaises(AdmissionRejected):
+            with scheduler.slot('u', 'interactive', 1000):
+                pass
+        with self.assertRaises(AdmissionRejected):
+            with scheduler.slot('v', 'interactive', 1000, timeout=0.05):
+                pass
+        self.assertEqual(scheduler.queue_depth(), 1)
+
+        hold.set()
+        blocker.join()
+        waiting.join()
+        self.assertEqual(scheduler.stats, {'admitted': 2, 'rejected': 2, 'timed_out': 1})
+
+    def test_scheduled_engine(self):
+        """Un barrido con el motor planificado ejecuta cada paso como trabajo propio"""
+        scheduler = SimulationScheduler(max_concurrent=2)
+        engine = MonteCarloEngine(n_simulations=500, use_database=False)
+        scenario = BusinessScenario("Planificado", 50000, 15000, 3000, 8000, 1500)
+        scheduled = scheduler.bind(engine, user='analista', priority='batch')
+
+        results = StatisticsCalculator.sensitivity_analysis(scenario, scheduled, {'revenue_mean': (10000, 20000, 3)})
+        self.assertEqual(len(results['revenue_mean']['npv_means']), 3)
+        self.assertEqual(scheduler.stats['admitted'], 3)
+        self.assertEqual(scheduled.simulate_scenario(scenario).mean_npv, engine.simulate_scenario(scenario).mean_npv)
+
+        # Con on_budget='refuse' se rechaza antes de entrar en la cola, como un rechazo de admisión
+        refusing = MonteCarloEngine(n_simulations=500000, use_database=False, memory_budget=1024 ** 2,
+                                    on_budget='refuse')
+        with self.assertRaises(JobTooLarge) as rejected:
+            scheduler.bind(refusing, user='analista').simulate_scenario(scenario)
+        self.assertIn('memoria', rejected.exception.reason)
+        self.assertEqual(scheduler.stats['admitted'], 4)
+
+    def test_sweeps_run_as_batch(self):
+        """Los barridos ceden el turno a los clics, también con workers de ParallelSimulator"""
+        scheduler = SimulationScheduler(max_concurrent=2)
+        acquired = []
+        acquire = scheduler.acquire
+        scheduler.acquire = lambda user, priority, *args: acquired.append((user, priority)) or acquire(user, priority, *args)
+        engine = MonteCarloEngine(n_simulations=500, use_database=False)
+        scenario = BusinessScenario("Barrido", 50000, 15000, 3000, 8000, 1500)
+        scheduled = scheduler.bind(engine, user='analista')
+
+        for n_jobs in (1, 2):
+            StatisticsCalculator.sensitivity_analysis(scenario, scheduled, {'revenue_mean': (10000, 20000, 3)},
+                                                      n_jobs=n_jobs)
+        self.assertEqual(acquired, [('analista', 'batch')] * 6)
+        self.assertEqual(scheduler.stats['admitted'], 6)
+        self.assertEqual(scheduler.running, 0)
+
+    def test_client_identity(self):
+        """Las cuotas se asignan al usuario autenticado o, si no lo hay, a la dirección remota"""
+        self.assertEqual(client_identity({'id': 7, 'username': 'ana'}), 'user:7')
+        self.assertEqual(client_identity(None), 'anonymous')
+        with Flask(__name__).test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.5'}):
+            self.assertEqual(client_identity(None), 'ip:10.0.0.5')
+            self.assertEqual(client_identity({'id': 3}), 'user:3')
+
+if __name__ == '__main__':
+    unittest.main()
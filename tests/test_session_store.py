@@ -0,0 +1,162 @@
+import unittest
+import tempfile
+import time
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from src.auth.auth_manager import AuthManager
+from src.auth.session_store import MemorySessionStore, PostgresSessionStore, SQLiteSessionStore
+from src.ui.dashboard import DecisionDashboard
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from local_db import LocalDB
+
+class FakeConnection:
+    """Conexión psycopg2 mínima que registra si se cerró"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            rowcount = 1
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def execute(self, sql, params=()):
+                pass
+
+            def fetchone(self):
+                return connection.rows.pop(0) if connection.rows else None
+
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+class FakeDB:
+    def __init__(self):
+        self.connections = []
+
+    def get_connection(self):
+        self.connections.append(FakeConnection([({'id': 1},)]))
+        return self.connections[-1]
+
+def login_payload(username, password):
+    return {'output': 'session-store.data', 'outputs': {'id': 'session-store', 'property': 'data'},
+            'inputs': [{'id': 'login-btn', 'property': 'n_clicks', 'value': 1}],
+            'state': [{'id': 'username', 'property': 'value', 'value': username},
+                      {'id': 'password', 'property': 'value', 'value': password}],
+            'changedPropIds': ['login-btn.n_clicks']}
+
+class TestSessionStores(unittest.TestCase):
+    """Pruebas de los almacenes de sesiones con TTL deslizante"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def stores(self, ttl_seconds):
+        return [MemorySessionStore(ttl_seconds=ttl_seconds),
+                SQLiteSessionStore(os.path.join(self.tmpdir.name, f'sessions_{ttl_seconds}.db'), ttl_seconds=ttl_seconds)]
+
+    def test_set_get_delete(self):
+        """Las sesiones se guardan, se leen y se eliminan en cada backend"""
+        for store in self.stores(60):
+            store.set('abc', {'id': 1, 'username': 'admin'})
+            self.assertEqual(store.get('abc')['username'], 'admin')
+            self.assertTrue(store.delete('abc'))
+            self.assertIsNone(store.get('abc'))
+
+    def test_expiration_and_reaper(self):
+        """Las sesiones caducadas no se devuelven y reap() las elimina"""
+        for store in self.stores(0.05):
+            store.set('old', {'id': 1})
+            time.sleep(0.1)
+            store.set('new', {'id': 2})
+            self.assertEqual(store.reap(), 1)
+            self.assertIsNone(store.get('old'))
+            self.assertEqual(store.get('new')['id'], 2)
+
+    def test_memory_store_lru_cap(self):
+        """El almacén en memoria descarta la sesión menos usada al superar el límite"""
+        store = MemorySessionStore(max_sessions=2)
+        store.set('a', {'id': 1})
+        store.set('b', {'id': 2})
+        store.get('a')
+        store.set('c', {'id': 3})
+        self.assertIsNone(store.get('b'))
+        self.assertIsNotNone(store.get('a'))
+
+    def test_postgres_store_closes_connections(self):
+        """Cada operación del almacén Postgres cierra la conexión que abre"""
+        db = FakeDB()
+        store = PostgresSessionStore(db)
+        store.set('abc', {'id': 1})
+        self.assertEqual(store.get('abc'), {'id': 1})
+        store.delete('abc')
+        store.reap()
+        self.assertEqual(len(db.connections), 5)
+        self.assertTrue(all(connection.closed for connection in db.connections))
+
+    def test_session_store_failure_keeps_authentication(self):
+        """Si el almacén configurado falla, AuthManager sigue autenticando con sesiones en memoria"""
+        db = LocalDB()
+        os.environ['SESSION_BACKEND'] = 'desconocido'
+        try:
+            auth = AuthManager(db=db)
+        finally:
+            del os.environ['SESSION_BACKEND']
+            db.close()
+        self.assertIsNotNone(auth.db)
+        self.assertIsInstance(auth.sessions, MemorySessionStore)
+
+    def test_dashboards_share_sessions_across_workers(self):
+        """Un login en un worker es válido en otro y el logout lo invalida en ambos"""
+        db = LocalDB()
+        path = os.path.join(self.tmpdir.name, 'shared.db')
+        try:
+            workers = [DecisionDashboard(auth_manager=AuthManager(db=db, session_store=SQLiteSessionStore(path)))
+                       for _ in range(2)]
+            clients = [worker.app.server.test_client() for worker in workers]
+            response = clients[0].post('/_dash-update-component', json=login_payload('admin', 'admin123'))
+            session_data = json.loads(response.data)['response']['session-store']['data']
+            self.assertEqual(set(session_data), {'session_id'})
+
+            self.assertEqual(workers[1].session_user(session_data)['username'], 'admin')
+            self.assertIsNone(workers[1].session_user({'session_id': 'falso', 'user': {'id': 1}}))
+
+            # Salida duplicada de Dash: 'session-store.data@<hash>'
+            logout_output = next(k for k in workers[1].app.callback_map if k.startswith('session-store.data@'))
+            logout = {'output': logout_output, 'outputs': {'id': 'session-store', 'property': 'data'},
+                      'inputs': [{'id': 'menu-dropdown', 'property': 'value', 'value': 'logout'}],
+                      'state': [{'id': 'session-store', 'property': 'data', 'value': session_data}],
+                      'changedPropIds': ['menu-dropdown.value']}
+            self.assertEqual(clients[1].post('/_dash-update-component', json=logout).status_code, 200)
+            self.assertIsNone(workers[0].session_user(session_data))
+        finally:
+            db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from multiprocessing import shared_memory
+import numpy as np
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.simulation.shared_results import ParallelSimulator, SharedPathsBlock
+from src.utils.memory_profile import MemoryBudgetExceeded
+from src.utils.statistics import StatisticsCalculator
+
+class TestSharedResults(unittest.TestCase):
+    """Pruebas del transporte de resultados por memoria compartida"""
+
+    def setUp(self):
+        self.scenarios = [BusinessScenario(f"Escenario {i}", 50000, 15000, 3000, 8000, 1500, time_horizon=12 + i)
+                          for i in range(3)]
+
+    def test_parallel_results_wrap_shared_memory(self):
+        """Los resultados envuelven el segmento compartido y se liberan al salir del with"""
+        results = ParallelSimulator(n_workers=2, n_simulations=2000, seed=0).simulate_scenarios(self.scenarios)
+
+        self.assertEqual([r.scenario_name for r in results], [s.name for s in self.scenarios])
+        for result in results:
+            self.assertEqual(result.paths.shape, (5, 2000))
+            self.assertAlmostEqual(result.mean_npv, np.mean(result.net_present_values))
+        # Misma semilla: mismas trayectorias que en un único proceso
+        serial = MonteCarloEngine(n_simulations=2000, use_database=False, seed=0).simulate_scenarios(self.scenarios)
+        np.testing.assert_array_equal(results[1].paths, serial[1].paths)
+
+        for result in results:
+            with result:
+                metrics = result.metrics
+            self.assertEqual(result.paths.shape, (5, 0))
+            self.assertIs(result.metrics, metrics)
+
+    def test_release_with_live_views(self):
+        """Liberar con vistas vivas elimina el nombre sin invalidar la vista"""
+        block = SharedPathsBlock(10)
+        result = block.to_result("Vista", None)
+        view = result.net_present_values
+        result.release()
+        result.release()
+        self.assertEqual(view.shape, (10,))
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=block.name)
+
+    def test_extend_detaches_from_shared_memory(self):
+        """Extender copia las trayectorias a un bloque propio y libera el segmento compartido"""
+        block = SharedPathsBlock(10)
+        block.array()[:] = 1.0
+        result = block.to_result("Extendido", None)
+        result.extend(np.full(5, 2.0), np.zeros(5), np.zeros(5))
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=block.name)
+        result.release()
+        self.assertEqual(result.paths.shape, (5, 15))
+        self.assertEqual(result.net_present_values.sum(), 20.0)
+
+    def test_parallel_sensitivity_analysis(self):
+        """El análisis de sensibilidad en paralelo reproduce la tendencia del secuencial"""
+        engine = MonteCarloEngine(n_simulations=2000, use_database=False)
+        analysis = StatisticsCalculator.sensitivity_analysis(self.scenarios[0], engine,
+                                                             {'revenue_mean': (10000, 20000, 3)}, n_jobs=2)
+        npv_means = analysis['revenue_mean']['npv_means']
+        self.assertEqual(len(npv_means), 3)
+        self.assertTrue(npv_means[0] < npv_means[1] < npv_means[2])
+
+    def test_parallel_workers_keep_engine_configuration(self):
+        """Los workers usan el muestreo del motor y respetan su presupuesto de memoria"""
+        scenarios = self.scenarios[:2]
+        results = ParallelSimulator(n_workers=2, n_simulations=2000, seed=0,
+                                    sampling='stratified').simulate_scenarios(scenarios)
+        serial = MonteCarloEngine(n_simulations=2000, use_database=False, seed=0,
+                                  sampling='stratified').simulate_scenarios(scenarios)
+        for parallel, expected in zip(results, serial):
+            np.testing.assert_array_equal(parallel.paths, expected.paths)
+            # Estimadores postestratificados, como en un único proceso
+            self.assertAlmostEqual(parallel.mean_npv, expected.mean_npv)
+            self.assertAlmostEqual(parallel.success_probability, expected.success_probability)
+            parallel.release()
+
+        budget = 16 * 1024 ** 2
+        refusing = ParallelSimulator(n_workers=2, n_simulations=200000, memory_budget=budget, on_budget='refuse')
+        with self.assertRaises(MemoryBudgetExceeded):
+            refusing.simulate_scenarios(scenarios)
+        bounded = ParallelSimulator(n_workers=2, n_simulations=200000, memory_budget=budget).simulate_scenarios(scenarios)
+        for result in bounded:
+            self.assertEqual(result.paths.shape, (5, MonteCarloEngine.BOUNDED_SAMPLE_PATHS))
+
+if __name__ == '__main__':
+    unittest.main()
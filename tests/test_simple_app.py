@@ -0,0 +1,49 @@
+import unittest
+import json
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ui.simple_app import SimpleApp
+
+def create_user(client, session_id, username):
+    """Pulsa 'crear usuario' desde la sesión del navegador `session_id`; retorna la versión"""
+    body = {
+        'output': 'users-data.data',
+        'outputs': {'id': 'users-data', 'property': 'data'},
+        'inputs': [{'id': 'create-user-btn', 'property': 'n_clicks', 'value': 1},
+                   {'id': 'save-user-btn', 'property': 'n_clicks', 'value': None},
+                   []],
+        'state': [{'id': 'new-username', 'property': 'value', 'value': username},
+                  {'id': 'new-email', 'property': 'value', 'value': f'{username}@example.com'},
+                  {'id': 'new-role', 'property': 'value', 'value': 'user'},
+                  {'id': 'edit-username', 'property': 'value', 'value': None},
+                  {'id': 'edit-email', 'property': 'value', 'value': None},
+                  {'id': 'edit-role', 'property': 'value', 'value': None},
+                  {'id': 'edit-user-id', 'property': 'data', 'value': None},
+                  {'id': 'session-id', 'property': 'data', 'value': session_id}],
+        'changedPropIds': ['create-user-btn.n_clicks'],
+    }
+    response = client.post('/_dash-update-component', json=body)
+    return json.loads(response.data)['response']['users-data']['data']
+
+class TestSimpleAppUsers(unittest.TestCase):
+    """Gestión de usuarios simulados de SimpleApp"""
+
+    def test_users_are_kept_per_session(self):
+        """Cada sesión del navegador modifica su propia lista de usuarios en el servidor"""
+        app = SimpleApp()
+        client = app.app.server.test_client()
+        self.assertEqual(create_user(client, 'sesion-a', 'ana'), 1)
+        self.assertEqual(create_user(client, 'sesion-a', 'luis'), 2)
+        self.assertEqual(create_user(client, 'sesion-b', 'eva'), 1)
+
+        names_a = [user['username'] for user in app.session_users('sesion-a')['users']]
+        names_b = [user['username'] for user in app.session_users('sesion-b')['users']]
+        self.assertEqual(names_a[-2:], ['ana', 'luis'])
+        self.assertEqual(names_b[-1:], ['eva'])
+        self.assertNotIn('ana', names_b)
+        self.assertEqual(len(app.session_users('sesion-c')['users']), len(SimpleApp.DEFAULT_USERS))
+
+if __name__ == '__main__':
+    unittest.main()
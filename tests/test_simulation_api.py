@@ -0,0 +1,159 @@
+import unittest
+import threading
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.api.simulation_service import SimulationService
+from src.api.routes import create_simulation_blueprint, register_simulation_api
+from src.simulation.scheduler import JobTooLarge, SimulationScheduler
+
+SCENARIO = {
+    'name': 'API',
+    'initial_investment': 100000,
+    'revenue_mean': 15000,
+    'revenue_std': 3000,
+    'cost_mean': 8000,
+    'cost_std': 1500,
+    'time_horizon': 24,
+}
+
+class TestSimulationAPI(unittest.TestCase):
+    """Pruebas del servicio de simulación y del endpoint JSON"""
+
+    def setUp(self):
+        self.engine = MonteCarloEngine(n_simulations=500, use_database=False)
+        self.service = SimulationService(self.engine, max_wait_ms=50)
+
+    def tearDown(self):
+        self.service.close()
+
+    def test_simulate_scenarios_matches_shapes(self):
+        """La ruta vectorizada agrupa horizontes distintos y respeta el orden de entrada"""
+        scenarios = [BusinessScenario(**SCENARIO), BusinessScenario(**dict(SCENARIO, name='B', time_horizon=12))]
+        results = self.engine.simulate_scenarios(scenarios)
+
+        self.assertEqual([r.scenario_name for r in results], ['API', 'B'])
+        for result in results:
+            self.assertEqual(result.paths.shape, (5, 500))
+            self.assertTrue(result.paths.flags.c_contiguous)
+        self.assertLessEqual(results[1].break_even_months.max(), 12)
+
+    def test_identical_requests_are_coalesced(self):
+        """Los duplicados concurrentes comparten el mismo cálculo"""
+        futures = []
+        threads = [threading.Thread(target=lambda: futures.append(self.service.submit(BusinessScenario(**SCENARIO))))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        results = {id(future.result(10)) for future in futures}
+        self.assertEqual(len(results), 1)
+        self.assertEqual(self.service.stats['computed'], 1)
+        self.assertEqual(self.service.stats['coalesced'], 7)
+
+    def test_small_requests_are_micro_batched(self):
+        """Escenarios distintos enviados a la vez se ejecutan en un mismo lote"""
+        scenarios = [BusinessScenario(**dict(SCENARIO, name=f'S{i}')) for i in range(5)]
+        results = self.service.simulate(scenarios, timeout=10)
+
+        self.assertEqual([r.scenario_name for r in results], [s.name for s in scenarios])
+        self.assertEqual(self.service.stats['batches'], 1)
+
+    def test_endpoint(self):
+        """POST /api/simulate devuelve resumen y métricas; los errores de entrada son 400"""
+        server = Flask(__name__)
+        register_simulation_api(server, self.service)
+        client = server.test_client()
+
+        response = client.post('/api/simulate', json={'scenarios': [SCENARIO, dict(SCENARIO, name='B')],
+                                                      'n_simulations': 200})
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['n_simulations'], 200)
+        self.assertIn('mean_npv', results[0]['summary'])
+        self.assertIn('var_95', results[0]['metrics'])
+
+        self.assertEqual(client.post('/api/simulate', json={'scenario': {'name': 'x'}}).status_code, 400)
+        self.assertEqual(client.post('/api/simulate', json={'scenario': SCENARIO,
+                                                            'n_simulations': 10 ** 9}).status_code, 400)
+
+    def test_batches_are_capped_by_paths(self):
+        """Un lote no supera max_batch_paths y uno inadmisible solo hace fallar la petición culpable"""
+        scheduler = SimulationScheduler(max_job_paths=1200)
+        service = SimulationService(self.engine, max_wait_ms=50, max_batch_paths=1000, scheduler=scheduler)
+        self.addCleanup(service.close)
+        scenarios = [BusinessScenario(**dict(SCENARIO, name=f'S{i}')) for i in range(5)]
+        service.simulate(scenarios, timeout=10)
+        self.assertEqual(service.stats['batches'], 3)
+
+        # 3 × 500 trayectorias superan max_job_paths juntas, pero no por separado
+        service = SimulationService(self.engine, max_wait_ms=50, scheduler=scheduler)
+        self.addCleanup(service.close)
+        futures = [service.submit(scenario, 500) for scenario in scenarios[:3]]
+        too_large = service.submit(scenarios[3], 2000)
+        self.assertEqual([f.result(10).paths.shape[1] for f in futures], [500] * 3)
+        with self.assertRaises(JobTooLarge):
+            too_large.result(10)
+
+    def test_batches_of_different_clients_run_concurrently(self):
+        """Los lotes de dos clientes se ejecutan a la vez, cada uno con su hueco del planificador"""
+        scheduler = SimulationScheduler(max_concurrent=2, interactive_reserved=0)
+        service = SimulationService(self.engine, max_wait_ms=1, scheduler=scheduler)
+        self.addCleanup(service.close)
+        both_running = threading.Barrier(2, timeout=5)
+        simulate_scenarios = self.engine.simulate_scenarios
+
+        def wait_for_other(*args, **kwargs):
+            both_running.wait()
+            return simulate_scenarios(*args, **kwargs)
+
+        self.engine.simulate_scenarios = wait_for_other
+        futures = [service.submit(BusinessScenario(**dict(SCENARIO, name=user)), user=user)
+                   for user in ('A', 'B')]
+        self.assertEqual([f.result(10).scenario_name for f in futures], ['A', 'B'])
+        self.assertEqual(service.stats['batches'], 2)
+
+    def test_endpoint_timeout_and_clients(self):
+        """Una simulación que no termina a tiempo es 503 con Retry-After; cada cliente tiene su turno"""
+        scheduler = SimulationScheduler(max_concurrent=1)
+        service = SimulationService(self.engine, max_wait_ms=1, scheduler=scheduler)
+        self.addCleanup(service.close)
+        users = []
+        acquire = scheduler.acquire
+        scheduler.acquire = lambda user, *args: users.append(user) or acquire(user, *args)
+        server = Flask(__name__)
+        server.register_blueprint(create_simulation_blueprint(service, timeout=0.2), url_prefix='/api')
+        client = server.test_client()
+
+        hold, held = threading.Event(), threading.Event()
+
+        def occupy():
+            with scheduler.slot('bloqueo'):
+                held.set()
+                hold.wait(10)
+
+        blocker = threading.Thread(target=occupy)
+        blocker.start()
+        held.wait(5)
+        response = client.post('/api/simulate', json={'scenario': SCENARIO},
+                               environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        hold.set()
+        blocker.join()
+
+        response = client.post('/api/simulate', json={'scenario': dict(SCENARIO, name='B')},
+                               environ_base={'REMOTE_ADDR': '10.0.0.2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(users[-2:], ['ip:10.0.0.1', 'ip:10.0.0.2'])
+
+if __name__ == '__main__':
+    unittest.main()
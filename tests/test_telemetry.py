@@ -0,0 +1,78 @@
+import unittest
+import json
+import tempfile
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.business_scenario import BusinessScenario
+from src.simulation.monte_carlo_engine import MonteCarloEngine
+from src.utils.telemetry import configure_telemetry, get_logger, shutdown_telemetry, span
+
+class CountingMessage:
+    """Objeto cuyo texto cuenta las veces que se formatea"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "mensaje"
+
+class TestTelemetry(unittest.TestCase):
+    """Pruebas del registro estructurado, los spans y el muestreo"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.export_path = os.path.join(self.tmpdir.name, 'telemetry.jsonl')
+        self.logger = get_logger('pruebas')
+
+    def tearDown(self):
+        shutdown_telemetry()
+        configure_telemetry()
+        self.tmpdir.cleanup()
+
+    def exported(self):
+        shutdown_telemetry()
+        with open(self.export_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_spans_nest_and_logs_carry_trace(self):
+        """Las etapas anidadas comparten traza y los registros llevan su span"""
+        configure_telemetry(level='CRITICAL', export_path=self.export_path, sample_rate=1.0)
+        engine = MonteCarloEngine(n_simulations=1000, use_database=False)
+        with span('request', user='ana') as request_span:
+            engine.simulate_scenario(BusinessScenario("Traza", 50000, 15000, 3000, 8000, 1500))
+            self.logger.info("Escenario %s listo", "Traza")
+
+        entries = self.exported()
+        spans = {entry['span']: entry for entry in entries if entry['type'] == 'span'}
+        self.assertEqual(spans['simulate']['parent_id'], request_span.span_id)
+        self.assertEqual(spans['simulate']['trace_id'], request_span.trace_id)
+        self.assertEqual(spans['simulate']['attributes']['n_simulations'], 1000)
+        self.assertGreaterEqual(spans['request']['duration_ms'], spans['simulate']['duration_ms'])
+        log = next(entry for entry in entries if entry['type'] == 'log')
+        self.assertEqual(log['message'], "Escenario Traza listo")
+        self.assertEqual(log['span_id'], request_span.span_id)
+
+    def test_unsampled_traces_and_disabled_levels_cost_nothing(self):
+        """Sin muestreo no se exportan spans ni detalle; los niveles deshabilitados no se formatean"""
+        configure_telemetry(level='CRITICAL', export_path=self.export_path, sample_rate=0.0,
+                            high_volume_sample_rate=0.0)
+        with span('request'):
+            self.logger.info("detalle")
+            self.logger.warning("aviso")
+        with self.assertRaises(ValueError):
+            with span('fallo', high_volume=True):
+                raise ValueError("x")
+        entries = self.exported()
+        self.assertEqual([entry['message'] for entry in entries], ["aviso"])
+
+        configure_telemetry(level='WARNING')
+        message = CountingMessage()
+        self.logger.info("%s", message)
+        self.logger.debug("%s", message)
+        self.assertEqual(message.formatted, 0)
+
+if __name__ == '__main__':
+    unittest.main()